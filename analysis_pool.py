@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Process havuzu ile paralel analiz
+
+Sembol taramaları (scan_all_coins, analyze_coins_for_entry,
+analyze_all_coins_for_signals) CPU ağırlıklı analiz adımını (swing, BOS,
+CHOCH) tek çekirdekte seri çalıştırıyordu. Veri ana process'te indirilir,
+analiz adımı kullanılabilir çekirdek sayısı kadar worker'a dağıtılır ve
+sonuçlar girdi sırasıyla (deterministik) geri döner.
+
+PARALLEL_ANALYSIS=1 ile açılır; ANALYSIS_WORKERS worker sayısını sabitler.
+"""
+
+import os, time, atexit
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, List, Optional
+
+import stage_cancel
+
+# ---------- CONFIG ----------
+PARALLEL_ANALYSIS = os.getenv("PARALLEL_ANALYSIS", "0") == "1"
+ANALYSIS_WORKERS  = int(os.getenv("ANALYSIS_WORKERS", "0"))  # 0: kullanılabilir tüm çekirdekler
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def worker_count() -> int:
+    """Worker sayısı: ANALYSIS_WORKERS ya da process'e atanmış çekirdek sayısı"""
+    if ANALYSIS_WORKERS > 0:
+        return ANALYSIS_WORKERS
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def is_enabled(parallel: Optional[bool] = None) -> bool:
+    """Açık parametre verilmediyse PARALLEL_ANALYSIS ayarını kullan"""
+    enabled = PARALLEL_ANALYSIS if parallel is None else parallel
+    return enabled and worker_count() > 1
+
+def get_executor() -> ProcessPoolExecutor:
+    """Döngüler arasında yeniden kullanılan process havuzu"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=worker_count())
+        atexit.register(shutdown)
+    return _executor
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _call_safely(func: Callable, item):
+    # Tek sembolün hatası tüm map'i düşürmesin; hata nesnesi sonuç olarak döner.
+    # Süre worker'da ölçülür; metrikler ana process'te kaydedilir.
+    started = time.perf_counter()
+    try:
+        result = func(item)
+    except Exception as e:
+        result = e
+    return result, time.perf_counter() - started
+
+def map_ordered(func: Callable, items: Iterable, metric: Optional[str] = None) -> List:
+    """
+    func'u worker'larda çalıştır; sonuçlar girdi sırasıyla döner.
+    Hata veren öğelerin sonucu Exception nesnesidir (bkz. unwrap).
+    metric verilirse öğe başına süre (öğenin ilk elemanı sembol) bu adla kaydedilir.
+    """
+    from metrics import get_metrics
+
+    items = list(items)
+    if not items:
+        return []
+    chunksize = max(1, len(items) // (worker_count() * 4))
+    results = []
+    outputs = get_executor().map(partial(_call_safely, func), items, chunksize=chunksize)
+    try:
+        for item, (result, elapsed) in zip(items, outputs):
+            stage_cancel.check()
+            if metric:
+                get_metrics().record_symbol(metric, item[0], elapsed)
+            results.append(result)
+    finally:
+        outputs.close()  # İptalde bekleyen parçalar kuyruktan çıkarılır
+    return results
+
+def unwrap(result):
+    """map_ordered sonucu hata ise seri koddaki gibi yeniden fırlat"""
+    if isinstance(result, Exception):
+        raise result
+    return result
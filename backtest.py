@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Range (range_50 BUY) ve 15m/30m CHOCH stratejileri için geçmiş backtest'i
+
+Canlı bot her barda son 500 (range) / 200 (CHOCH) barlık pencereyi baştan
+analiz eder. Aynısını aylarca veride her bar kapanışı için tekrarlamak
+O(bar x pencere) analyze() çağrısı demek. Burada pencereye bağlı olmayan
+yapılar tüm seri için bir kez hesaplanır ve her bar kapanışındaki sonuç
+bunlardan sorgulanır:
+
+- Swing noktaları: bar j'nin swing olması sadece j-lookback..j+lookback
+  barlarına bağlıdır; pencere [s, t] içindeki swing'ler global swing'lerden
+  s+lookback <= j <= t-lookback olanlardır.
+- Kırılmalar: her swing'in ilk kırıldığı bar (BreakIndex) bir kez bulunur;
+  pencerede kırılmış olması kırılma <= t demektir.
+- Weak high / swing low: kayan pencere argmax ve RangeArgmin sorguları.
+
+Sonuç olarak t anındaki sinyal sadece t'ye kadar kapanmış barlara bakar
+(lookahead yok) ve canlı analizörlerin o pencerede üreteceği sinyalle
+aynıdır (--verify örnek barlarda bunu kontrol eder). Sinyalin başladığı
+barlar işlem girişi sayılır; sonuç (hedef / stop / süre doldu) sonraki
+barlardan hesaplanır:
+
+    python backtest.py --symbols BTCUSDT,ETHUSDT --days 180
+    python backtest.py --strategies choch_long --days 365 --verify
+    python backtest.py --synthetic                  # ağ olmadan, sentetik mumlarla
+
+Geçmiş önce OHLCV deposundan okunur, yetmezse Binance'ten indirilip depoya
+yazılır. Sonuçlar backtest_results.json dosyasına yazılır.
+"""
+
+import os, io, time, argparse
+from contextlib import redirect_stdout
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import kline_cache
+import ohlcv_store
+from kline_arrays import KlineArrays, parse_klines
+from smc_kernels import BreakIndex, RangeArgmin, swing_highs, swing_lows
+from json_writer import write_json
+
+# ---------- CONFIG ----------
+RESULTS_FILE     = "backtest_results.json"
+DEFAULT_SYMBOLS  = ["BTCUSDT", "ETHUSDT", "SOLUSDT"]
+DEFAULT_DAYS     = int(os.getenv("BACKTEST_DAYS", "180"))
+HORIZON_BARS     = int(os.getenv("BACKTEST_HORIZON", "48"))         # Sinyal sonrası en fazla kaç bar tutulur
+TAKE_PROFIT_PCT  = float(os.getenv("BACKTEST_TP_PCT", "2.0"))       # CHOCH girişleri için hedef
+STOP_LOSS_PCT    = float(os.getenv("BACKTEST_SL_PCT", "1.0"))       # CHOCH girişleri için stop
+VERIFY_SAMPLES   = 40
+
+# Strateji -> canlı taramadaki parametreler
+STRATEGIES = {
+    "range_50":    {"interval": "4h",  "window": 500, "lookback": 5},
+    "choch_long":  {"interval": "15m", "window": 200, "lookback": 3, "distance_pct": 2.0},
+    "choch_short": {"interval": "30m", "window": 200, "lookback": 3, "distance_pct": 2.0},
+}
+
+# ---------- HISTORY ----------
+def load_history(symbol: str, interval: str, bars: int, synthetic: bool = False) -> Optional[KlineArrays]:
+    """Son `bars` kapanmış mum: önce OHLCV deposu, yetmezse Binance (depoya da yazılır)"""
+    if synthetic:
+        from benchmark import synthetic_klines
+        return parse_klines(synthetic_klines(symbol, interval, bars))
+
+    last_closed = kline_cache.last_closed_open_time(interval)
+    columns = ohlcv_store.read(symbol, interval) if ohlcv_store.STORE_ENABLED else None
+    if columns is not None:
+        closed = int(np.searchsorted(columns["timestamp"], last_closed, side="right"))
+        if closed >= bars and int(columns["timestamp"][closed - 1]) == last_closed:
+            part = slice(closed - bars, closed)
+            return KlineArrays(np.array(columns["timestamp"][part]), np.array(columns["open"][part]),
+                               np.array(columns["high"][part]), np.array(columns["low"][part]),
+                               np.array(columns["close"][part]), np.array(columns["volume"][part]))
+
+    try:
+        klines = kline_cache.download_history(symbol, interval, bars + 1)
+    except Exception as e:
+        print(f"❌ {symbol} {interval} geçmişi indirilemedi: {e}")
+        return None
+    if ohlcv_store.STORE_ENABLED:
+        ohlcv_store.write(symbol, interval, klines)
+    # Oluşmakta olan son bar sinyale girmez
+    klines = [row for row in klines if int(row[0]) <= last_closed]
+    return parse_klines(klines[-bars:])
+
+# ---------- SIGNALS ----------
+def range_signals(bars: KlineArrays, window: int = 500, lookback: int = 5) -> Dict[str, np.ndarray]:
+    """
+    Her bar kapanışı t için (t >= window-1) son `window` barlık pencerede
+    SimplifiedSMC.analyze'ın bulacağı range ve range_50 sinyali.
+    Dizilerin i. elemanı t = window-1+i barına aittir.
+    """
+    high, low, close = bars.high, bars.low, bars.close
+    n = len(bars)
+    ends = np.arange(window - 1, n)
+    starts = ends - window + 1
+    if len(ends) == 0:
+        return {"end": ends, "has_range": np.zeros(0, dtype=bool), "signal": np.zeros(0, dtype=bool)}
+
+    # 1. Weak high: penceredeki en yüksek high (ilk oluşum)
+    weak = sliding_window_view(high, window).argmax(axis=1) + starts
+
+    # 2. Son bullish BOS: pencerede tam teyitli, weak high'dan önceki swing high'lardan
+    #    kırılması (ilk kapanış üstü) weak high mumunu geçmeyenlerin en sağdaki
+    swings = swing_highs(high, lookback)
+    breaks = BreakIndex(close).first_above(high[swings], swings + 1) if len(swings) else np.empty(0, dtype=np.int64)
+    breaks = np.where(breaks < 0, n, breaks)
+    lo = np.searchsorted(swings, starts + lookback, side="left")
+    hi = np.searchsorted(swings, np.minimum(weak - 1, ends - lookback), side="right") - 1
+    # Ters çevrilmiş dizide "ilk" = orijinalde en sağdaki
+    m = len(swings)
+    found = BreakIndex(breaks[::-1]).first_below(weak + 0.5, m - 1 - hi, m - lo)
+    has_bos = found >= 0
+    bos = np.where(has_bos, m - 1 - found, 0)
+    bos = swings[bos] if m else bos
+
+    # 3. Swing low: BOS swing high'ı ile weak high arasındaki (dahil) en düşük low
+    swing_low = RangeArgmin(low).query(np.where(has_bos, bos, weak), weak)
+    range_low = low[swing_low]
+    range_high = high[bos]
+
+    # 4. Weak high'dan (dahil) t'ye kadar range low altına kapanış
+    broken = BreakIndex(close).first_below(range_low, weak, ends + 1) >= 0
+
+    # 5. Pozisyon (calculate_range_and_position ile aynı formüller)
+    price = close[ends]
+    range_size = range_high - range_low
+    range_mid = range_low + range_size / 2
+    inside = (range_low <= price) & (price <= range_high)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        position_pct = np.where(inside, (price - range_low) / range_size * 100,
+                                np.where(price > range_high, 100 + (price - range_high) / range_size * 100,
+                                         -((range_low - price) / range_size) * 100))
+    signal = has_bos & inside & (price < range_mid) & ~broken
+
+    return {
+        "end": ends, "has_range": has_bos, "signal": signal, "weak_high": high[weak],
+        "range_low": range_low, "range_high": range_high, "range_mid": range_mid,
+        "position_pct": position_pct, "swing_low_broken": broken & has_bos,
+    }
+
+def choch_signals(bars: KlineArrays, window: int = 200, lookback: int = 3,
+                  distance_pct: float = 2.0, bullish: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Her bar kapanışı t için CHOCHAnalyzer (bullish) / BearishCHOCHAnalyzer
+    check_active_signals'ın döndüreceği aktif CHOCH (yoksa active=False).
+
+    Bir CHOCH olayı ardışık iki swing (bullish: daha düşük low) ve sonrasındaki
+    ilk karşı swing'in kırılmasıdır. Olay t'de pencerede görünür:
+    karşı swing teyitli ve kırılmış (t >= max(swing+lookback, kırılma)) ve
+    önceki swing hâlâ pencerede (t <= önceki + window - 1 - lookback).
+    """
+    high, low, close = bars.high, bars.low, bars.close
+    n = len(bars)
+    if bullish:
+        pivots, levels_idx = swing_lows(low, lookback), swing_highs(high, lookback)
+        pivot_price, level_price = low, high
+    else:
+        pivots, levels_idx = swing_highs(high, lookback), swing_lows(low, lookback)
+        pivot_price, level_price = high, low
+
+    empty = np.zeros(n, dtype=bool)
+    result = {"active": empty, "level": np.full(n, np.nan), "break_index": np.full(n, -1, dtype=np.int64),
+              "event": np.full(n, -1, dtype=np.int64)}
+    if len(pivots) < 2 or len(levels_idx) == 0:
+        return result
+
+    index = BreakIndex(close)
+    level_breaks = (index.first_above(high[levels_idx], levels_idx + 1) if bullish
+                    else index.first_below(low[levels_idx], levels_idx + 1))
+
+    # Olaylar (sinyal listesindeki sırayla): bullish için yeni low öncekinden düşük
+    prev, curr = pivots[:-1], pivots[1:]
+    trend = pivot_price[curr] < pivot_price[prev] if bullish else pivot_price[curr] > pivot_price[prev]
+    k = np.searchsorted(levels_idx, curr, side="right")
+    valid = trend & (k < len(levels_idx))
+    k = np.where(valid, k, 0)
+    valid &= level_breaks[k] >= 0
+    prev, k = prev[valid], k[valid]
+    level_bar, break_bar = levels_idx[k], level_breaks[k]
+
+    appear = np.maximum(np.maximum(level_bar + lookback, break_bar), window - 1)
+    expire = np.minimum(prev + window - 1 - lookback, n - 1)
+    keep = appear <= expire
+    if not keep.any():
+        return result
+    event_ids = np.flatnonzero(keep)
+    appear, expire = appear[keep], expire[keep]
+
+    # (olay, bar) çiftleri: her olay görünür olduğu her bar kapanışında aday
+    lengths = expire - appear + 1
+    event = np.repeat(event_ids, lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    t = np.repeat(appear, lengths) + offsets
+
+    # Analizör pencerede en az 2 swing low ve 2 swing high ister
+    starts = t - window + 1
+    enough = (np.searchsorted(levels_idx, t - lookback, side="right") -
+              np.searchsorted(levels_idx, starts + lookback, side="left")) >= 2
+    enough &= (np.searchsorted(pivots, t - lookback, side="right") -
+               np.searchsorted(pivots, starts + lookback, side="left")) >= 2
+
+    choch_level = level_price[level_bar[event]]
+    current_price = close[t]
+    distance = np.abs((current_price - choch_level) / choch_level * 100)
+    candidate = enough & (distance <= distance_pct)
+    t, event = t[candidate], event[candidate]
+
+    # Aynı bardaki adaylardan listedeki son olay (check_active_signals active_signals[-1])
+    best = np.full(n, -1, dtype=np.int64)
+    np.maximum.at(best, t, event)
+    active = best >= 0
+    chosen = np.where(active, best, 0)
+    result["active"] = active
+    result["event"] = best
+    result["level"] = np.where(active, level_price[level_bar[chosen]], np.nan)
+    result["break_index"] = np.where(active, break_bar[chosen], -1)
+    return result
+
+# ---------- OUTCOMES ----------
+def evaluate_trades(bars: KlineArrays, entries: np.ndarray, targets: np.ndarray, stops: np.ndarray,
+                    long: bool = True, horizon: int = HORIZON_BARS) -> List[Dict]:
+    """
+    Girişlerden sonraki en fazla `horizon` barda hedef/stop'tan hangisine
+    önce değildiğini bul. Aynı barda ikisi de varsa stop sayılır.
+    """
+    n = len(bars)
+    if len(entries) == 0:
+        return []
+    stops_at = np.minimum(entries + 1 + horizon, n)
+    high_index, low_index = BreakIndex(bars.high), BreakIndex(bars.low)
+    if long:
+        target_hit = high_index.first_above(targets, entries + 1, stops_at)
+        stop_hit = low_index.first_below(stops, entries + 1, stops_at)
+    else:
+        target_hit = low_index.first_below(targets, entries + 1, stops_at)
+        stop_hit = high_index.first_above(stops, entries + 1, stops_at)
+
+    trades = []
+    direction = 1 if long else -1
+    for i, t in enumerate(entries):
+        entry_price = bars.close[t]
+        tp, sl = int(target_hit[i]), int(stop_hit[i])
+        if sl >= 0 and (tp < 0 or sl <= tp):
+            outcome, exit_bar, exit_price = "stop", sl, stops[i]
+        elif tp >= 0:
+            outcome, exit_bar, exit_price = "target", tp, targets[i]
+        elif t + horizon < n:
+            outcome, exit_bar, exit_price = "timeout", t + horizon, bars.close[t + horizon]
+        else:
+            outcome, exit_bar, exit_price = "open", n - 1, bars.close[n - 1]
+
+        # Son barda açılan işlemin henüz izlenecek barı yok (giriş barı kullanılır)
+        path = slice(t + 1, exit_bar + 1) if exit_bar > t else slice(t, t + 1)
+        best = bars.high[path].max() if long else bars.low[path].min()
+        worst = bars.low[path].min() if long else bars.high[path].max()
+        trades.append({
+            "entry_time": bars.timestamp(t).strftime('%Y-%m-%d %H:%M:%S'),
+            "exit_time": bars.timestamp(exit_bar).strftime('%Y-%m-%d %H:%M:%S'),
+            "entry_price": float(round(entry_price, 6)),
+            "target": float(round(targets[i], 6)),
+            "stop": float(round(stops[i], 6)),
+            "outcome": outcome,
+            "bars_held": int(exit_bar - t),
+            "return_pct": float(round(direction * (exit_price / entry_price - 1) * 100, 3)),
+            "max_favorable_pct": float(round(direction * (best / entry_price - 1) * 100, 3)),
+            "max_adverse_pct": float(round(direction * (worst / entry_price - 1) * 100, 3)),
+        })
+    return trades
+
+def summarize(trades: List[Dict]) -> Dict:
+    closed = [t for t in trades if t["outcome"] != "open"]
+    returns = np.array([t["return_pct"] for t in closed])
+    gains, losses = returns[returns > 0].sum(), -returns[returns < 0].sum()
+    return {
+        "trades": len(trades),
+        "closed": len(closed),
+        "targets": sum(t["outcome"] == "target" for t in closed),
+        "stops": sum(t["outcome"] == "stop" for t in closed),
+        "timeouts": sum(t["outcome"] == "timeout" for t in closed),
+        "win_rate_pct": round(float((returns > 0).mean() * 100), 2) if len(closed) else None,
+        "avg_return_pct": round(float(returns.mean()), 3) if len(closed) else None,
+        "total_return_pct": round(float(returns.sum()), 3),
+        "profit_factor": round(float(gains / losses), 3) if losses > 0 else None,
+    }
+
+def onsets(active: np.ndarray, key: Optional[np.ndarray] = None) -> np.ndarray:
+    """Sinyalin başladığı (bir önceki barda yok ya da farklı olay) barlar"""
+    previous = np.r_[False, active[:-1]]
+    started = active & ~previous
+    if key is not None:
+        started |= active & previous & (key != np.r_[-1, key[:-1]])
+    return np.flatnonzero(started)
+
+def backtest_symbol(strategy: str, bars: KlineArrays, horizon: int = HORIZON_BARS) -> Dict:
+    params = STRATEGIES[strategy]
+    window, lookback = params["window"], params["lookback"]
+    if strategy == "range_50":
+        series = range_signals(bars, window, lookback)
+        rows = onsets(series["signal"])
+        # Range stratejisinin kendi seviyeleri: hedef range high, stop range low
+        trades = evaluate_trades(bars, series["end"][rows], series["range_high"][rows],
+                                 series["range_low"][rows], long=True, horizon=horizon)
+    else:
+        long = strategy == "choch_long"
+        series = choch_signals(bars, window, lookback, params["distance_pct"], bullish=long)
+        entries = onsets(series["active"], series["event"])
+        price = bars.close[entries]
+        side = 1 if long else -1
+        trades = evaluate_trades(bars, entries, price * (1 + side * TAKE_PROFIT_PCT / 100),
+                                 price * (1 - side * STOP_LOSS_PCT / 100), long=long, horizon=horizon)
+    return {"bars": len(bars), "summary": summarize(trades), "trades": trades}
+
+# ---------- VERIFY ----------
+def verify_against_analyzers(strategy: str, bars: KlineArrays, samples: int = VERIFY_SAMPLES) -> int:
+    """Örnek bar kapanışlarında canlı analizörü o pencereyle çalıştırıp sonucu karşılaştır; uyuşmazlık sayısını döndür"""
+    from primary_test import SimplifiedSMC
+    from entry_long_signal import CHOCHAnalyzer
+    from entry_short_signal import BearishCHOCHAnalyzer
+
+    params = STRATEGIES[strategy]
+    window = params["window"]
+    n = len(bars)
+    if n < window:
+        return 0
+    rows = list(zip(bars.open_time.tolist(), bars.open.tolist(), bars.high.tolist(),
+                    bars.low.tolist(), bars.close.tolist(), bars.volume.tolist()))
+    checks = np.unique(np.linspace(window - 1, n - 1, samples).astype(int))
+    mismatches = 0
+
+    if strategy == "range_50":
+        series = range_signals(bars, window, params["lookback"])
+        for t in checks:
+            smc = SimplifiedSMC("VERIFY", params["interval"], window)
+            with redirect_stdout(io.StringIO()):  # Range low kırılma mesajları
+                smc.analyze(rows[t - window + 1:t + 1])
+            signal = smc.get_signal_json()
+            i = t - window + 1
+            expected = (signal["range_50"], round(signal["range_low"], 4), round(signal["range_high"], 4)) if signal else None
+            got = ((bool(series["signal"][i]), round(float(series["range_low"][i]), 4),
+                    round(float(series["range_high"][i]), 4)) if series["has_range"][i] else None)
+            mismatches += expected != got
+    else:
+        long = strategy == "choch_long"
+        series = choch_signals(bars, window, params["lookback"], params["distance_pct"], bullish=long)
+        for t in checks:
+            analyzer = (CHOCHAnalyzer if long else BearishCHOCHAnalyzer)("VERIFY", params["interval"], window)
+            analyzer.fetch_binance_data(rows[t - window + 1:t + 1])
+            analyzer.find_swing_points(lookback=params["lookback"])
+            analyzer.detect_bullish_choch() if long else analyzer.detect_bearish_choch()
+            signal = analyzer.check_active_signals(distance_pct=params["distance_pct"])
+            expected = signal["choch_level"] if signal else None
+            got = float(round(series["level"][t], 4)) if series["active"][t] else None
+            mismatches += expected != got
+    return int(mismatches)
+
+# ---------- MAIN ----------
+def run_backtest(symbols: Sequence[str], strategies: Sequence[str], days: int = DEFAULT_DAYS,
+                 horizon: int = HORIZON_BARS, synthetic: bool = False, verify: bool = False) -> Dict:
+    results = {"generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+               "days": days, "horizon_bars": horizon, "strategies": {}}
+    for strategy in strategies:
+        params = STRATEGIES[strategy]
+        interval = params["interval"]
+        bars_needed = days * 86_400_000 // kline_cache.interval_ms(interval) + params["window"]
+        per_symbol = {}
+        for symbol in symbols:
+            bars = load_history(symbol, interval, bars_needed, synthetic)
+            if bars is None or len(bars) < params["window"]:
+                print(f"⚠️  {strategy} {symbol}: yetersiz geçmiş, atlandı")
+                continue
+
+            started = time.perf_counter()
+            per_symbol[symbol] = backtest_symbol(strategy, bars, horizon)
+            per_symbol[symbol]["seconds"] = round(time.perf_counter() - started, 3)
+            if verify:
+                per_symbol[symbol]["verify_mismatches"] = verify_against_analyzers(strategy, bars)
+
+            summary = per_symbol[symbol]["summary"]
+            print(f"📊 {strategy} {symbol} {interval}: {len(bars)} bar, {summary['trades']} işlem, "
+                  f"kazanma %{summary['win_rate_pct']}, ortalama %{summary['avg_return_pct']} "
+                  f"({per_symbol[symbol]['seconds']}s)")
+
+        all_trades = [trade for result in per_symbol.values() for trade in result["trades"]]
+        results["strategies"][strategy] = {"interval": interval, "summary": summarize(all_trades),
+                                           "symbols": per_symbol}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Range / CHOCH stratejileri için geçmiş backtest")
+    parser.add_argument("--symbols", default=",".join(DEFAULT_SYMBOLS), help="Virgülle ayrılmış semboller")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help=f"Seçenekler: {', '.join(STRATEGIES)}")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    parser.add_argument("--horizon", type=int, default=HORIZON_BARS, help="Girişten sonra en fazla bar sayısı")
+    parser.add_argument("--synthetic", action="store_true", help="Ağ yerine deterministik sentetik mumlar")
+    parser.add_argument("--verify", action="store_true", help="Örnek barlarda canlı analizörlerle karşılaştır")
+    parser.add_argument("--output", default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    strategies = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    unknown = [s for s in strategies if s not in STRATEGIES]
+    if unknown:
+        parser.error(f"Bilinmeyen strateji: {', '.join(unknown)}")
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+    results = run_backtest(symbols, strategies, args.days, args.horizon, args.synthetic, args.verify)
+    write_json(args.output, results)
+    print(f"💾 Backtest sonuçları kaydedildi: {args.output}")
+
+    if args.verify:
+        mismatches = sum(r.get("verify_mismatches", 0) for s in results["strategies"].values()
+                         for r in s["symbols"].values())
+        print("✅ Canlı analizörlerle aynı sonuç" if not mismatches else f"❌ {mismatches} örnekte uyuşmazlık")
+        return 1 if mismatches else 0
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SMC analizörleri için çevrimdışı benchmark
+
+SimplifiedSMC.analyze, CHOCHAnalyzer.detect_bullish_choch veya
+BearishCHOCHAnalyzer.detect_bearish_choch üzerindeki bir değişikliğin hızı
+nasıl etkilediğini ölçmek için kayıtlı kline fixture'ları (ağ yok) üzerinde
+her analiz adımını ve tam analizi farklı bar (200, 500, 1500, 5000) ve
+sembol sayılarında zamanlar.
+
+Fixture'lar bench_fixtures/<SYMBOL>_<interval>.json dosyalarıdır
+({symbol, interval, klines} - kline_replay.py ile aynı format):
+
+    python benchmark.py --record                    # Binance'ten 5000 bar kaydet
+    python benchmark.py                             # ölç, bench_results.json yaz
+    python benchmark.py --save-baseline             # sonucu referans olarak sakla
+    python benchmark.py --baseline bench_baseline.json --threshold 0.25
+
+Kayıtlı fixture yoksa aynı formatta deterministik sentetik mumlar üretilir
+(sabit seed'li random walk), böylece sonuçlar makineler arasında
+karşılaştırılabilir kalır. Referansa göre BENCH_THRESHOLD oranından fazla
+yavaşlayan ölçüm varsa çıkış kodu 1 olur (deploy öncesi kontrol).
+"""
+
+import os, sys, json, time, argparse, platform, statistics
+from contextlib import redirect_stdout
+from datetime import datetime
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+import kline_cache
+import smc_batch
+from primary_test import SimplifiedSMC
+from entry_long_signal import CHOCHAnalyzer
+from entry_short_signal import BearishCHOCHAnalyzer
+
+# ---------- CONFIG ----------
+FIXTURE_DIR      = os.getenv("BENCH_FIXTURE_DIR", "bench_fixtures")
+RESULTS_FILE     = "bench_results.json"
+BASELINE_FILE    = "bench_baseline.json"
+BAR_COUNTS       = [200, 500, 1500, 5000]
+SYMBOL_COUNTS    = [1, 10, 25]
+REPEAT           = 5
+THRESHOLD        = float(os.getenv("BENCH_THRESHOLD", "0.25"))  # %25 yavaşlama
+NOISE_FLOOR_MS   = 1.0  # Bu farkın altındaki sapmalar gürültü sayılır
+FIXTURE_BARS     = max(BAR_COUNTS)
+FIXTURE_SYMBOLS  = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "BNBUSDT", "XRPUSDT", "DOGEUSDT", "ADAUSDT",
+                    "AVAXUSDT", "LINKUSDT", "DOTUSDT", "LTCUSDT", "TRXUSDT", "NEARUSDT", "ATOMUSDT",
+                    "APTUSDT", "ARBUSDT", "OPUSDT", "SUIUSDT", "INJUSDT", "FILUSDT", "UNIUSDT",
+                    "AAVEUSDT", "ETCUSDT", "BCHUSDT", "TIAUSDT"]
+
+# Analizör -> fixture interval'i (taramalardaki ile aynı)
+ANALYZER_INTERVALS = {"SimplifiedSMC": "4h", "CHOCHAnalyzer": "15m", "BearishCHOCHAnalyzer": "30m"}
+
+# ---------- FIXTURES ----------
+def fixture_path(symbol: str, interval: str) -> str:
+    return os.path.join(FIXTURE_DIR, f"{symbol}_{interval}.json")
+
+def synthetic_klines(symbol: str, interval: str, bars: int = FIXTURE_BARS) -> List[list]:
+    """Binance formatında deterministik sentetik mumlar (trend + rejim değişimli random walk)"""
+    seed = sum(ord(c) * (i + 1) for i, c in enumerate(f"{symbol}_{interval}"))
+    rng = np.random.default_rng(seed)
+    step = kline_cache.interval_ms(interval)
+    start = 1_700_000_000_000 // step * step
+
+    # Rejim değişimleri swing/BOS/CHOCH üretsin diye drift her ~150 barda değişir
+    drift = np.repeat(rng.normal(0, 0.002, bars // 150 + 1), 150)[:bars]
+    close = 100 * np.exp(np.cumsum(drift + rng.normal(0, 0.01, bars)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, bars)))
+    volume = rng.uniform(100, 1000, bars)
+
+    return [[start + i * step, f"{open_[i]:.4f}", f"{high[i]:.4f}", f"{low[i]:.4f}", f"{close[i]:.4f}",
+             f"{volume[i]:.2f}", start + (i + 1) * step - 1, f"{volume[i] * close[i]:.2f}", 100,
+             f"{volume[i] / 2:.2f}", f"{volume[i] * close[i] / 2:.2f}", "0"]
+            for i in range(bars)]
+
+def load_fixture(symbol: str, interval: str) -> Tuple[List[list], str]:
+    """Kayıtlı fixture'ı yükle; yoksa sentetik üret. (klines, kaynak) döndürür"""
+    try:
+        with open(fixture_path(symbol, interval), "r", encoding="utf-8") as f:
+            klines = json.load(f)["klines"]
+        if len(klines) >= FIXTURE_BARS:
+            return klines, "recorded"
+    except (OSError, ValueError, KeyError):
+        pass
+    return synthetic_klines(symbol, interval), "synthetic"
+
+def record_fixtures(symbols: Sequence[str], intervals: Sequence[str], bars: int = FIXTURE_BARS):
+    """Binance'ten geriye doğru sayfalayarak `bars` mum indir ve fixture olarak kaydet"""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for symbol in symbols:
+        for interval in intervals:
+            try:
+                klines = kline_cache.download_history(symbol, interval, bars)
+            except Exception as e:
+                print(f"⚠️  {symbol} {interval} kaydedilemedi: {e}")
+                continue
+
+            with open(fixture_path(symbol, interval), "w", encoding="utf-8") as f:
+                json.dump({"symbol": symbol, "interval": interval, "klines": klines}, f, separators=(",", ":"))
+            print(f"💾 {symbol} {interval}: {len(klines)} bar kaydedildi")
+
+# ---------- STEPS ----------
+def smc_steps(klines: List[list]) -> List[Tuple[str, Callable]]:
+    smc = SimplifiedSMC("BENCH", "4h", len(klines))
+    return [
+        ("fetch_binance_data", lambda: smc.fetch_binance_data(klines)),
+        ("find_weak_high", smc.find_weak_high),
+        ("find_last_bullish_bos", smc.find_last_bullish_bos),
+        ("find_swing_low_in_range", smc.find_swing_low_in_range),
+        ("check_swing_low_break", smc.check_swing_low_break),
+        ("calculate_range_and_position", smc.calculate_range_and_position),
+    ]
+
+def long_choch_steps(klines: List[list]) -> List[Tuple[str, Callable]]:
+    analyzer = CHOCHAnalyzer("BENCH", interval="15m", limit=len(klines))
+    return [
+        ("fetch_binance_data", lambda: analyzer.fetch_binance_data(klines)),
+        ("find_swing_points", lambda: analyzer.find_swing_points(lookback=3)),
+        ("detect_bullish_choch", analyzer.detect_bullish_choch),
+        ("check_active_signals", lambda: analyzer.check_active_signals(distance_pct=2.0)),
+    ]
+
+def short_choch_steps(klines: List[list]) -> List[Tuple[str, Callable]]:
+    analyzer = BearishCHOCHAnalyzer("BENCH", interval="30m", limit=len(klines))
+    return [
+        ("fetch_binance_data", lambda: analyzer.fetch_binance_data(klines)),
+        ("find_swing_points", lambda: analyzer.find_swing_points(lookback=3)),
+        ("detect_bearish_choch", analyzer.detect_bearish_choch),
+        ("check_active_signals", lambda: analyzer.check_active_signals(distance_pct=2.0)),
+    ]
+
+ANALYZERS = {
+    "SimplifiedSMC": smc_steps,
+    "CHOCHAnalyzer": long_choch_steps,
+    "BearishCHOCHAnalyzer": short_choch_steps,
+}
+
+# ---------- TIMING ----------
+def _summary(samples: List[float]) -> Dict:
+    return {"median_ms": round(statistics.median(samples) * 1000, 4),
+            "min_ms": round(min(samples) * 1000, 4),
+            "max_ms": round(max(samples) * 1000, 4)}
+
+def time_analyzer(name: str, windows: List[List[list]], repeat: int) -> Dict[str, Dict]:
+    """Her tekrar için tüm sembolleri sırayla analiz et; adım ve toplam (analyze) süreleri topla"""
+    build_steps = ANALYZERS[name]
+    for _, step in build_steps(windows[0]):
+        step()  # Isınma: import/ilk çağrı maliyeti ölçüme girmesin
+
+    samples: Dict[str, List[float]] = {}
+    for _ in range(repeat):
+        totals: Dict[str, float] = {}
+        for klines in windows:
+            for step_name, step in build_steps(klines):
+                started = time.perf_counter()
+                step()
+                totals[step_name] = totals.get(step_name, 0.0) + time.perf_counter() - started
+        totals["analyze"] = sum(totals.values())
+        for step_name, elapsed in totals.items():
+            samples.setdefault(step_name, []).append(elapsed)
+    return {step_name: _summary(values) for step_name, values in samples.items()}
+
+def time_batch(windows: List[List[list]], repeat: int) -> Dict[str, Dict]:
+    """smc_batch: (semboller x barlar x OHLC) dizisini kurma ve toplu analiz"""
+    symbols = [f"S{i}" for i in range(len(windows))]
+    smc_batch.analyze_batch(*smc_batch.stack_universe(dict(zip(symbols, windows)), len(windows[0])))  # Isınma
+    samples: Dict[str, List[float]] = {"stack_universe": [], "analyze_batch": []}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        batch_symbols, ohlc = smc_batch.stack_universe(dict(zip(symbols, windows)), len(windows[0]))
+        stacked = time.perf_counter()
+        smc_batch.analyze_batch(batch_symbols, ohlc)
+        samples["stack_universe"].append(stacked - started)
+        samples["analyze_batch"].append(time.perf_counter() - stacked)
+    return {step_name: _summary(values) for step_name, values in samples.items()}
+
+def run_benchmarks(bar_counts: Sequence[int], symbol_counts: Sequence[int], repeat: int) -> Dict:
+    fixtures: Dict[str, List[List[list]]] = {}
+    sources = set()
+    for name, interval in ANALYZER_INTERVALS.items():
+        fixtures[name] = []
+        for symbol in FIXTURE_SYMBOLS[:max(symbol_counts)]:
+            klines, source = load_fixture(symbol, interval)
+            fixtures[name].append(klines)
+            sources.add(source)
+    if "synthetic" in sources:
+        print(f"ℹ️  {FIXTURE_DIR}/ içinde kayıtlı fixture eksik - sentetik mumlar kullanılıyor")
+
+    results = []
+    for bars in bar_counts:
+        for n_symbols in symbol_counts:
+            for name in ANALYZERS:
+                windows = [klines[-bars:] for klines in fixtures[name][:n_symbols]]
+                # Analizörlerin hata mesajları ölçümü bozmasın
+                with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                    timings = time_analyzer(name, windows, repeat)
+                results.extend({"analyzer": name, "step": step, "bars": bars, "symbols": n_symbols, **stats}
+                               for step, stats in timings.items())
+
+            windows = [klines[-bars:] for klines in fixtures["SimplifiedSMC"][:n_symbols]]
+            results.extend({"analyzer": "smc_batch", "step": step, "bars": bars, "symbols": n_symbols, **stats}
+                           for step, stats in time_batch(windows, repeat).items())
+
+            total = next(r for r in results if r["analyzer"] == "SimplifiedSMC" and r["step"] == "analyze"
+                         and r["bars"] == bars and r["symbols"] == n_symbols)
+            print(f"⏱️  {bars:>5} bar x {n_symbols:>3} sembol - SimplifiedSMC.analyze {total['median_ms']:.2f} ms")
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "repeat": repeat,
+            "fixtures": sorted(sources),
+        },
+        "results": results,
+    }
+
+# ---------- REGRESSION CHECK ----------
+def result_key(result: Dict) -> Tuple:
+    return result["analyzer"], result["step"], result["bars"], result["symbols"]
+
+def compare(current: Dict, baseline: Dict, threshold: float = THRESHOLD) -> List[Dict]:
+    """Referanstan `threshold` oranından (ve gürültü payından) fazla yavaşlayan ölçümleri döndür"""
+    reference = {result_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        base = reference.get(result_key(result))
+        if not base:
+            continue
+        before, after = base["median_ms"], result["median_ms"]
+        if after > before * (1 + threshold) and after - before > NOISE_FLOOR_MS:
+            regressions.append({**result, "baseline_ms": before, "slowdown_pct": round((after / before - 1) * 100, 1)})
+    return regressions
+
+# ---------- MAIN ----------
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+def main():
+    parser = argparse.ArgumentParser(description="SMC analizörleri için çevrimdışı benchmark")
+    parser.add_argument("--bars", type=_int_list, default=BAR_COUNTS)
+    parser.add_argument("--symbols", type=_int_list, default=SYMBOL_COUNTS)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", help="Karşılaştırılacak referans sonuç dosyası")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="İzin verilen yavaşlama oranı (0.25 = %%25)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Sonucu {BASELINE_FILE} olarak da kaydet")
+    parser.add_argument("--record", action="store_true", help="Benchmark yerine Binance'ten fixture kaydet")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures(FIXTURE_SYMBOLS[:max(args.symbols)], sorted(set(ANALYZER_INTERVALS.values())),
+                        max(max(args.bars), FIXTURE_BARS))
+        return 0
+
+    if max(args.bars) > FIXTURE_BARS:
+        print(f"❌ En fazla {FIXTURE_BARS} bar ölçülebilir")
+        return 2
+    if max(args.symbols) > len(FIXTURE_SYMBOLS):
+        print(f"❌ En fazla {len(FIXTURE_SYMBOLS)} sembol ölçülebilir")
+        return 2
+
+    report = run_benchmarks(args.bars, args.symbols, args.repeat)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 {len(report['results'])} ölçüm {args.output} dosyasına kaydedildi")
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Referans güncellendi: {BASELINE_FILE}")
+
+    if args.baseline:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"❌ Referans okunamadı: {e}")
+            return 2
+
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n🚨 {len(regressions)} ölçümde %{args.threshold * 100:.0f} üzeri yavaşlama:")
+            for r in regressions:
+                print(f"   {r['analyzer']}.{r['step']} ({r['bars']} bar x {r['symbols']} sembol): "
+                      f"{r['baseline_ms']:.2f} ms → {r['median_ms']:.2f} ms (+%{r['slowdown_pct']})")
+            return 1
+        print(f"✅ Referansa göre yavaşlama yok (eşik %{args.threshold * 100:.0f})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
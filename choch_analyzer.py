@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tek swing geçişinde iki yönlü CHOCH (Change of Character) analizi
+
+CHOCHAnalyzer (entry_long_signal) ve BearishCHOCHAnalyzer (entry_short_signal)
+aynı pencereyi çözüp aynı swing high/low'ları hesaplıyor, sonra sadece kendi
+yönüne bakıyordu. BidirectionalCHOCHAnalyzer swing'leri bir kez çıkarır ve
+iki yönü birlikte üretir:
+
+- Bullish: daha düşük swing low'dan sonraki ilk swing high kapanışla kırılır
+- Bearish: daha yüksek swing high'dan sonraki ilk swing low kapanışla kırılır
+
+Eski iki sınıf bunun tek yönlü görünümleridir (API'leri değişmedi).
+analyze_choch sonucu pencerenin son barıyla anahtarlayıp saklar; long ve short
+aşamaları aynı 15m penceresine baktığında analiz bir kez yapılır.
+"""
+
+import os, threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from kline_cache import fetch_klines
+from kline_arrays import parse_klines
+from smc_kernels import swing_highs, swing_lows, first_cross_above, first_cross_below
+
+# ---------- CONFIG ----------
+MEMO_SIZE = int(os.getenv("CHOCH_MEMO_SIZE", "2048"))  # Saklanan (pencere -> sonuç) sayısı
+
+# ---------- ANALYZER ----------
+class BidirectionalCHOCHAnalyzer:
+    """Bullish ve bearish CHOCH'u aynı swing noktalarından bulan sınıf"""
+
+    def __init__(self, symbol, interval="15m", limit=200):
+        self.symbol = symbol
+        self.interval = interval
+        self.limit = limit
+        self.bars = None  # KlineArrays (open_time/open/high/low/close/volume)
+        self.swing_lows = []
+        self.swing_highs = []
+        self.last_choch = None
+        self.bullish_signals = []
+        self.bearish_signals = []
+
+    @property
+    def data(self):
+        """Hata ayıklama için DataFrame görünümü (analiz numpy dizileri üzerinde çalışır)"""
+        return self.bars.to_frame() if self.bars is not None else None
+
+    def fetch_binance_data(self, klines=None):
+        """Binance'den veri çek (klines verilirse indirme yapılmaz)"""
+        try:
+            # Aynı döngüde başka bir aşama çektiyse cache'ten gelir
+            data = klines if klines is not None else fetch_klines(self.symbol, self.interval, self.limit)
+
+            # Ham kline listesi doğrudan numpy kolonlarına çözülür (DataFrame kurulmaz)
+            self.bars = parse_klines(data)
+
+            return True
+
+        except Exception as e:
+            print(f"❌ {self.symbol} veri çekme hatası: {e}")
+            return False
+
+    def find_swing_points(self, lookback=5):
+        """Swing high ve swing low noktalarını tespit et"""
+        lows = self.bars.low
+        highs = self.bars.high
+
+        low_idx = swing_lows(lows, lookback)
+        high_idx = swing_highs(highs, lookback)
+
+        self.swing_lows = [
+            {'price': lows[i], 'index': int(i), 'timestamp': ts}
+            for i, ts in zip(low_idx, self.bars.timestamps(low_idx))
+        ]
+        self.swing_highs = [
+            {'price': highs[i], 'index': int(i), 'timestamp': ts}
+            for i, ts in zip(high_idx, self.bars.timestamps(high_idx))
+        ]
+
+    def detect_bullish_choch(self):
+        """Bullish CHOCH - Düşüş trendinden yükseliş trendine geçiş"""
+        self.bullish_signals = []
+
+        if len(self.swing_lows) < 2 or len(self.swing_highs) < 2:
+            return
+
+        closes = self.bars.close
+        high_idx = np.array([s['index'] for s in self.swing_highs])
+        high_prices = np.array([s['price'] for s in self.swing_highs])
+
+        # Her swing high'ın kırıldığı ilk bar (kapanış seviyenin üstünde), yoksa -1
+        high_breaks = first_cross_above(closes, high_prices, high_idx + 1)
+
+        for i in range(1, len(self.swing_lows)):
+            prev_low = self.swing_lows[i-1]
+            curr_low = self.swing_lows[i]
+
+            # Düşüş trendi: Yeni low, öncekinden düşük
+            if curr_low['price'] < prev_low['price']:
+                # Bu low'dan sonra gelen ilk swing high kırıldıysa CHOCH
+                k = np.searchsorted(high_idx, curr_low['index'], side='right')
+                if k < len(high_idx) and high_breaks[k] >= 0:
+                    j = int(high_breaks[k])
+                    self.bullish_signals.append({
+                        'type': 'BULLISH_CHOCH',
+                        'swing_low': curr_low['price'],
+                        'swing_high': high_prices[k],
+                        'break_price': closes[j],
+                        'break_timestamp': self.bars.timestamp(j),
+                        'choch_level': high_prices[k]
+                    })
+
+    def detect_bearish_choch(self):
+        """Bearish CHOCH - Yükseliş trendinden düşüş trendine geçiş"""
+        self.bearish_signals = []
+
+        if len(self.swing_lows) < 2 or len(self.swing_highs) < 2:
+            return
+
+        closes = self.bars.close
+        low_idx = np.array([s['index'] for s in self.swing_lows])
+        low_prices = np.array([s['price'] for s in self.swing_lows])
+
+        # Her swing low'un kırıldığı ilk bar (kapanış seviyenin altında), yoksa -1
+        low_breaks = first_cross_below(closes, low_prices, low_idx + 1)
+
+        for i in range(1, len(self.swing_highs)):
+            prev_high = self.swing_highs[i-1]
+            curr_high = self.swing_highs[i]
+
+            # Yükseliş trendi: Yeni high, öncekinden yüksek
+            if curr_high['price'] > prev_high['price']:
+                # Bu high'dan sonra gelen ilk swing low kırıldıysa BEARISH CHOCH
+                k = np.searchsorted(low_idx, curr_high['index'], side='right')
+                if k < len(low_idx) and low_breaks[k] >= 0:
+                    j = int(low_breaks[k])
+                    self.bearish_signals.append({
+                        'type': 'BEARISH_CHOCH',
+                        'swing_high': curr_high['price'],
+                        'swing_low': low_prices[k],
+                        'break_price': closes[j],
+                        'break_timestamp': self.bars.timestamp(j),
+                        'choch_level': low_prices[k]
+                    })
+
+    def detect_choch(self):
+        """İki yönü de aynı swing noktalarından tespit et"""
+        self.detect_bullish_choch()
+        self.detect_bearish_choch()
+
+    def active_signal(self, bullish, distance_pct=2.0):
+        """Fiyat CHOCH seviyesinden distance_pct'ten fazla uzaklaşmadıysa en son sinyal aktif"""
+        signals = self.bullish_signals if bullish else self.bearish_signals
+        if not signals:
+            return None
+
+        current_price = self.bars.close[-1]
+        active_signals = []
+
+        for signal in signals:
+            choch_level = signal['choch_level']
+            distance = abs((current_price - choch_level) / choch_level * 100)
+
+            if distance <= distance_pct:
+                signal_info = {
+                    'symbol': self.symbol,
+                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'signal_type': signal['type'],
+                    'choch_level': float(round(choch_level, 4)),
+                    'current_price': float(round(current_price, 4)),
+                    'distance_pct': float(round(distance, 2)),
+                    'max_distance_pct': distance_pct,
+                    'signal_active': True,
+                    'break_timestamp': signal['break_timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+                }
+                if not bullish:
+                    signal_info['interval'] = self.interval  # Short sinyalleri 30m/15m olabilir
+                active_signals.append(signal_info)
+
+        # En son sinyali döndür
+        return active_signals[-1] if active_signals else None
+
+    def active_signals(self, distance_pct=2.0):
+        """(aktif bullish, aktif bearish) sinyaller"""
+        return self.active_signal(True, distance_pct), self.active_signal(False, distance_pct)
+
+# ---------- MEMO ----------
+_memo: "OrderedDict[tuple, Tuple[Optional[Dict], Optional[Dict]]]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+def analyze_choch(symbol: str, interval: str, klines: Optional[List[list]] = None, limit: int = 200,
+                  lookback: int = 3, distance_pct: float = 2.0) -> Tuple[bool, Optional[Dict], Optional[Dict]]:
+    """
+    (veri alındı mı, aktif bullish CHOCH, aktif bearish CHOCH). Aynı pencere
+    (aynı ilk bar, son bar ve uzunluk) için analiz tekrar yapılmaz.
+    """
+    try:
+        data = klines if klines is not None else fetch_klines(symbol, interval, limit)
+    except Exception as e:
+        print(f"❌ {symbol} veri çekme hatası: {e}")
+        return False, None, None
+
+    # Kapanmış barlar değişmez; oluşmakta olan son bar tamamıyla anahtara girer
+    key = (symbol, interval, len(data), lookback, distance_pct,
+           tuple(data[0][:1]) if data else (), tuple(data[-1][:5]) if data else ())
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            bullish, bearish = _memo[key]
+            return True, dict(bullish) if bullish else None, dict(bearish) if bearish else None
+
+    analyzer = BidirectionalCHOCHAnalyzer(symbol, interval, limit)
+    if not analyzer.fetch_binance_data(data):
+        return False, None, None
+    analyzer.find_swing_points(lookback=lookback)
+    analyzer.detect_choch()
+    bullish, bearish = analyzer.active_signals(distance_pct)
+
+    with _memo_lock:
+        _memo[key] = (bullish, bearish)
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return True, dict(bullish) if bullish else None, dict(bearish) if bearish else None
@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import asyncio, aiohttp, socket, json, time
+import asyncio, aiohttp, socket, json, os, time
 from aiohttp import ClientTimeout, TCPConnector
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+
+import kline_cache
+import rate_limiter
+from json_writer import write_json
+from metrics import get_metrics, parse_weight
 
 # ---------- CONFIG ----------
 TARGET_SIZE        = 50  # Test için küçültüldü
@@ -14,114 +19,240 @@ OUTFILE            = "coins.json"
 BINANCE_FAPI_HOSTS = ["fapi.binance.com","fapi1.binance.com","fapi2.binance.com","fapi3.binance.com"]
 REQ_TIMEOUT        = 30
 MAX_RETRY          = 2  
-CONCURRENCY        = 10
+CONCURRENCY        = rate_limiter.MAX_CONCURRENCY  # Üst sınır; gerçek eşzamanlılığı rate_limiter ayarlar
+
+# exchangeInfo, 24s hacimler ve sembol kalite kararları döngüler arasında saklanır
+UNIVERSE_CACHE_FILE = os.getenv("UNIVERSE_CACHE_FILE", ".universe_cache.json")
+EXCHANGE_INFO_TTL   = int(os.getenv("EXCHANGE_INFO_TTL", "21600"))  # 6 saat
+TICKER_TTL          = int(os.getenv("TICKER_TTL", "900"))           # Hacim sıralaması için 15 dakika
+VERDICT_TTL         = int(os.getenv("VERDICT_TTL", "14400"))        # Chart kalite kararı için 4 saat
+
+# Aynı anda doğrulanan sembol sayısı (her biri REQUIRED_INTERVALS kadar eşzamanlı istek)
+VALIDATION_IN_FLIGHT = int(os.getenv("VALIDATION_IN_FLIGHT", str(CONCURRENCY)))
+SYMBOL_TIMEOUT       = 45
 
 # ---------- HTTP ----------
+def make_session() -> aiohttp.ClientSession:
+    """Binance FAPI için ortak ayarlı HTTP oturumu"""
+    timeout   = ClientTimeout(total=60, connect=15)
+    connector = TCPConnector(ttl_dns_cache=600, family=socket.AF_INET, ssl=True, limit=100)
+    return aiohttp.ClientSession(timeout=timeout, connector=connector)
+
 async def fetch_json(session: aiohttp.ClientSession, path: str, params: Dict | None = None):
+    limiter = rate_limiter.get_limiter()
+    weight = rate_limiter.request_weight(path, params)
     last_exc = None
     for attempt in range(MAX_RETRY):
         for host in BINANCE_FAPI_HOSTS:
             url = f"https://{host}{path}"
-            try:
-                async with session.get(url, params=params) as r:
-                    r.raise_for_status()
-                    return await r.json()
-            except Exception as e:
-                last_exc = e
-                continue
+            status, body = 0, b""
+            # Ağırlık bütçesi/429 beklemesi hak alınırken yapılır
+            async with limiter.request_async(weight) as slot:
+                started = time.perf_counter()
+                try:
+                    async with session.get(url, params=params) as r:
+                        status = r.status
+                        body = await r.read()
+                        slot.update(status, r.headers)
+                        get_metrics().record_http(host, path, status, time.perf_counter() - started,
+                                                  len(body), parse_weight(r.headers))
+                        r.raise_for_status()
+                        return json.loads(body)
+                except Exception as e:
+                    if status == 0:
+                        # Yanıt alınamadı (bağlantı/timeout) - yine de gecikme ve hata sayılsın
+                        get_metrics().record_http(host, path, 0, time.perf_counter() - started, 0)
+                    last_exc = e
+                    continue
         await asyncio.sleep(2 ** attempt)
     raise last_exc
 
+async def fetch_klines(session: aiohttp.ClientSession, symbol: str, interval: str, limit: int) -> List[list]:
+    """kline_cache üzerinden çek: cache geçerliyse HTTP yok, değilse artımlı/tam indirme"""
+    kl, params = kline_cache.plan_fetch(symbol, interval, limit)
+    if kl is not None:
+        return kl
+    kl = kline_cache.apply_fetch(symbol, interval, limit, params,
+                                 await fetch_json(session, "/fapi/v1/klines", params))
+    if kl is None:
+        # Artımlı yanıtta boşluk var - tüm pencereyi baştan indir
+        params = kline_cache.full_params(symbol, interval, limit)
+        kl = kline_cache.apply_fetch(symbol, interval, limit, params,
+                                     await fetch_json(session, "/fapi/v1/klines", params))
+    return kl
+
+# ---------- UNIVERSE CACHE ----------
+def _criteria() -> Dict:
+    # Kararlar bu kriterlere göre verildi; kriter değişirse eski kararlar geçersiz
+    return {"required_intervals": REQUIRED_INTERVALS, "min_bars": MIN_BARS}
+
+def load_universe_cache(path: str = UNIVERSE_CACHE_FILE) -> Dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    if cache.get("criteria") != _criteria():
+        cache["verdicts"] = {}
+    cache["criteria"] = _criteria()
+    cache.setdefault("verdicts", {})
+    return cache
+
+def save_universe_cache(cache: Dict, path: str = UNIVERSE_CACHE_FILE):
+    try:
+        write_json(path, cache, compact=True)
+    except OSError as e:
+        print(f"⚠️  Evren önbelleği kaydedilemedi: {e}")
+
+def _is_fresh(entry: Optional[Dict], ttl: int, now: float) -> bool:
+    return bool(entry) and now - entry.get("fetched_at", 0) < ttl
+
+def cached_verdict(cache: Dict, symbol: str, now: Optional[float] = None) -> Optional[bool]:
+    """Süresi dolmamış kalite kararı (True/False), yoksa None"""
+    verdict = cache["verdicts"].get(symbol)
+    now = time.time() if now is None else now
+    if verdict and now - verdict["checked_at"] < VERDICT_TTL:
+        return verdict["ok"]
+    return None
+
+def record_verdict(cache: Dict, symbol: str, ok: bool, now: Optional[float] = None):
+    cache["verdicts"][symbol] = {"ok": ok, "checked_at": time.time() if now is None else now}
+
 # ---------- BUSINESS ----------
-async def get_all_perp_sorted(session: aiohttp.ClientSession) -> List[str]:
-    tickers = await fetch_json(session, "/fapi/v1/ticker/24hr")
-    info    = await fetch_json(session, "/fapi/v1/exchangeInfo")
-    perp_usdt = {s["symbol"] for s in info["symbols"]
-                 if s["contractType"] == "PERPETUAL" and s["quoteAsset"] == "USDT"}
-    rows = [(t["symbol"], float(t["quoteVolume"])) for t in tickers if t["symbol"] in perp_usdt]
+async def get_all_perp_sorted(session: aiohttp.ClientSession, cache: Optional[Dict] = None) -> List[str]:
+    """USDT perpetual semboller, 24s hacme göre sıralı (cache verilirse TTL içinde tekrar indirilmez)"""
+    cache = {} if cache is None else cache
+    now = time.time()
+
+    if not _is_fresh(cache.get("exchange_info"), EXCHANGE_INFO_TTL, now):
+        info = await fetch_json(session, "/fapi/v1/exchangeInfo")
+        cache["exchange_info"] = {
+            "fetched_at": now,
+            "symbols": sorted(s["symbol"] for s in info["symbols"]
+                              if s["contractType"] == "PERPETUAL" and s["quoteAsset"] == "USDT")
+        }
+    if not _is_fresh(cache.get("tickers"), TICKER_TTL, now):
+        tickers = await fetch_json(session, "/fapi/v1/ticker/24hr")
+        cache["tickers"] = {"fetched_at": now,
+                            "volumes": {t["symbol"]: float(t["quoteVolume"]) for t in tickers}}
+
+    perp_usdt = set(cache["exchange_info"]["symbols"])
+    rows = [(s, v) for s, v in cache["tickers"]["volumes"].items() if s in perp_usdt]
     rows.sort(key=lambda x: x[1], reverse=True)
     return [s for s, _ in rows]  # tüm liste, hacme göre sıralı
 
-async def kline_ok(session: aiohttp.ClientSession, symbol: str, interval: str, min_bars: int) -> bool:
+async def kline_ok(session: aiohttp.ClientSession, symbol: str, interval: str, min_bars: int) -> Optional[bool]:
+    """Chart kalitesi yeterli mi; veri alınamadıysa (ağ hatası) None"""
     try:
-        kl = await fetch_json(session, "/fapi/v1/klines",
-                              {"symbol": symbol, "interval": interval, "limit": min_bars})
-        if not kl or len(kl) < min_bars:
-            return False
-        highs  = [float(x[2]) for x in kl]
-        lows   = [float(x[3]) for x in kl]
-        vols   = [float(x[5]) for x in kl]
-        same_price_ratio = sum(1 for h, l in zip(highs, lows) if h == l) / len(kl)
-        zero_vol_ratio   = sum(1 for v in vols if v == 0.0) / len(kl)
-        return same_price_ratio <= 0.2 and zero_vol_ratio <= 0.2
+        kl = await fetch_klines(session, symbol, interval, min_bars)
     except Exception:
+        return None
+    if not kl or len(kl) < min_bars:
         return False
+    highs  = [float(x[2]) for x in kl]
+    lows   = [float(x[3]) for x in kl]
+    vols   = [float(x[5]) for x in kl]
+    same_price_ratio = sum(1 for h, l in zip(highs, lows) if h == l) / len(kl)
+    zero_vol_ratio   = sum(1 for v in vols if v == 0.0) / len(kl)
+    return same_price_ratio <= 0.2 and zero_vol_ratio <= 0.2
 
-async def symbol_has_chart(session: aiohttp.ClientSession, symbol: str, sem: asyncio.Semaphore) -> bool:
-    async with sem:
-        for itv in REQUIRED_INTERVALS:
-            if not await kline_ok(session, symbol, itv, MIN_BARS[itv]):
-                return False
-    return True
+async def symbol_has_chart(session: aiohttp.ClientSession, symbol: str) -> Optional[bool]:
+    """Tüm interval'ler eşzamanlı kontrol edilir; ilk olumsuz sonuçta diğer istekler iptal edilir"""
+    checks = [asyncio.create_task(kline_ok(session, symbol, itv, MIN_BARS[itv])) for itv in REQUIRED_INTERVALS]
+    try:
+        for check in asyncio.as_completed(checks):
+            ok = await check
+            if not ok:
+                return ok
+        return True
+    finally:
+        for check in checks:
+            check.cancel()
 
-# ---------- MAIN ----------
-async def main():
-    timeout   = ClientTimeout(total=60, connect=15)
-    connector = TCPConnector(ttl_dns_cache=600, family=socket.AF_INET, ssl=True, limit=100)
-    sem       = asyncio.Semaphore(CONCURRENCY)
-
-    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
-        all_syms = await get_all_perp_sorted(session)
-
-        valid: List[str]   = []
-        skipped: List[str] = []
-        tasks: List[Tuple[str, asyncio.Task]] = []
-
-        # Batch işlem - küçük gruplar halinde işle
-        batch_size = 25
-        processed = 0
-        
-        while len(valid) < TARGET_SIZE and processed < len(all_syms):
-            # Batch oluştur
-            current_batch = all_syms[processed:processed + batch_size]
-            batch_tasks = []
-            
-            # Batch için task'ları oluştur
-            for sym in current_batch:
-                task = asyncio.create_task(symbol_has_chart(session, sym, sem))
-                batch_tasks.append((sym, task))
-            
-            # Batch'i bekle
-            for sym, task in batch_tasks:
+async def validate_universe(session: aiohttp.ClientSession, symbols: List[str], cache: Dict,
+                            target: int = TARGET_SIZE) -> Tuple[List[str], List[str], Dict]:
+    """
+    Hacim sırasındaki sembolleri akış halinde doğrula: sürekli VALIDATION_IN_FLIGHT
+    kontrol açık tutulur, sonuçlar sıra korunarak işlenir ve sıralı önekte
+    `target` geçerli sembol tamamlanınca kalan kontroller iptal edilir.
+    """
+    valid: List[str] = []
+    skipped: List[str] = []
+    stats = {"reused": 0, "checked": 0, "timeouts": 0, "cancelled": 0}
+    results: Dict[int, Tuple[Optional[bool], str]] = {}  # sıra -> (karar, kaynak)
+    in_flight: Dict[asyncio.Task, int] = {}
+    next_index = 0
+    emitted = 0
+
+    def launch():
+        nonlocal next_index
+        while len(in_flight) < VALIDATION_IN_FLIGHT and next_index < len(symbols) and len(valid) < target:
+            verdict = cached_verdict(cache, symbols[next_index])
+            if verdict is None:
+                task = asyncio.create_task(asyncio.wait_for(symbol_has_chart(session, symbols[next_index]),
+                                                            timeout=SYMBOL_TIMEOUT))
+                in_flight[task] = next_index
+            else:
+                results[next_index] = (verdict, "cache")
+                stats["reused"] += 1
+            next_index += 1
+
+    def drain():
+        # Sadece kesintisiz tamamlanmış önek işlenir; böylece sıra hacim sırası kalır
+        nonlocal emitted
+        while emitted in results and len(valid) < target:
+            ok, source = results.pop(emitted)
+            sym = symbols[emitted]
+            note = " - önbellek" if source == "cache" else ""
+            if ok:
+                valid.append(sym)
+                print(f"✅ {sym} eklendi ({len(valid)}/{target}{note})")
+            elif source == "timeout":
+                skipped.append(sym)
+                print(f"⏰ {sym} timeout")
+            else:
+                skipped.append(sym)
+                print(f"❌ {sym} atlandı ({'veri alınamadı' if ok is None else 'chart sorunu'}{note})")
+            emitted += 1
+
+    try:
+        launch()
+        drain()
+        while in_flight and len(valid) < target:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = in_flight.pop(task)
                 try:
-                    ok = await asyncio.wait_for(task, timeout=45)
-                    if ok:
-                        valid.append(sym)
-                        print(f"✅ {sym} eklendi ({len(valid)}/{TARGET_SIZE})")
-                    else:
-                        skipped.append(sym)
-                        print(f"❌ {sym} atlandı (chart sorunu)")
+                    ok, source = task.result(), "check"
+                    stats["checked"] += 1
+                    if ok is not None:
+                        record_verdict(cache, symbols[index], ok)
                 except asyncio.TimeoutError:
-                    print(f"⏰ {sym} timeout")
-                    skipped.append(sym)
-                    task.cancel()
-                except Exception as e:
-                    print(f"❌ {sym} hata: {e}")
-                    skipped.append(sym)
-                
-                # Hedefe ulaşıldıysa dur
-                if len(valid) >= TARGET_SIZE:
-                    # Kalan task'ları iptal et
-                    for remaining_sym, remaining_task in batch_tasks:
-                        if not remaining_task.done():
-                            remaining_task.cancel()
-                    break
-            
-            processed += batch_size
-            
-            # Batch'ler arası kısa mola
-            if len(valid) < TARGET_SIZE and processed < len(all_syms):
-                await asyncio.sleep(1)
+                    ok, source = None, "timeout"
+                    stats["timeouts"] += 1
+                except Exception:
+                    ok, source = None, "error"
+                results[index] = (ok, source)
+            drain()
+            launch()
+            drain()
+    finally:
+        # Hedef tamamlandı - sıralamada sonra gelen kontroller gereksiz
+        stats["cancelled"] = len(in_flight)
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+    return valid, skipped, stats
+
+# ---------- MAIN ----------
+async def main():
+    cache = load_universe_cache()
+    started = time.perf_counter()
+
+    async with make_session() as session:
+        all_syms = await get_all_perp_sorted(session, cache)
+        valid, skipped, stats = await validate_universe(session, all_syms, cache, TARGET_SIZE)
 
     payload = {
         "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
@@ -130,11 +261,14 @@ async def main():
         "symbols": valid[:TARGET_SIZE],
         "skipped": skipped
     }
-    with open(OUTFILE, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+    write_json(OUTFILE, payload)
+    save_universe_cache(cache)
 
-    print(f"{len(valid[:TARGET_SIZE])} sembol yazıldı -> {OUTFILE}")
+    print(f"{len(valid[:TARGET_SIZE])} sembol yazıldı -> {OUTFILE} ({time.perf_counter() - started:.1f}s)")
+    print(f"♻️  {stats['reused']} sembol önbellekteki karardan, {stats['checked']} sembol yeniden doğrulandı, "
+          f"{stats['cancelled']} gereksiz kontrol iptal edildi")
     print(f"Atılan (chart yok/bozuk) : {len(skipped)}")
+    return payload
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
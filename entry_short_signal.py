@@ -1,154 +1,29 @@
-import pandas as pd
-import numpy as np
-import requests
+from kline_cache import get_cached
+from kline_fetcher import prefetch
+from choch_analyzer import BidirectionalCHOCHAnalyzer, analyze_choch
+import analysis_pool
+import stage_cancel
+from metrics import get_metrics
+from json_writer import write_json
 import json
 import time
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
-class BearishCHOCHAnalyzer:
-    """30 dakikalık ve 15 dakikalık grafikte Bearish CHOCH (Change of Character) analizi yapan sınıf"""
+class BearishCHOCHAnalyzer(BidirectionalCHOCHAnalyzer):
+    """30 dakikalık ve 15 dakikalık grafikte Bearish CHOCH analizi yapan sınıf (iki yönlü analizörün short görünümü)"""
     
     def __init__(self, symbol, interval="30m", limit=200):
-        self.symbol = symbol
-        self.interval = interval
-        self.limit = limit
-        self.data = None
-        self.swing_lows = []
-        self.swing_highs = []
-        self.last_choch = None
-        self.choch_signals = []
-        
-    def fetch_binance_data(self):
-        """Binance'den veri çek"""
-        url = "https://fapi.binance.com/fapi/v1/klines"
-        params = {
-            'symbol': self.symbol,
-            'interval': self.interval,
-            'limit': self.limit
-        }
-        
-        try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            df = pd.DataFrame(data, columns=[
-                'timestamp', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'quote_asset_volume', 'number_of_trades',
-                'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-            ])
-            
-            for col in ['open', 'high', 'low', 'close', 'volume']:
-                df[col] = pd.to_numeric(df[col])
-            
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('timestamp', inplace=True)
-            
-            self.data = df[['open', 'high', 'low', 'close', 'volume']].copy()
-            self.data.columns = ['Open', 'High', 'Low', 'Close', 'Volume']
-            
-            return True
-            
-        except Exception as e:
-            print(f"❌ {self.symbol} veri çekme hatası: {e}")
-            return False
+        super().__init__(symbol, interval, limit)
     
-    def find_swing_points(self, lookback=5):
-        """Swing high ve swing low noktalarını tespit et"""
-        self.swing_lows = []
-        self.swing_highs = []
-        
-        for i in range(lookback, len(self.data) - lookback):
-            # Swing Low tespiti
-            current_low = self.data['Low'].iloc[i]
-            left_lows = self.data['Low'].iloc[i-lookback:i]
-            right_lows = self.data['Low'].iloc[i+1:i+lookback+1]
-            
-            if current_low < left_lows.min() and current_low < right_lows.min():
-                self.swing_lows.append({
-                    'price': current_low,
-                    'index': i,
-                    'timestamp': self.data.index[i]
-                })
-            
-            # Swing High tespiti
-            current_high = self.data['High'].iloc[i]
-            left_highs = self.data['High'].iloc[i-lookback:i]
-            right_highs = self.data['High'].iloc[i+1:i+lookback+1]
-            
-            if current_high > left_highs.max() and current_high > right_highs.max():
-                self.swing_highs.append({
-                    'price': current_high,
-                    'index': i,
-                    'timestamp': self.data.index[i]
-                })
-    
-    def detect_bearish_choch(self):
-        """Bearish CHOCH (Change of Character) tespiti - Yükseliş trendinden düşüş trendine geçiş"""
-        self.choch_signals = []
-        
-        if len(self.swing_lows) < 2 or len(self.swing_highs) < 2:
-            return
-        
-        # Son swing high'ları kontrol et
-        for i in range(1, len(self.swing_highs)):
-            prev_high = self.swing_highs[i-1]
-            curr_high = self.swing_highs[i]
-            
-            # Yükseliş trendi: Yeni high, öncekinden yüksek
-            if curr_high['price'] > prev_high['price']:
-                # Bu high'dan sonra gelen swing low'ları kontrol et
-                for swing_low in self.swing_lows:
-                    if swing_low['timestamp'] > curr_high['timestamp']:
-                        # Bu swing low'ın kırılıp kırılmadığını kontrol et
-                        break_index = swing_low['index']
-                        
-                        for j in range(break_index + 1, len(self.data)):
-                            if self.data['Close'].iloc[j] < swing_low['price']:
-                                # BEARISH CHOCH gerçekleşti!
-                                choch_signal = {
-                                    'type': 'BEARISH_CHOCH',
-                                    'swing_high': curr_high['price'],
-                                    'swing_low': swing_low['price'],
-                                    'break_price': self.data['Close'].iloc[j],
-                                    'break_timestamp': self.data.index[j],
-                                    'choch_level': swing_low['price']
-                                }
-                                self.choch_signals.append(choch_signal)
-                                break
-                        break
+    @property
+    def choch_signals(self):
+        return self.bearish_signals
     
     def check_active_signals(self, distance_pct=2.0):
         """Aktif sinyalleri kontrol et - Fiyat CHOCH seviyesinden %2 uzaklaşmadıysa sinyal aktif"""
-        if not self.choch_signals:
-            return None
-        
-        current_price = self.data['Close'].iloc[-1]
-        active_signals = []
-        
-        for signal in self.choch_signals:
-            choch_level = signal['choch_level']
-            distance = abs((current_price - choch_level) / choch_level * 100)
-            
-            if distance <= distance_pct:
-                signal_info = {
-                    'symbol': self.symbol,
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'signal_type': 'BEARISH_CHOCH',
-                    'choch_level': float(round(choch_level, 4)),
-                    'current_price': float(round(current_price, 4)),
-                    'distance_pct': float(round(distance, 2)),
-                    'max_distance_pct': distance_pct,
-                    'signal_active': True,
-                    'break_timestamp': signal['break_timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
-                    'interval': self.interval
-                }
-                active_signals.append(signal_info)
-        
-        # En son sinyali döndür
-        return active_signals[-1] if active_signals else None
+        return self.active_signal(False, distance_pct)
 
 def load_coins_from_json(filename='coins.json'):
     """coins.json dosyasından coin listesini yükle"""
@@ -160,16 +35,17 @@ def load_coins_from_json(filename='coins.json'):
         print(f"❌ {filename} dosyası okunamadı: {e}")
         return []
 
-def check_coin_above_range(symbol):
+def check_coin_above_range(symbol, klines_by_interval=None):
     """Belirli bir coin'in 2h ve 4h chartta range üstünde olup olmadığını kontrol et"""
     from primary_test import SimplifiedSMC
     
     above_range_timeframes = []
+    klines_by_interval = klines_by_interval or {}
     
     # 4h kontrolü
     try:
         smc_4h = SimplifiedSMC(symbol, interval="4h", limit=500)
-        if smc_4h.analyze():
+        if smc_4h.analyze(klines_by_interval.get('4h')):
             signal_4h = smc_4h.get_signal_json()
             if signal_4h and signal_4h.get('current_price', 0) > signal_4h.get('range_high', 0):
                 above_range_timeframes.append('4h')
@@ -179,7 +55,7 @@ def check_coin_above_range(symbol):
     # 2h kontrolü  
     try:
         smc_2h = SimplifiedSMC(symbol, interval="2h", limit=500)
-        if smc_2h.analyze():
+        if smc_2h.analyze(klines_by_interval.get('2h')):
             signal_2h = smc_2h.get_signal_json()
             if signal_2h and signal_2h.get('current_price', 0) > signal_2h.get('range_high', 0):
                 above_range_timeframes.append('2h')
@@ -188,75 +64,158 @@ def check_coin_above_range(symbol):
         
     return above_range_timeframes
 
-def get_long_signals_from_primary(coin_symbols):
-    """primary_test.py'den long sinyalleri al"""
+def above_range_from_primary(coin_symbols, primary_results):
+    """primary_test sonuçlarından range üstündeki timeframe'ler (check_coin_above_range ile aynı kural)"""
+    wanted = set(coin_symbols)
+    above = {}
+    for signal in primary_results.get('all_results', []):
+        if signal['symbol'] in wanted and signal.get('current_price', 0) > signal.get('range_high', 0):
+            above.setdefault(signal['symbol'], set()).add(signal['interval'])
+    return {symbol: [interval for interval in ['4h', '2h'] if interval in intervals]
+            for symbol, intervals in above.items() if intervals & {'4h', '2h'}}
+
+def get_long_signals_from_primary(coin_symbols, primary_results=None, long_results=None):
+    """
+    Long sinyalleri al. Aynı döngüde hesaplanmış primary_test (range) ve
+    entry_long_signal (15m CHOCH) sonuçları verilirse onlar kullanılır;
+    sadece sonucu olmayan coinler yeniden analiz edilir.
+    """
     from primary_test import SimplifiedSMC
     
     range_ici = []  # Range içinde olanlar (range_50 = true)
     entry_sinyali = []  # Entry sinyali olanlar (15m CHOCH var)
     
+    primary_by_symbol = None
+    if primary_results:
+        primary_by_symbol = {}
+        for signal in primary_results.get('all_results', []):
+            primary_by_symbol.setdefault(signal['symbol'], []).append(signal)
+    long_by_symbol = {}
+    if long_results:
+        long_by_symbol = {result['symbol']: result for result in long_results.get('all_results', [])}
+    
+    # Sadece yeniden analiz edilecek pencereleri paralel indir
+    if primary_by_symbol is None:
+        prefetch(coin_symbols, {'4h': 500, '2h': 500})
+    prefetch([symbol for symbol in coin_symbols if symbol not in long_by_symbol], {'15m': 200})
+    
     for symbol in coin_symbols:
+        stage_cancel.check()
         try:
             # 4h ve 2h için long analizi
-            for interval in ['4h', '2h']:
-                smc = SimplifiedSMC(symbol, interval, 500)
-                if smc.analyze():
-                    signal = smc.get_signal_json()
-                    if signal and signal.get('range_50'):  # Range içinde ve %50 altında
-                        range_ici.append({
-                            'symbol': symbol,
-                            'interval': interval,
-                            'current_price': signal['current_price'],
-                            'range_position_pct': signal['range_position_pct']
-                        })
+            if primary_by_symbol is not None:
+                signals = [s for s in primary_by_symbol.get(symbol, []) if s['interval'] in ('4h', '2h')]
+            else:
+                signals = []
+                for interval in ['4h', '2h']:
+                    smc = SimplifiedSMC(symbol, interval, 500)
+                    if smc.analyze():
+                        signal = smc.get_signal_json()
+                        if signal:
+                            signals.append({**signal, 'interval': interval})
             
-            # 15m CHOCH analizi (entry_long_signal.py mantığı)
-            from entry_long_signal import CHOCHAnalyzer
-            analyzer_15m = CHOCHAnalyzer(symbol, interval="15m", limit=200)
-            if analyzer_15m.fetch_binance_data():
-                analyzer_15m.find_swing_points(lookback=3)
-                analyzer_15m.detect_bullish_choch()
-                choch_signal = analyzer_15m.check_active_signals(distance_pct=2.0)
-                if choch_signal:
-                    entry_sinyali.append({
+            for signal in signals:
+                if signal.get('range_50'):  # Range içinde ve %50 altında
+                    range_ici.append({
                         'symbol': symbol,
-                        'current_price': choch_signal['current_price'],
-                        'choch_level': choch_signal['choch_level']
+                        'interval': signal['interval'],
+                        'current_price': signal['current_price'],
+                        'range_position_pct': signal['range_position_pct']
                     })
+            
+            # 15m CHOCH analizi (entry_long_signal.py mantığı; short taraması aynı pencereyi
+            # analiz ettiyse sonuç hazırdır)
+            if symbol in long_by_symbol:
+                choch_signal = long_by_symbol[symbol] if long_by_symbol[symbol].get('signal_active') else None
+            else:
+                _, choch_signal, _ = analyze_choch(symbol, "15m", limit=200, lookback=3, distance_pct=2.0)
+            if choch_signal:
+                entry_sinyali.append({
+                    'symbol': symbol,
+                    'current_price': choch_signal['current_price'],
+                    'choch_level': choch_signal['choch_level']
+                })
                     
         except Exception:
             continue
     
     return range_ici, entry_sinyali
 
-def analyze_all_coins_for_signals(coin_symbols):
-    """Tüm coinleri tarayıp short ve long sinyalleri bul"""
+def above_range_task(task):
+    """(symbol, {interval: klines}) için range üstü kontrolü; process havuzunda da çalışır"""
+    symbol, klines_by_interval = task
+    return check_coin_above_range(symbol, klines_by_interval)
+
+def detect_short_entry_task(task):
+    """(symbol, {interval: klines}) için 30m/15m bearish CHOCH - (signal_30m, signal_15m); process havuzunda da çalışır"""
+    symbol, klines_by_interval = task
+    signals = []
+    for interval in ['30m', '15m']:
+        # Tek swing geçişi iki yönü de üretir; 15m bullish sonucu long listesi için saklanır
+        _, _, signal = analyze_choch(symbol, interval, klines_by_interval.get(interval), limit=200,
+                                     lookback=3, distance_pct=2.0)
+        signals.append(signal)
+    return tuple(signals)
+
+def _cached_windows(symbols, intervals):
+    # Paralel görevler için cache'teki pencereler (eksikler worker'da indirilir)
+    return [(symbol, {interval: get_cached(symbol, interval, limit) for interval, limit in intervals.items()})
+            for symbol in symbols]
+
+def analyze_all_coins_for_signals(coin_symbols, parallel=None, primary_results=None):
+    """Tüm coinleri tarayıp short sinyalleri bul (primary_results verilirse range üstü kontrolü ondan okunur)"""
     short_signals = []
     
     print(f"🔍 {len(coin_symbols)} coin taranıyor...")
     
+    parallel = analysis_pool.is_enabled(parallel)
+    if primary_results:
+        # 1. Range üstü: primary_test bu döngüde 4h/2h range'lerini zaten hesapladı
+        above_range = above_range_from_primary(coin_symbols, primary_results)
+    else:
+        # 1. Range üstü kontrolü için 4h/2h pencerelerini paralel indir
+        prefetch(coin_symbols, {'4h': 500, '2h': 500})
+        
+        if parallel:
+            above_range_results = analysis_pool.map_ordered(
+                above_range_task, _cached_windows(coin_symbols, {'4h': 500, '2h': 500}), "above_range")
+        else:
+            above_range_results = []
+            for symbol in coin_symbols:
+                stage_cancel.check()
+                with get_metrics().timed_symbol("above_range", symbol):
+                    above_range_results.append(above_range_task((symbol, None)))
+        
+        above_range = {}
+        for symbol, result in zip(coin_symbols, above_range_results):
+            if result and not isinstance(result, Exception):
+                above_range[symbol] = result
+    
+    # 2. Sadece range üstündeki coinler için 30m/15m pencerelerini indir
+    prefetch(above_range.keys(), {'30m': 200, '15m': 200})
+    
+    # 3. Paralel modda CHOCH analizi process havuzunda yapılır
+    precomputed = {}
+    if parallel:
+        tasks = _cached_windows(above_range.keys(), {'30m': 200, '15m': 200})
+        for task, result in zip(tasks, analysis_pool.map_ordered(detect_short_entry_task, tasks, "BearishCHOCHAnalyzer")):
+            precomputed[task[0]] = result
+    
     for idx, symbol in enumerate(coin_symbols, 1):
+        stage_cancel.check()  # Timeout'a uğrayan aşama sonuç yazmadan çıkar
         print(f"[{idx}/{len(coin_symbols)}] {symbol}", end=" ")
         
         try:
             # Short sinyal kontrolü
-            above_range_timeframes = check_coin_above_range(symbol)
+            above_range_timeframes = above_range.get(symbol)
             
             if above_range_timeframes:
                 # CHOCH analizi yap
-                analyzer_30m = BearishCHOCHAnalyzer(symbol, interval="30m", limit=200)
-                signal_30m = None
-                if analyzer_30m.fetch_binance_data():
-                    analyzer_30m.find_swing_points(lookback=3)
-                    analyzer_30m.detect_bearish_choch()
-                    signal_30m = analyzer_30m.check_active_signals(distance_pct=2.0)
-                
-                analyzer_15m = BearishCHOCHAnalyzer(symbol, interval="15m", limit=200)
-                signal_15m = None
-                if analyzer_15m.fetch_binance_data():
-                    analyzer_15m.find_swing_points(lookback=3)
-                    analyzer_15m.detect_bearish_choch()
-                    signal_15m = analyzer_15m.check_active_signals(distance_pct=2.0)
+                if symbol in precomputed:
+                    signal_30m, signal_15m = analysis_pool.unwrap(precomputed[symbol])
+                else:
+                    with get_metrics().timed_symbol("BearishCHOCHAnalyzer", symbol):
+                        signal_30m, signal_15m = detect_short_entry_task((symbol, {}))
                 
                 if signal_30m or signal_15m:
                     short_signals.append({
@@ -271,33 +230,26 @@ def analyze_all_coins_for_signals(coin_symbols):
             else:
                 print("⏭️")
             
-            time.sleep(0.3)
-            
         except Exception:
             print("❌")
             continue
     
     return short_signals
 
-def main():
-    """Ana fonksiyon"""
-    print("🚀 Sinyal Tarayıcısı Başlatılıyor...")
-    
-    # coins.json'dan coin listesini yükle
-    coin_symbols = load_coins_from_json('coins.json')
-    
-    if not coin_symbols:
-        print("❌ coins.json yüklenemedi!")
-        return
-    
+def run_signal_scan(coin_symbols, save_to_file=True, primary_results=None, long_results=None):
+    """
+    Short ve long sinyalleri topla, entry_short_signals.json'a yaz ve sonuçları döndür.
+    primary_results / long_results: aynı döngüde primary_test ve entry_long_signal
+    aşamalarının sonuçları (verilmezse gerekli analizler burada yapılır).
+    """
     print(f"📋 {len(coin_symbols)} coin taranacak")
     
     # Short sinyalleri al
-    short_signals = analyze_all_coins_for_signals(coin_symbols)
+    short_signals = analyze_all_coins_for_signals(coin_symbols, primary_results=primary_results)
     
     print(f"\n📊 Long sinyalleri alınıyor...")
     # Long sinyalleri al
-    range_ici, entry_sinyali = get_long_signals_from_primary(coin_symbols)
+    range_ici, entry_sinyali = get_long_signals_from_primary(coin_symbols, primary_results, long_results)
     
     # Sonuçları hazırla
     results = {
@@ -319,16 +271,35 @@ def main():
         }
     }
     
-    # sonuc.json'a yaz
-    with open('sonuc.json', 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
-    
     # Özet göster
     print(f"\n📊 SONUÇLAR:")
     print(f"🔴 Short: {len(short_signals)}")
     print(f"🟢 Long Range İçi: {len(range_ici)}")
     print(f"🟢 Long Entry: {len(entry_sinyali)}")
-    print(f"💾 sonuc.json kaydedildi")
+    
+    # entry_short_signals.json'a yaz (sonuc.json primary_test'in çıktısıdır)
+    if save_to_file:
+        save_signal_results(results)
+    
+    return results
+
+def save_signal_results(results, filename='entry_short_signals.json'):
+    """Short/long tarama sonucunu kaydet"""
+    write_json(filename, results)
+    print(f"💾 {filename} kaydedildi")
+
+def main():
+    """Ana fonksiyon"""
+    print("🚀 Sinyal Tarayıcısı Başlatılıyor...")
+    
+    # coins.json'dan coin listesini yükle
+    coin_symbols = load_coins_from_json('coins.json')
+    
+    if not coin_symbols:
+        print("❌ coins.json yüklenemedi!")
+        return
+    
+    run_signal_scan(coin_symbols)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
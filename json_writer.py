@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hızlı ve atomik JSON yazıcı
+
+Sonuç dosyaları (sonuc.json, alarm_*.json, entry_*_signals.json,
+short_alarm_signal.json, coins.json) doğrudan hedef yola json.dump ile
+yazılıyordu; upload_all_results ya da dışarıdan okuyan biri yarım yazılmış
+dosya görebiliyordu. write_json:
+
+- orjson kuruluysa onunla, değilse standart json ile serileştirir
+- JSON_COMPACT=1 ile girintisiz (küçük) çıktı üretir
+- Aynı dizindeki geçici dosyaya yazar, fsync eder ve os.replace ile
+  yerine koyar; okuyan taraf ya eski ya yeni dosyanın tamamını görür
+- Geçici dosya (mkstemp: 0600) hedefin mevcut izinlerini, yeni dosyalarda
+  umask'e göre open() ile aynı izinleri alır
+"""
+
+import os, json, tempfile
+from typing import Any, Optional
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # Opsiyonel hızlandırma
+    orjson = None
+
+# ---------- CONFIG ----------
+COMPACT_OUTPUT = os.getenv("JSON_COMPACT", "0") == "1"
+
+# ---------- ENCODE ----------
+def _default(obj):
+    # numpy skalerleri (np.float64, np.bool_, np.int64) düz Python tiplerine
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"{type(obj).__name__} JSON'a çevrilemez")
+
+def dumps(obj: Any, compact: Optional[bool] = None) -> bytes:
+    """UTF-8 JSON byte'ları; compact verilmezse JSON_COMPACT ayarı kullanılır"""
+    compact = COMPACT_OUTPUT if compact is None else compact
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if not compact:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    if compact:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2, default=_default).encode("utf-8")
+
+# ---------- WRITE ----------
+def _read_umask() -> int:
+    # os.umask okumak için değiştirmeyi gerektirir; thread'ler dosya açmadan önce (import sırasında) bir kez okunur
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+_UMASK = _read_umask()
+
+def _target_mode(path: str) -> int:
+    """Hedef varsa izinleri, yoksa 0o666 & ~umask (open() ile oluşturulan dosya gibi)"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+def write_json(path: str, obj: Any, compact: Optional[bool] = None, fsync: bool = True) -> int:
+    """
+    obj'u path'e atomik olarak yaz ve yazılan byte sayısını döndür.
+    fsync=False sadece kaybı sorun olmayan cache dosyaları içindir.
+    """
+    data = dumps(obj, compact)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            os.fchmod(f.fileno(), _target_mode(path))
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    if fsync:
+        # Yeniden adlandırmanın da diske işlenmesi için dizini fsync et (destekleyen sistemlerde)
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+    return len(data)
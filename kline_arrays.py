@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kline yanıtını doğrudan numpy dizilerine çözme
+
+fetch_binance_data her çağrıda ham string listesinden 12 kolonlu bir
+DataFrame kuruyor, kolon kolon pd.to_numeric çalıştırıyor, DatetimeIndex
+oluşturup kopyalıyor ve yeniden adlandırıyordu; analizörler ise sadece
+birkaç max/min/kesişim hesabı yapıyor. parse_klines yanıtı tek transpoze
+geçişte bitişik dizilere çevirir:
+
+- open, high, low, close, volume: float64
+- open_time: int64 (ms)
+
+DataFrame sadece hata ayıklama için isteğe bağlı görünümdür (to_frame).
+"""
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+class KlineArrays:
+    """Tek bir symbol/interval penceresinin kolon dizileri"""
+
+    __slots__ = ("open_time", "open", "high", "low", "close", "volume")
+
+    def __init__(self, open_time: np.ndarray, open: np.ndarray, high: np.ndarray,
+                 low: np.ndarray, close: np.ndarray, volume: np.ndarray):
+        self.open_time = open_time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    def timestamp(self, i: int) -> pd.Timestamp:
+        """i. barın açılış zamanı (eski DatetimeIndex değerleriyle aynı tip)"""
+        return pd.Timestamp(int(self.open_time[i]), unit='ms')
+
+    def timestamps(self, indices: np.ndarray) -> List[pd.Timestamp]:
+        """Birden çok barın açılış zamanı (tek vektörel dönüşüm)"""
+        return list(pd.to_datetime(self.open_time[indices], unit='ms'))
+
+    def to_frame(self) -> pd.DataFrame:
+        """Hata ayıklama için eski `self.data` ile aynı DataFrame (Open/High/Low/Close/Volume)"""
+        index = pd.DatetimeIndex(pd.to_datetime(self.open_time, unit='ms'), name='timestamp')
+        return pd.DataFrame({
+            'Open': self.open, 'High': self.high, 'Low': self.low,
+            'Close': self.close, 'Volume': self.volume
+        }, index=index)
+
+def parse_klines(klines: List[list]) -> KlineArrays:
+    """Binance /fapi/v1/klines satırlarını kolon dizilerine çevir"""
+    if len(klines) == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return KlineArrays(np.empty(0, dtype=np.int64), empty, empty, empty, empty, empty)
+
+    # zip(*) tek geçişte satırları kolonlara çevirir; numpy string'leri doğrudan float64'e ayrıştırır
+    columns = list(zip(*klines))
+    return KlineArrays(
+        np.array(columns[0], dtype=np.int64),
+        np.array(columns[1], dtype=np.float64),
+        np.array(columns[2], dtype=np.float64),
+        np.array(columns[3], dtype=np.float64),
+        np.array(columns[4], dtype=np.float64),
+        np.array(columns[5], dtype=np.float64),
+    )
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kline cache katmanı
+
+Bir döngü içinde coins_async, primary_test, entry_long_signal ve
+entry_short_signal aynı (symbol, interval) mumlarını tekrar tekrar indiriyordu.
+Bu modül tüm analizörlerin içinden okuduğu ortak bir cache sağlar:
+
+- Bellek içi LRU (aynı process içindeki tekrarlar için)
+- Disk katmanı (subprocess olarak çalışan scriptler arasında paylaşım için)
+
+Cache anahtarı symbol/interval/son kapanmış mum zamanıdır; yeni bir mum
+kapandığında ya da kayıt CACHE_TTL saniyeden eskiyse veri yenilenir.
+Böylece oluşmakta olan son mumun fiyatı döngüler arasında bayatlamaz.
+
+Artımlı mod (KLINE_INCREMENTAL=1, varsayılan): yenileme sırasında tüm pencere
+yerine sadece son saklanan mumdan (startTime) sonrası istenir, oluşmakta olan
+son mum güncellenir ve yanıtta boşluk varsa pencere baştan indirilir.
+
+Her yazılan pencere ohlcv_store'a da eklenir; process yeniden başladığında
+cache'te kayıt yoksa pencere oradan canlandırılıp artımlı yenilenir.
+"""
+
+import os, json, time, threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+import rate_limiter
+from metrics import get_metrics, parse_weight
+from json_writer import write_json
+
+# ---------- CONFIG ----------
+CACHE_DIR     = os.getenv("KLINE_CACHE_DIR", ".kline_cache")
+CACHE_TTL     = int(os.getenv("KLINE_CACHE_TTL", "240"))  # saniye - bir döngüden (300s) kısa
+INCREMENTAL   = os.getenv("KLINE_INCREMENTAL", "1") != "0"  # Sadece yeni kapanan mumları indir
+MEMORY_SIZE   = 512
+MAX_LIMIT     = 1500  # Binance klines limit üst sınırı
+KLINES_HOST   = "fapi.binance.com"
+KLINES_PATH   = "/fapi/v1/klines"
+KLINES_URL    = f"https://{KLINES_HOST}{KLINES_PATH}"
+REQUEST_TIMEOUT = (15, 60)  # (bağlantı, okuma) saniye - coins_async.make_session ile aynı; ölü soket aşamayı kilitlemesin
+
+# Her interval için herhangi bir aşamanın ihtiyaç duyduğu en geniş pencere.
+# Tek indirme tüm aşamalara yetsin diye her zaman bu kadar bar çekilir.
+SHARED_LIMITS = {"4h": 500, "2h": 500, "30m": 500, "15m": 200}
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "8h": 28_800_000, "12h": 43_200_000, "1d": 86_400_000,
+}
+
+# ---------- HELPERS ----------
+def interval_ms(interval: str) -> int:
+    """Interval süresini milisaniye olarak döndür"""
+    return INTERVAL_MS[interval]
+
+def last_closed_open_time(interval: str, now_ms: Optional[int] = None) -> int:
+    """Son kapanmış mumun açılış zamanı (ms) - cache anahtarının zaman kısmı"""
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    step = interval_ms(interval)
+    return (now_ms // step) * step - step
+
+def fetch_limit(interval: str, limit: int) -> int:
+    """İstenen limit ile interval'in ortak penceresinden büyük olanı döndür"""
+    return min(max(limit, SHARED_LIMITS.get(interval, 0)), MAX_LIMIT)
+
+# ---------- CACHE ----------
+class KlineCache:
+    """Bellek içi LRU + disk katmanlı kline cache"""
+
+    def __init__(self, cache_dir: str = CACHE_DIR, ttl: int = CACHE_TTL, memory_size: int = MEMORY_SIZE):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.memory: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                      "full_fetches": 0, "incremental_fetches": 0, "gaps": 0}
+
+    def _path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.cache_dir, f"{symbol}_{interval}.json")
+
+    def _is_valid(self, entry: Dict, interval: str, limit: int) -> bool:
+        if entry.get("bar_key") != last_closed_open_time(interval):
+            return False
+        if time.time() - entry.get("fetched_at", 0) > self.ttl:
+            return False
+        # Daha küçük bir limitle çekilmiş kayıt daha büyük isteği karşılayamaz
+        return entry.get("limit", 0) >= limit
+
+    def _remember(self, key: tuple, entry: Dict):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def _read_disk(self, symbol: str, interval: str) -> Optional[Dict]:
+        try:
+            with open(self._path(symbol, interval), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, symbol: str, interval: str, entry: Dict):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(symbol, interval)
+            # Atomik (okuyan process yarım dosya görmez); cache kaybı sorun olmadığından fsync yok
+            write_json(path, entry, compact=True, fsync=False)
+        except OSError as e:
+            print(f"⚠️  Kline cache diske yazılamadı ({symbol} {interval}): {e}")
+
+    def lookup(self, symbol: str, interval: str) -> Optional[Dict]:
+        """Geçerlilik kontrolü yapmadan saklanan pencereyi döndür (bellek, sonra disk)"""
+        key = (symbol, interval)
+        with self.lock:
+            entry = self.memory.get(key)
+        if entry and self._is_valid(entry, interval, 0):
+            return entry
+
+        # Bellekteki kayıt bayatsa başka bir process diske daha yenisini yazmış olabilir
+        disk_entry = self._read_disk(symbol, interval)
+        if disk_entry and (not entry or disk_entry.get("fetched_at", 0) > entry.get("fetched_at", 0)):
+            with self.lock:
+                self._remember(key, disk_entry)
+            return disk_entry
+        return entry
+
+    def get(self, symbol: str, interval: str, limit: int) -> Optional[List[list]]:
+        """Geçerli kayıt varsa son `limit` mumu döndür, yoksa None"""
+        key = (symbol, interval)
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry and self._is_valid(entry, interval, limit):
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry["klines"][-limit:]
+
+        entry = self._read_disk(symbol, interval)
+        with self.lock:
+            if entry and self._is_valid(entry, interval, limit):
+                self._remember(key, entry)
+                self.stats["disk_hits"] += 1
+                return entry["klines"][-limit:]
+            self.stats["misses"] += 1
+        return None
+
+    def restore(self, symbol: str, interval: str, limit: int, klines: List[list]) -> Dict:
+        """Dışarıdan canlandırılan pencereyi süresi dolmuş kayıt olarak belleğe al"""
+        entry = {
+            "symbol": symbol,
+            "interval": interval,
+            "limit": limit,
+            "bar_key": None,
+            "fetched_at": 0,
+            "klines": klines,
+        }
+        with self.lock:
+            self._remember((symbol, interval), entry)
+        return entry
+
+    def put(self, symbol: str, interval: str, limit: int, klines: List[list], fresh: bool = True):
+        """
+        Yeni indirilen mumları iki katmana da yaz. fresh=False: pencere REST
+        penceresi sayılmaz (ör. oluşan barı olmayan akış penceresi); restore
+        gibi sadece artımlı yenilemenin tabanı olur.
+        """
+        entry = {
+            "symbol": symbol,
+            "interval": interval,
+            "limit": limit,
+            "bar_key": last_closed_open_time(interval) if fresh else None,
+            "fetched_at": time.time() if fresh else 0,
+            "klines": klines,
+        }
+        with self.lock:
+            self._remember((symbol, interval), entry)
+        self._write_disk(symbol, interval, entry)
+
+_cache = KlineCache()
+
+def get_cache() -> KlineCache:
+    """Process genelinde paylaşılan cache nesnesi"""
+    return _cache
+
+def get_cached(symbol: str, interval: str, limit: int) -> Optional[List[list]]:
+    return _cache.get(symbol, interval, limit)
+
+def store(symbol: str, interval: str, limit: int, klines: List[list], fresh: bool = True):
+    _cache.put(symbol, interval, limit, klines, fresh)
+
+    import ohlcv_store  # ohlcv_store bu modülü import ettiği için geç import
+    if ohlcv_store.STORE_ENABLED:
+        ohlcv_store.write(symbol, interval, klines)
+
+def restore(symbol: str, interval: str, limit: int) -> Optional[Dict]:
+    """
+    Cache'te kayıt yoksa (ör. process yeniden başladı) pencereyi OHLCV
+    deposundan canlandır. Kayıt geçersiz işaretlenir; sadece artımlı
+    yenilemenin tabanı olarak kullanılır.
+    """
+    import ohlcv_store
+    if not ohlcv_store.STORE_ENABLED:
+        return None
+    klines = ohlcv_store.tail_klines(symbol, interval, limit)
+    if not klines or len(klines) < limit:
+        return None
+    return _cache.restore(symbol, interval, limit, klines)
+
+def is_contiguous(klines: List[list], interval: str) -> bool:
+    """Mumların açılış zamanları arasında eksik bar olup olmadığını kontrol et"""
+    step = interval_ms(interval)
+    return all(b[0] - a[0] == step for a, b in zip(klines, klines[1:]))
+
+def full_params(symbol: str, interval: str, limit: int) -> Dict:
+    """Tüm pencereyi baştan indirmek için istek parametreleri"""
+    return {"symbol": symbol, "interval": interval, "limit": fetch_limit(interval, limit)}
+
+def plan_fetch(symbol: str, interval: str, limit: int) -> Tuple[Optional[List[list]], Optional[Dict]]:
+    """
+    Cache geçerliyse (klines, None) döndür. Değilse (None, params) döndür;
+    params mümkünse sadece son saklanan mumdan sonrasını isteyen artımlı istektir.
+    """
+    klines = _cache.get(symbol, interval, limit)
+    if klines is not None:
+        return klines, None
+
+    params = full_params(symbol, interval, limit)
+    entry = _cache.lookup(symbol, interval)
+    if INCREMENTAL and not entry:
+        entry = restore(symbol, interval, params["limit"])
+    if not INCREMENTAL or not entry or not entry.get("klines") or entry.get("limit", 0) < params["limit"]:
+        return None, params
+
+    # Son saklanan mum (kaydedildiğinde hâlâ oluşuyordu) ve sonrası yeniden istenir
+    step = interval_ms(interval)
+    last_open = entry["klines"][-1][0]
+    forming_open = last_closed_open_time(interval) + step
+    missing = (forming_open - last_open) // step + 1
+    if 0 < missing <= params["limit"]:
+        params = {"symbol": symbol, "interval": interval, "startTime": last_open, "limit": missing}
+    return None, params
+
+def apply_fetch(symbol: str, interval: str, limit: int, params: Dict, payload: List[list]) -> Optional[List[list]]:
+    """
+    İndirilen veriyi saklanan pencereye işle ve son `limit` mumu döndür.
+    Artımlı yanıtta boşluk tespit edilirse None döner; çağıran tam pencere indirmeli.
+    """
+    if "startTime" not in params:
+        _cache.stats["full_fetches"] += 1
+        store(symbol, interval, params["limit"], payload)
+        return payload[-limit:]
+
+    _cache.stats["incremental_fetches"] += 1
+    entry = _cache.lookup(symbol, interval)
+    start = params["startTime"]
+    if not entry or not payload or payload[0][0] != start or not is_contiguous(payload, interval):
+        _cache.stats["gaps"] += 1
+        print(f"⚠️  {symbol} {interval} kline penceresinde boşluk - tam pencere indirilecek")
+        return None
+
+    # Oluşan son mum yenisiyle değiştirilir, yeni kapanan mumlar eklenir
+    window_limit = entry["limit"]
+    merged = [k for k in entry["klines"] if k[0] < start] + payload
+    merged = merged[-window_limit:]
+    store(symbol, interval, window_limit, merged)
+    return merged[-limit:]
+
+def download_klines(params: Dict) -> List[list]:
+    """Cache'e bakmadan /fapi/v1/klines isteği yap (rate_limiter üzerinden)"""
+    limiter = rate_limiter.get_limiter()
+    weight = rate_limiter.kline_weight(int(params.get("limit", 500)))
+    for attempt in range(2):
+        with limiter.request(weight) as slot:
+            started = time.perf_counter()
+            try:
+                response = requests.get(KLINES_URL, params=params, timeout=REQUEST_TIMEOUT)
+            except requests.RequestException:
+                get_metrics().record_http(KLINES_HOST, KLINES_PATH, 0, time.perf_counter() - started)
+                raise
+            slot.update(response.status_code, response.headers)
+            get_metrics().record_http(KLINES_HOST, KLINES_PATH, response.status_code, time.perf_counter() - started,
+                                      len(response.content), parse_weight(response.headers))
+        # 429/418: zamanlayıcı Retry-After süresini bekletir, bir kez daha denenir
+        if response.status_code not in (429, 418) or attempt:
+            break
+    response.raise_for_status()
+    return response.json()
+
+def download_history(symbol: str, interval: str, bars: int) -> List[list]:
+    """Cache'e bakmadan geriye doğru (endTime ile) sayfalayarak son `bars` mumu indir"""
+    klines: List[list] = []
+    end_time = None
+    while len(klines) < bars:
+        params = {"symbol": symbol, "interval": interval, "limit": min(MAX_LIMIT, bars - len(klines))}
+        if end_time is not None:
+            params["endTime"] = end_time
+        page = download_klines(params)
+        if not page:
+            break  # Sembolün listelenme tarihinden öncesi yok
+        klines = page + klines
+        end_time = page[0][0] - 1
+    return klines
+
+def fetch_klines(symbol: str, interval: str, limit: int) -> List[list]:
+    """Cache üzerinden Binance Perpetual kline verisi (ham liste) döndür"""
+    klines, params = plan_fetch(symbol, interval, limit)
+    if klines is not None:
+        return klines
+
+    klines = apply_fetch(symbol, interval, limit, params, download_klines(params))
+    if klines is None:
+        params = full_params(symbol, interval, limit)
+        klines = apply_fetch(symbol, interval, limit, params, download_klines(params))
+    return klines
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Eşzamanlı kline indirme motoru
+
+Analiz aşamaları sembolleri tek tek, aralarında time.sleep ile indiriyordu.
+fetch_many tüm (symbol, interval, limit) isteklerini coins_async'in HTTP
+katmanı üzerinden sınırlı eşzamanlılıkla paralel indirir ve kline_cache'e
+yazar; analizörler ardından veriyi cache'ten okur.
+"""
+
+import asyncio, os, time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import aiohttp
+
+import rate_limiter
+from coins_async import fetch_klines, make_session
+
+# ---------- CONFIG ----------
+# Üst sınır; Binance ağırlık bütçesine göre gerçek eşzamanlılığı rate_limiter ayarlar
+FETCH_CONCURRENCY = int(os.getenv("KLINE_FETCH_CONCURRENCY", str(rate_limiter.MAX_CONCURRENCY)))
+
+KlineRequest = Tuple[str, str, int]  # (symbol, interval, limit)
+
+# ---------- FETCH ----------
+async def fetch_many_async(session: aiohttp.ClientSession, requests: Sequence[KlineRequest],
+                           concurrency: int = FETCH_CONCURRENCY) -> List[Optional[List[list]]]:
+    """İstekleri paralel indir; sonuçlar istek sırasıyla, hata olanlar None"""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(symbol: str, interval: str, limit: int) -> Optional[List[list]]:
+        async with sem:
+            try:
+                return await fetch_klines(session, symbol, interval, limit)
+            except Exception as e:
+                print(f"❌ {symbol} {interval} veri çekme hatası: {e}")
+                return None
+
+    return await asyncio.gather(*(fetch_one(*req) for req in requests))
+
+def fetch_many(requests: Iterable[KlineRequest],
+               concurrency: int = FETCH_CONCURRENCY) -> Dict[KlineRequest, Optional[List[list]]]:
+    """
+    Senkron kod için toplu indirme. Aynı (symbol, interval) için birden fazla
+    istek varsa en büyük limitle tek istek yapılır.
+    """
+    requests = list(requests)
+    widest: Dict[Tuple[str, str], int] = {}
+    for symbol, interval, limit in requests:
+        widest[(symbol, interval)] = max(limit, widest.get((symbol, interval), 0))
+    unique = [(symbol, interval, limit) for (symbol, interval), limit in widest.items()]
+
+    async def run():
+        async with make_session() as session:
+            return await fetch_many_async(session, unique, concurrency)
+
+    fetched = dict(zip([(s, i) for s, i, _ in unique], asyncio.run(run())))
+    results: Dict[KlineRequest, Optional[List[list]]] = {}
+    for symbol, interval, limit in requests:
+        klines = fetched[(symbol, interval)]
+        results[(symbol, interval, limit)] = klines[-limit:] if klines is not None else None
+    return results
+
+def prefetch(symbols: Iterable[str], intervals: Dict[str, int]) -> int:
+    """Semboller x interval'ler için pencereleri cache'e önceden indir, başarılı sayısını döndür"""
+    requests = [(symbol, interval, limit) for symbol in symbols for interval, limit in intervals.items()]
+    if not requests:
+        return 0
+    start_time = time.time()
+    results = fetch_many(requests)
+    ok_count = sum(1 for klines in results.values() if klines is not None)
+    print(f"📥 {ok_count}/{len(requests)} kline penceresi hazır ({time.time() - start_time:.1f} saniye)")
+    return ok_count
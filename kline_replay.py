@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Binance futures kline websocket'i yerine geçen yerel replay sunucusu
+
+kline_stream.py'yi ağ olmadan test etmek için kayıtlı mumları combined
+stream formatında (`/stream?streams=a@kline_15m/b@kline_4h`) yayınlar.
+Kaynak dosyalar:
+
+- *.jsonl: `kline_stream.py --record` ile kaydedilmiş ham mesajlar
+- *.json: {"symbol", "interval", "klines"} formatında REST mumları
+  (ör. .kline_cache/ dosyaları). Her bar için bir ara güncelleme ve bir
+  kapanış (x=true) mesajı üretilir.
+
+Kullanım:
+    python kline_replay.py .kline_cache/*.json --port 8765 --delay 0.01
+"""
+
+import asyncio, argparse, glob, json, os
+from typing import Dict, Iterable, List, Optional
+
+from aiohttp import web, WSMsgType
+
+from kline_stream import kline_to_event
+
+# ---------- CONFIG ----------
+DEFAULT_HOST  = "127.0.0.1"
+DEFAULT_PORT  = 8765
+DEFAULT_DELAY = 0.0  # mesajlar arası bekleme (saniye)
+
+# ---------- LOAD ----------
+def messages_from_klines(symbol: str, interval: str, klines: List[list]) -> List[Dict]:
+    """REST mumlarından akış mesajları üret: bar başına ara güncelleme + kapanış"""
+    messages = []
+    for row in klines:
+        messages.append(kline_to_event(symbol, interval, row, closed=False))
+        messages.append(kline_to_event(symbol, interval, row, closed=True))
+    return messages
+
+def load_messages(paths: Iterable[str]) -> List[Dict]:
+    """Kayıt dosyalarını yükle ve olay zamanına göre sırala"""
+    messages = []
+    for path in paths:
+        if path.endswith(".jsonl"):
+            with open(path, "r", encoding="utf-8") as f:
+                messages.extend(json.loads(line) for line in f if line.strip())
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                recorded = json.load(f)
+            messages.extend(messages_from_klines(recorded["symbol"], recorded["interval"], recorded["klines"]))
+
+    # Aynı anda kapanan barlar için stream adına göre sabit sıra
+    messages.sort(key=lambda m: (m["data"]["E"], m["stream"]))
+    return messages
+
+# ---------- SERVER ----------
+class ReplayServer:
+    """Kayıtlı mesajları abone olunan akışlara göre filtreleyip yayınlayan websocket sunucusu"""
+
+    def __init__(self, messages: List[Dict], host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 delay: float = DEFAULT_DELAY):
+        self.messages = messages
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}/stream"
+
+    async def handle_stream(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+
+        streams = set(filter(None, request.query.get("streams", "").split("/")))
+        sent = 0
+        for message in self.messages:
+            if message["stream"] not in streams:
+                continue
+            if ws.closed:
+                break
+            await ws.send_str(json.dumps(message, separators=(",", ":")))
+            sent += 1
+            if self.delay:
+                await asyncio.sleep(self.delay)
+        print(f"📼 {sent} mesaj yayınlandı ({len(streams)} akış)")
+
+        # Gerçek sunucu gibi bağlantıyı açık tut; istemci kapatana kadar bekle
+        async for msg in ws:
+            if msg.type in (WSMsgType.CLOSE, WSMsgType.ERROR):
+                break
+        return ws
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/stream", self.handle_stream)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        if self.port == 0:
+            self.port = site._server.sockets[0].getsockname()[1]
+        print(f"📼 Replay sunucusu hazır: {self.url} ({len(self.messages)} mesaj)")
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+# ---------- MAIN ----------
+async def serve(paths: List[str], host: str, port: int, delay: float):
+    server = ReplayServer(load_messages(paths), host, port, delay)
+    await server.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Kayıtlı klineları websocket üzerinden yayınla")
+    parser.add_argument("files", nargs="*", help="JSONL kayıtları veya {symbol, interval, klines} JSON dosyaları")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--delay", type=float, default=DEFAULT_DELAY)
+    args = parser.parse_args()
+
+    paths = args.files or sorted(glob.glob(os.path.join(".kline_cache", "*.json")))
+    if not paths:
+        print("❌ Yayınlanacak kayıt bulunamadı!")
+        return
+    try:
+        asyncio.run(serve(paths, args.host, args.port, args.delay))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
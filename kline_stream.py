@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Websocket ile olay tabanlı kline akışı
+
+REST ile 5 dakikada bir tarama yapmak 15m CHOCH'un birkaç dakika geç
+görülmesine yol açıyordu. Bu servis coins.json'daki coinler için Binance
+Futures `<symbol>@kline_<interval>` akışlarına abone olur, kayan bar
+pencerelerini bellekte tutar ve bir bar kapandığında sadece o
+symbol/interval için yeniden analiz tetikler. Kapanan pencereler
+kline_cache'e artımlı yenileme tabanı olarak yazılır; REST aşamaları
+kapanmış barları tekrar indirmez, sadece oluşan barı ister.
+
+Tüm akışlar ve kalp atışları tek event loop'ta çalışır; analiz ve cache
+yazımı thread'lerde (aynı symbol/interval için sırayla), boşluk onarımı
+async REST isteğiyle yapılır. Yavaş bir analiz ya da istek okumayı durdurmaz.
+
+Çevrimdışı test için kline_replay.py kayıtlı mumları aynı formatta yayınlar:
+
+    python kline_replay.py --port 8765 &
+    python kline_stream.py --url ws://127.0.0.1:8765/stream --offline
+"""
+
+import asyncio, aiohttp, argparse, inspect, json, time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import kline_cache
+from coins_async import fetch_json, make_session
+
+# ---------- CONFIG ----------
+STREAM_URL          = "wss://fstream.binance.com/stream"
+STREAM_INTERVALS    = ["4h", "2h", "30m", "15m"]
+MAX_STREAMS_PER_WS  = 200  # Binance futures bağlantı başına akış limiti
+RECONNECT_DELAY     = 5
+
+# ---------- HELPERS ----------
+def stream_name(symbol: str, interval: str) -> str:
+    return f"{symbol.lower()}@kline_{interval}"
+
+def event_to_kline(k: Dict) -> list:
+    """Websocket kline olayını REST /fapi/v1/klines satır formatına çevir"""
+    return [k["t"], k["o"], k["h"], k["l"], k["c"], k["v"], k["T"],
+            k.get("q", "0"), k.get("n", 0), k.get("V", "0"), k.get("Q", "0"), "0"]
+
+def kline_to_event(symbol: str, interval: str, row: list, closed: bool) -> Dict:
+    """REST kline satırını combined stream mesajına çevir (replay ve kayıt için)"""
+    return {
+        "stream": stream_name(symbol, interval),
+        "data": {
+            "e": "kline",
+            "E": row[6] if closed else row[0],
+            "s": symbol,
+            "k": {
+                "t": row[0], "T": row[6], "s": symbol, "i": interval,
+                "o": row[1], "h": row[2], "l": row[3], "c": row[4], "v": row[5],
+                "n": row[8], "x": closed, "q": row[7], "V": row[9], "Q": row[10]
+            }
+        }
+    }
+
+# ---------- DEFAULT ANALYSIS ----------
+# (symbol, interval) -> IncrementalSMC; range analizi her barda baştan yapılmaz
+_range_states: Dict[Tuple[str, str], "IncrementalSMC"] = {}
+
+def analyze_closed_bar(symbol: str, interval: str, klines: List[list]) -> Dict:
+    """Kapanan bar sonrası sadece ilgili symbol/interval analizini çalıştır"""
+    result = {'symbol': symbol, 'interval': interval}
+
+    if interval in ('4h', '2h'):
+        from smc_incremental import IncrementalSMC
+        key = (symbol, interval)
+        if key not in _range_states:
+            _range_states[key] = IncrementalSMC(symbol, interval, kline_cache.SHARED_LIMITS.get(interval, 500))
+        result['range_signal'] = _range_states[key].update(klines)
+
+    if interval in ('30m', '15m'):
+        # Tek swing geçişinde iki yön (bullish sadece 15m'de kullanılır)
+        from choch_analyzer import analyze_choch
+        fetched, bullish, bearish = analyze_choch(symbol, interval, klines, limit=len(klines),
+                                                  lookback=3, distance_pct=2.0)
+        if fetched:
+            result['bearish_choch'] = bearish
+            if interval == '15m':
+                result['bullish_choch'] = bullish
+
+    range_signal = result.get('range_signal')
+    if range_signal and range_signal.get('range_50'):
+        print(f"🚨 {symbol} ({interval}) range içinde ve %50 altında - %{range_signal['range_position_pct']}")
+    if result.get('bullish_choch'):
+        print(f"🎯 {symbol} ({interval}) bullish CHOCH aktif - seviye ${result['bullish_choch']['choch_level']}")
+    if result.get('bearish_choch'):
+        print(f"🔻 {symbol} ({interval}) bearish CHOCH aktif - seviye ${result['bearish_choch']['choch_level']}")
+    return result
+
+# ---------- SERVICE ----------
+class KlineStreamService:
+    """Kline akışlarını dinleyen, pencereleri tutan ve bar kapanışında analiz tetikleyen servis"""
+
+    def __init__(self, symbols: Iterable[str], intervals: Iterable[str] = STREAM_INTERVALS,
+                 on_bar_close: Optional[Callable] = analyze_closed_bar, url: str = STREAM_URL,
+                 seed: bool = True, write_cache: bool = True, record_file: Optional[str] = None):
+        self.symbols = list(symbols)
+        self.intervals = list(intervals)
+        self.on_bar_close = on_bar_close
+        self.url = url
+        self.seed = seed
+        self.write_cache = write_cache
+        self.record_file = record_file
+        self.windows: Dict[Tuple[str, str], List[list]] = {}
+        self._closed_tasks: Dict[Tuple[str, str], asyncio.Task] = {}  # symbol/interval başına son iş
+        self.closed_bars = 0
+        self.messages = 0
+        self._stopping = False
+
+    def window_size(self, interval: str) -> int:
+        return kline_cache.SHARED_LIMITS.get(interval, 500)
+
+    def seed_windows(self):
+        """Başlangıç pencerelerini REST (kline_cache) üzerinden doldur"""
+        for symbol in self.symbols:
+            for interval in self.intervals:
+                try:
+                    self.windows[(symbol, interval)] = list(
+                        kline_cache.fetch_klines(symbol, interval, self.window_size(interval)))
+                except Exception as e:
+                    print(f"⚠️  {symbol} {interval} başlangıç penceresi alınamadı: {e}")
+
+    def has_gap(self, data: Dict) -> bool:
+        """Olay penceredeki son bardan sonra bar atlıyor mu (bağlantı kopmasıyla kaçırılan barlar)"""
+        if data.get("e") != "kline":
+            return False
+        k = data["k"]
+        window = self.windows.get((k["s"], k["i"]))
+        return bool(window) and k["t"] > window[-1][0] and k["t"] - window[-1][0] != kline_cache.interval_ms(k["i"])
+
+    async def repair_window(self, session: aiohttp.ClientSession, symbol: str, interval: str):
+        """Pencereyi REST'ten async olarak yeniden çek (event loop bloklanmaz)"""
+        print(f"⚠️  {symbol} {interval} akışında boşluk - pencere yeniden çekiliyor")
+        limit = self.window_size(interval)
+        try:
+            # Cache'teki pencere de aynı boşluğu taşıyabilir - doğrudan indir
+            params = kline_cache.full_params(symbol, interval, limit)
+            payload = await fetch_json(session, "/fapi/v1/klines", params)
+            # apply_fetch cache'e ve OHLCV deposuna yazar (disk) - thread'de
+            self.windows[(symbol, interval)] = await asyncio.to_thread(
+                kline_cache.apply_fetch, symbol, interval, limit, params, payload)
+        except Exception as e:
+            print(f"⚠️  {symbol} {interval} pencere onarılamadı: {e}")
+
+    def apply_event(self, data: Dict) -> Optional[Tuple[str, str, List[list]]]:
+        """
+        Tek kline olayını bellekteki pencereye işle. Bar kapandıysa (symbol, interval,
+        pencere) döndürür, yoksa None. G/Ç yapmaz; boşluk onarımı repair_window'dadır.
+        """
+        if data.get("e") != "kline":
+            return None
+        k = data["k"]
+        symbol, interval = k["s"], k["i"]
+        row = event_to_kline(k)
+        window = self.windows.setdefault((symbol, interval), [])
+
+        if window and window[-1][0] == row[0]:
+            window[-1] = row  # Oluşan barı güncelle
+        elif not window or row[0] > window[-1][0]:
+            window.append(row)
+            del window[:-self.window_size(interval)]
+        else:
+            return None  # Eski/sırasız olay
+
+        if not k.get("x"):
+            return None
+
+        self.closed_bars += 1
+        return symbol, interval, list(window)
+
+    def _process_closed(self, symbol: str, interval: str, window: List[list]):
+        # Thread'de çalışır: cache/OHLCV yazımı ve senkron analiz
+        if self.write_cache:
+            # Pencere kapanan barla biter (oluşan bar yok); REST aşamaları bunu geçerli
+            # pencere olarak kullanmaz, sadece oluşan barı artımlı indirir
+            kline_cache.store(symbol, interval, self.window_size(interval), window, fresh=False)
+        if self.on_bar_close and not inspect.iscoroutinefunction(self.on_bar_close):
+            return self.on_bar_close(symbol, interval, window)
+        return None
+
+    async def _handle_closed(self, closed: Tuple[str, str, List[list]], previous: Optional[asyncio.Task]):
+        if previous is not None:
+            # Aynı symbol/interval'in önceki barı bitmeden başlanmaz (artımlı durum sırası)
+            await asyncio.gather(previous, return_exceptions=True)
+        try:
+            result = await asyncio.to_thread(self._process_closed, *closed)
+            if self.on_bar_close and inspect.iscoroutinefunction(self.on_bar_close):
+                result = self.on_bar_close(*closed)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            print(f"❌ {closed[0]} {closed[1]} analiz hatası: {e}")
+
+    def dispatch_closed(self, closed: Tuple[str, str, List[list]]) -> asyncio.Task:
+        """Kapanan barın işini arka planda başlat; okuma döngüsü beklemez"""
+        key = closed[:2]
+        previous = self._closed_tasks.get(key)
+        task = asyncio.create_task(self._handle_closed(closed, previous))
+        self._closed_tasks[key] = task
+
+        def forget(done: asyncio.Task):
+            if self._closed_tasks.get(key) is done:
+                del self._closed_tasks[key]
+
+        task.add_done_callback(forget)
+        return task
+
+    async def drain(self):
+        """Bekleyen kapanış işlerinin bitmesini bekle"""
+        if self._closed_tasks:
+            await asyncio.gather(*self._closed_tasks.values(), return_exceptions=True)
+
+    async def _listen(self, session: aiohttp.ClientSession, streams: List[str], recorder):
+        url = f"{self.url}?streams={'/'.join(streams)}"
+        while not self._stopping:
+            try:
+                async with session.ws_connect(url, heartbeat=30) as ws:
+                    print(f"🔌 Websocket bağlandı ({len(streams)} akış)")
+                    async for msg in ws:
+                        if msg.type != aiohttp.WSMsgType.TEXT:
+                            break
+                        self.messages += 1
+                        if recorder:
+                            recorder.write(msg.data + "\n")
+                        payload = json.loads(msg.data)
+                        data = payload.get("data", payload)
+                        if self.seed and self.has_gap(data):
+                            await self.repair_window(session, data["k"]["s"], data["k"]["i"])
+                        closed = self.apply_event(data)
+                        if closed:
+                            self.dispatch_closed(closed)
+                        if self._stopping:
+                            break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"⚠️  Websocket hatası: {e}")
+            if not self._stopping:
+                print(f"🔄 {RECONNECT_DELAY} saniye sonra yeniden bağlanılacak...")
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    async def run(self, duration: Optional[float] = None):
+        """Akışları dinle; duration verilirse o kadar saniye sonra dur"""
+        if self.seed:
+            await asyncio.to_thread(self.seed_windows)
+
+        streams = [stream_name(s, i) for s in self.symbols for i in self.intervals]
+        groups = [streams[i:i + MAX_STREAMS_PER_WS] for i in range(0, len(streams), MAX_STREAMS_PER_WS)]
+        recorder = open(self.record_file, "a", encoding="utf-8") if self.record_file else None
+
+        try:
+            async with make_session() as session:
+                tasks = [asyncio.create_task(self._listen(session, group, recorder)) for group in groups]
+                if duration is not None:
+                    await asyncio.sleep(duration)
+                    self.stop()
+                    for task in tasks:
+                        task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await self.drain()
+        finally:
+            if recorder:
+                recorder.close()
+
+    def stop(self):
+        self._stopping = True
+
+# ---------- MAIN ----------
+def main():
+    parser = argparse.ArgumentParser(description="Binance kline websocket akış servisi")
+    parser.add_argument("--url", default=STREAM_URL, help="Websocket adresi (replay için ws://127.0.0.1:8765/stream)")
+    parser.add_argument("--coins", default="coins.json")
+    parser.add_argument("--intervals", default=",".join(STREAM_INTERVALS))
+    parser.add_argument("--offline", action="store_true",
+                        help="REST'ten başlangıç penceresi çekme ve kline_cache'e yazma (replay testleri için)")
+    parser.add_argument("--record", help="Gelen mesajları JSONL olarak bu dosyaya kaydet")
+    parser.add_argument("--duration", type=float, help="Saniye cinsinden çalışma süresi")
+    args = parser.parse_args()
+
+    with open(args.coins, "r", encoding="utf-8") as f:
+        symbols = json.load(f).get("symbols", [])
+
+    service = KlineStreamService(symbols, args.intervals.split(","), url=args.url,
+                                 seed=not args.offline, write_cache=not args.offline,
+                                 record_file=args.record)
+    print(f"📡 {len(symbols)} coin x {len(service.intervals)} interval dinlenecek")
+    start_time = time.time()
+    try:
+        asyncio.run(service.run(args.duration))
+    except KeyboardInterrupt:
+        pass
+    print(f"\n📊 {service.messages} mesaj, {service.closed_bars} kapanan bar "
+          f"({time.time() - start_time:.1f} saniye)")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,24 @@
 import subprocess
+import threading
+import asyncio
 import time
 import os
 import json
+import hashlib
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import sys
 from supabase import create_client, Client
 import uuid
+from urllib.parse import urlparse
 from dotenv import load_dotenv
+from kline_cache import interval_ms, last_closed_open_time
+import metrics
+import signal_api
+import signal_events
+import shard
+import stage_cancel
+from json_writer import write_json
 
 # .env dosyasını yükle
 load_dotenv()
@@ -26,36 +38,117 @@ class TradingBotController:
             except Exception as e:
                 print(f"⚠️  Supabase bağlantısı kurulamadı: {e}")
         
+        # Yükleme: değişmeyen dosyalar atlanır, kalanlar paralel yüklenir
+        self.upload_workers = int(os.getenv('UPLOAD_WORKERS', '6'))
+        self.upload_state_file = os.getenv('UPLOAD_STATE_FILE', '.upload_state.json')
+        self.uploaded_hashes = self.load_upload_state()
+        self.supabase_host = urlparse(self.supabase_url).netloc or 'supabase'
+        
         self.scripts = [
             {
                 'name': 'coins_async.py',
                 'description': 'Coin listesi güncelleme',
                 'timeout': 60,  # Max 60 saniye
-                'required_output': 'coins.json'
+                'required_output': 'coins.json',
+                'stage': 'stage_coins',
+                'produces': 'coins',
+                'consumes': [],
+                'intervals': ['4h']  # Girdi timeframe'leri (hizalı zamanlayıcı için)
             },
             {
                 'name': 'primary_test.py',
                 'description': 'SMC analizi ve alarm tespiti',
                 'timeout': 600,  # Max 10 dakika
-                'required_output': ['sonuc.json', 'alarm_4h.json', 'alarm_2h.json']
+                'required_output': ['sonuc.json', 'alarm_4h.json', 'alarm_2h.json'],
+                'stage': 'stage_primary',
+                'produces': 'primary',
+                'consumes': ['coins'],
+                'intervals': ['4h', '2h']  # Girdi timeframe'leri (hizalı zamanlayıcı için)
             },
             {
                 'name': 'entry_long_signal.py',
                 'description': 'Entry sinyalleri (15m CHOCH)',
                 'timeout': 300,  # Max 5 dakika
-                'required_output': 'entry_long_signals.json'
+                'required_output': 'entry_long_signals.json',
+                'stage': 'stage_entry_long',
+                'produces': 'long_entries',
+                'consumes': ['primary'],
+                'intervals': ['15m']  # Girdi timeframe'leri (hizalı zamanlayıcı için)
             },
             {
                 'name': 'entry_short_signal.py',
                 'description': 'Short entry sinyalleri (30m/15m Bearish CHOCH)',
                 'timeout': 300,  # Max 5 dakika
-                'required_output': 'entry_short_signals.json'
+                'required_output': 'entry_short_signals.json',
+                'stage': 'stage_entry_short',
+                'produces': 'short_signals',
+                'consumes': ['coins', 'primary', 'long_entries'],
+                'intervals': ['4h', '2h', '30m', '15m']  # Girdi timeframe'leri (hizalı zamanlayıcı için)
             }
         ]
         self.cycle_count = 0
         self.wait_between_cycles = 300  # 5 dakika
         self.python_executable = sys.executable  # Mevcut Python yorumlayıcısını kullan
         
+        # Çalıştırma modu: 'inprocess' (hızlı yol) veya 'subprocess' (izolasyon)
+        self.execution_mode = os.getenv('PIPELINE_MODE', 'inprocess')
+        # Aşama grafiği: her aşama ürettiği ve tükettiği artifact'ı bildirir, sıra buradan çıkar
+        self.scripts = self.order_stages(self.scripts)
+        self.producers = {s['produces']: s['name'] for s in self.scripts if s.get('produces')}
+        self.stage_results = {}  # Aşamaların döndürdüğü sonuçlar (script adı -> nesne)
+        self.stage_cycles = {}   # Sonucun üretildiği döngü (script adı -> cycle)
+        self.stage_modules = {}
+        # Timeout'ta iptal edilen aşamanın kontrol noktasına ulaşması için beklenen süre
+        self.cancel_grace = int(os.getenv('STAGE_CANCEL_GRACE', '30'))
+        self.stale_stage = None  # İptal edildiği halde hâlâ çalışan aşama thread'i
+        # Durmayan aşama için beklenecek grace periyodu sayısı; aşılırsa process çıkar (ON_FAILURE yeniden başlatır)
+        self.stale_stage_limit = int(os.getenv('STAGE_STALE_LIMIT', '10'))
+        if self.execution_mode == 'inprocess':
+            self.load_stage_modules()
+        
+        # Shard modu: primary/long/short aşamaları worker'lara bölünür (sadece in-process modda)
+        self.shard_coordinator = None
+        if shard.SHARD_MODE == 'coordinator':
+            if self.execution_mode == 'inprocess':
+                try:
+                    self.shard_coordinator = shard.ShardCoordinator()
+                except ValueError as e:
+                    print(f"❌ Shard coordinator başlatılmadı: {e}")
+                    raise SystemExit(1)
+            else:
+                print("⚠️  SHARD_MODE=coordinator sadece PIPELINE_MODE=inprocess ile çalışır, yok sayıldı")
+        
+        # Zamanlayıcı: 'fixed' (her döngü sonrası sabit bekleme) veya 'aligned' (bar kapanışına hizalı)
+        self.schedule_mode = os.getenv('SCHEDULE_MODE', 'fixed')
+        self.bar_close_grace = int(os.getenv('BAR_CLOSE_GRACE', '5'))  # Kapanıştan sonra borsaya tanınan pay (saniye)
+        self.last_closed_bars = {}  # interval -> en son işlenen kapanmış barın açılış zamanı (ms)
+        
+    def order_stages(self, scripts):
+        """Aşamaları consumes/produces ilişkisine göre sırala (liste sırası korunur)"""
+        producers = {s['produces']: s['name'] for s in scripts if s.get('produces')}
+        for script_info in scripts:
+            missing = set(script_info.get('consumes', [])) - producers.keys()
+            if missing:
+                raise ValueError(f"{script_info['name']} için üretici aşama yok: {', '.join(sorted(missing))}")
+        
+        ordered, done, pending = [], set(), list(scripts)
+        while pending:
+            ready = next((s for s in pending
+                          if all(producers[a] in done for a in s.get('consumes', []))), None)
+            if ready is None:
+                raise ValueError(f"Aşama bağımlılıklarında döngü: {', '.join(s['name'] for s in pending)}")
+            ordered.append(ready)
+            done.add(ready['name'])
+            pending.remove(ready)
+        return ordered
+    
+    def artifact(self, name, this_cycle=False):
+        """Bir artifact'ın bellekteki sonucu (this_cycle: sadece bu döngüde üretildiyse)"""
+        producer = self.producers[name]
+        if this_cycle and self.stage_cycles.get(producer) != self.cycle_count:
+            return None
+        return self.stage_results.get(producer)
+    
     def check_file_exists(self, filename):
         """Dosya varlığını kontrol et"""
         if isinstance(filename, list):
@@ -70,8 +163,23 @@ class TradingBotController:
             return int(current_time - file_time)
         return None
     
-    def upload_to_supabase(self, file_path, filename=None):
-        """JSON dosyalarını Supabase Storage'a yükle"""
+    def load_upload_state(self):
+        """Son başarılı yüklemelerin içerik hash'lerini oku (dosya adı -> sha256)"""
+        try:
+            with open(self.upload_state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def save_upload_state(self):
+        """Hash'leri atomik olarak kaydet (yarım yazılmış state dosyası kalmasın)"""
+        try:
+            write_json(self.upload_state_file, self.uploaded_hashes)
+        except OSError as e:
+            print(f"⚠️  Yükleme durumu kaydedilemedi: {e}")
+    
+    def upload_to_supabase(self, file_path, filename=None, file_content=None):
+        """JSON dosyalarını Supabase Storage'a yükle (upsert - önce silme yok)"""
         if not self.supabase:
             return False
             
@@ -81,27 +189,31 @@ class TradingBotController:
                 filename = os.path.basename(file_path)
             
             # Dosyayı oku
-            with open(file_path, 'r', encoding='utf-8') as f:
-                file_content = f.read()
+            if file_content is None:
+                with open(file_path, 'rb') as f:
+                    file_content = f.read()
             
-            # Önce mevcut dosyayı silmeye çalış (varsa)
+            # Upsert: mevcut dosyanın üzerine yaz. remove()+upload() arasında
+            # istemcilerin dosyayı eksik gördüğü pencere oluşmaz.
+            upload_start = time.perf_counter()
             try:
-                self.supabase.storage.from_(self.supabase_bucket).remove([filename])
-            except:
-                pass  # Dosya yoksa hata vermez
-            
-            # Supabase Storage'a yükle
-            result = self.supabase.storage.from_(self.supabase_bucket).upload(
-                filename, 
-                file_content.encode('utf-8'),
-                file_options={"content-type": "application/json"}
-            )
+                result = self.supabase.storage.from_(self.supabase_bucket).upload(
+                    filename, 
+                    file_content,
+                    file_options={"content-type": "application/json", "upsert": "true"}
+                )
+            except Exception:
+                # Yanıt alınamadı - metriklerde status 0 (bağlantı/istemci hatası)
+                self.record_upload(0, upload_start, len(file_content))
+                raise
             
             # Response yapısı kontrol et
             if hasattr(result, 'error') and result.error:
+                self.record_upload(self.upload_error_status(result.error), upload_start, len(file_content))
                 print(f"⚠️  {file_path} Supabase'e yüklenirken hata: {result.error}")
                 return False
             else:
+                self.record_upload(200, upload_start, len(file_content))
                 print(f"✅ {file_path} Supabase'e yüklendi: {filename}")
                 return True
                 
@@ -109,8 +221,24 @@ class TradingBotController:
             print(f"⚠️  {file_path} upload hatası: {e}")
             return False
     
+    def record_upload(self, status, upload_start, size):
+        """Yüklemenin gerçek sonucunu HTTP metriklerine kaydet"""
+        metrics.get_metrics().record_http(self.supabase_host, f"storage/{self.supabase_bucket}",
+                                          status, time.perf_counter() - upload_start, size)
+    
+    def upload_error_status(self, error):
+        """Supabase hatasındaki HTTP durum kodu (bulunamazsa 500)"""
+        for field in ('status_code', 'statusCode', 'status'):
+            value = error.get(field) if isinstance(error, dict) else getattr(error, field, None)
+            try:
+                if value is not None:
+                    return int(value)
+            except (TypeError, ValueError):
+                pass
+        return 500
+    
     def upload_all_results(self):
-        """Tüm sonuç dosyalarını Supabase'e yükle"""
+        """Değişen sonuç dosyalarını Supabase'e paralel yükle"""
         if not self.supabase:
             print("⚠️  Supabase bağlantısı yok, dosyalar yüklenemedi")
             return
@@ -123,16 +251,193 @@ class TradingBotController:
             'entry_short_signals.json',
             'coins.json'
         ]
+        if signal_events.EVENT_MODE:
+            # Tüketiciler sadece döngünün olaylarını indirebilir; delta kaçırılırsa
+            # açık sinyallerin seq'li snapshot'ı ile eşitlenir
+            if not signal_events.UPLOAD_SNAPSHOTS:
+                files_to_upload = ['coins.json']
+            files_to_upload.extend([signal_events.EVENT_DELTA_FILE, signal_events.EVENT_SNAPSHOT_FILE])
+        
+        # İçeriği son başarılı yüklemeyle aynı olan dosyaları atla
+        pending = {}
+        skipped_count = 0
+        for file_path in files_to_upload:
+            if not os.path.exists(file_path):
+                continue
+            with open(file_path, 'rb') as f:
+                content = f.read()
+            content_hash = hashlib.sha256(content).hexdigest()
+            if self.uploaded_hashes.get(os.path.basename(file_path)) == content_hash:
+                skipped_count += 1
+                continue
+            pending[file_path] = (content, content_hash)
         
         uploaded_count = 0
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.upload_workers, len(pending))) as executor:
+                futures = {
+                    executor.submit(self.upload_to_supabase, file_path, None, content): file_path
+                    for file_path, (content, _) in pending.items()
+                }
+                for future in as_completed(futures):
+                    file_path = futures[future]
+                    if future.result():
+                        self.uploaded_hashes[os.path.basename(file_path)] = pending[file_path][1]
+                        uploaded_count += 1
+            self.save_upload_state()
         
-        for file_path in files_to_upload:
-            if os.path.exists(file_path):
-                # Aynı isimle kaydet (timestamp yok)
-                if self.upload_to_supabase(file_path):
-                    uploaded_count += 1
+        print(f"📤 {uploaded_count}/{len(pending)} dosya Supabase'e yüklendi, "
+              f"{skipped_count} dosya değişmediği için atlandı")
+    
+    def load_stage_modules(self):
+        """Aşama modüllerini bir kez import et (pandas/numpy/requests import maliyeti tek sefer)"""
+        import coins_async
+        import primary_test
+        import entry_long_signal
+        import entry_short_signal
+        
+        self.stage_modules = {
+            'coins_async': coins_async,
+            'primary_test': primary_test,
+            'entry_long_signal': entry_long_signal,
+            'entry_short_signal': entry_short_signal
+        }
+    
+    def stage_coins(self):
+        """Coin listesini güncelle ve coins.json içeriğini döndür"""
+        return asyncio.run(self.stage_modules['coins_async'].main())
+    
+    def stage_primary(self):
+        """Coin listesiyle SMC taraması yap"""
+        primary_test = self.stage_modules['primary_test']
+        coins_config = self.artifact('coins') or primary_test.load_coins_config('coins.json')
+        if not coins_config:
+            print("❌ coins.json dosyası bulunamadı!")
+            return None
+        if self.shard_coordinator:
+            return self.shard_coordinator.scan_all_coins(coins_config, intervals=['4h', '2h'])
+        return primary_test.scan_all_coins(coins_config, intervals=['4h', '2h'])
+    
+    def stage_entry_long(self):
+        """Primary aşamasının alarmlarını 15m CHOCH için analiz et"""
+        entry_long_signal = self.stage_modules['entry_long_signal']
+        primary_results = self.artifact('primary')
+        if primary_results:
+            alarm_coins = list(dict.fromkeys(s['symbol'] for s in primary_results['active_signals']))
+        else:
+            alarm_coins = entry_long_signal.load_alarm_files()
+        
+        if not alarm_coins:
+            print("\n❌ Hiç alarm bulunamadı!")
+            return None
+        if self.shard_coordinator:
+            return self.shard_coordinator.analyze_coins_for_entry(alarm_coins)
+        return entry_long_signal.analyze_coins_for_entry(alarm_coins)
+    
+    def stage_entry_short(self):
+        """Coin listesinde short/long sinyal taraması yap"""
+        entry_short_signal = self.stage_modules['entry_short_signal']
+        coins_config = self.artifact('coins')
+        if coins_config:
+            coin_symbols = coins_config.get('symbols', [])
+        else:
+            coin_symbols = entry_short_signal.load_coins_from_json('coins.json')
+        
+        if not coin_symbols:
+            print("❌ coins.json yüklenemedi!")
+            return None
+        
+        # Range üstü ve long sonuçları bu döngüde üretildiyse tekrar hesaplanmaz
+        primary_results = self.artifact('primary', this_cycle=True)
+        long_results = self.artifact('long_entries', this_cycle=True)
+        if self.shard_coordinator:
+            return self.shard_coordinator.run_signal_scan(coin_symbols, primary_results, long_results)
+        return entry_short_signal.run_signal_scan(coin_symbols, primary_results=primary_results,
+                                                  long_results=long_results)
+    
+    def run_stage(self, script_info):
+        """Aşamayı seçili moda göre çalıştır ve süresini metriklere kaydet"""
+        start_time = time.time()
+        if self.execution_mode == 'inprocess' and script_info.get('stage'):
+            success = self.run_inprocess(script_info)
+        else:
+            success = self.run_script(script_info)
+        metrics.get_metrics().record_stage(script_info['name'], time.time() - start_time, success)
+        # API'deki sonuçları aşama biter bitmez güncelle (subprocess modunda çıktı dosyasından).
+        # Sonucu dönen aşama, beklenen çıktı dosyası eksik olsa da yayınlanır.
+        result = self.stage_results.get(script_info['name'])
+        if self.stale_stage is not None:
+            return success  # Eski thread dosyaları hâlâ yazıyor olabilir; yayınlanmaz
+        if success or result is not None:
+            document = signal_api.publish_stage(script_info['name'], result)
+            if signal_events.EVENT_MODE:
+                events = signal_events.get_event_log().record_stage(script_info['name'], document)
+                if events:
+                    print(f"🧾 {len(events)} sinyal olayı kaydedildi (seq {events[0]['seq']}-{events[-1]['seq']})")
+        return success
+    
+    def run_inprocess(self, script_info):
+        """Aşama fonksiyonunu aynı process içinde, timeout ile çalıştır"""
+        script_name = script_info['name']
+        description = script_info['description']
+        timeout = script_info['timeout']
+        stage_func = getattr(self, script_info['stage'])
         
-        print(f"📤 {uploaded_count}/{len(files_to_upload)} dosya Supabase'e yüklendi")
+        print(f"\n{'='*60}")
+        print(f"🔄 {description} başlatılıyor...")
+        print(f"📄 Aşama: {script_name} (in-process)")
+        print(f"⏱️  Timeout: {timeout} saniye")
+        print(f"{'='*60}")
+        
+        outcome = {}
+        
+        def target():
+            try:
+                outcome['result'] = stage_func()
+            except stage_cancel.StageCancelled:
+                outcome['cancelled'] = True
+            except Exception as e:
+                outcome['error'] = e
+        
+        start_time = time.time()
+        worker = threading.Thread(target=target, name=script_name, daemon=True)
+        worker.start()
+        worker.join(timeout)
+        
+        # Thread'ler dışarıdan öldürülemez; iptal bayrağıyla kontrol noktasında durdurulur
+        if worker.is_alive():
+            print(f"\n⚠️  {script_name} timeout nedeniyle iptal ediliyor...")
+            self.stage_results.pop(script_name, None)
+            stage_cancel.cancel()
+            worker.join(self.cancel_grace)
+            if worker.is_alive():
+                # Bayrak kalkık kalır; thread bitene kadar aşama/döngü başlatılmaz, yükleme yapılmaz
+                print(f"⚠️  {script_name} {self.cancel_grace} saniyede durmadı, arka planda bitmesi bekleniyor")
+                self.stale_stage = worker
+            else:
+                stage_cancel.reset()
+                print(f"🛑 {script_name} timeout nedeniyle sonlandırıldı!")
+            return False
+        
+        if 'error' in outcome:
+            print(f"\n❌ {script_name} hata ile sonlandı!")
+            print(f"Hata: {outcome['error']}")
+            self.stage_results.pop(script_name, None)
+            return False
+        
+        self.stage_results[script_name] = outcome.get('result')
+        self.stage_cycles[script_name] = self.cycle_count
+        
+        # Çıktı dosyalarını kontrol et
+        if 'required_output' in script_info:
+            outputs = script_info['required_output']
+            if not self.check_file_exists(outputs):
+                print(f"\n⚠️  {script_name} beklenen çıktıları oluşturmadı!")
+                return False
+        
+        elapsed_time = time.time() - start_time
+        print(f"\n✅ {script_name} başarıyla tamamlandı! (Süre: {elapsed_time:.1f} saniye)")
+        return True
     
     def run_script(self, script_info):
         """Tek bir scripti çalıştır"""
@@ -218,7 +523,7 @@ class TradingBotController:
         try:
             with open('entry_short_signals.json', 'r') as f:
                 data = json.load(f)
-                short_coins = data.get('active_signals', [])
+                short_coins = data.get('short_signals', {}).get('coins', [])
         except:
             pass
             
@@ -226,7 +531,7 @@ class TradingBotController:
         if short_coins:
             for signal in short_coins:
                 symbol = signal.get('symbol', 'N/A')
-                timeframes = signal.get('above_range_timeframes', [])
+                timeframes = signal.get('timeframes', [])
                 tf_text = '/'.join(timeframes) if timeframes else 'N/A'
                 print(f"   • {symbol} (Range üstü: {tf_text})")
         else:
@@ -304,17 +609,57 @@ class TradingBotController:
         print(f"\n📊 TOPLAM: {total_coins} coin tarandı")
         print(f"{'='*80}")
     
-    def run_cycle(self):
-        """Tek bir döngü çalıştır"""
+    def wait_for_stale_stage(self):
+        """İptal edilip durmayan aşama thread'i bitene kadar bekle"""
+        if self.stale_stage is None:
+            return
+        for _ in range(self.stale_stage_limit):
+            if not self.stale_stage.is_alive():
+                break
+            print(f"⏳ İptal edilen {self.stale_stage.name} aşamasının durması bekleniyor...")
+            self.stale_stage.join(self.cancel_grace)
+        
+        if self.stale_stage.is_alive():
+            # Thread öldürülemez; process'i bitir ki platform temiz bir process başlatsın
+            print(f"\n❌ {self.stale_stage.name} {self.stale_stage_limit * self.cancel_grace} saniyede durmadı, "
+                  f"bot yeniden başlatılmak üzere çıkıyor")
+            if self.shard_coordinator:
+                self.shard_coordinator.stop()
+            sys.stdout.flush()
+            os._exit(1)  # Aşamanın thread havuzları atexit'te beklenmesin
+        self.stale_stage = None
+        stage_cancel.reset()
+    
+    def run_cycle(self, scripts=None):
+        """Tek bir döngü çalıştır (scripts verilirse sadece onlar, diğerlerinin sonuçları korunur)"""
+        # Önceki döngüde iptal edilen aşama hâlâ çalışıyorsa aynı dosyalara ikinci kez yazılmasın
+        self.wait_for_stale_stage()
         self.cycle_count += 1
         print(f"\n{'#'*60}")
         print(f"🔄 DÖNGÜ #{self.cycle_count} BAŞLADI")
         print(f"🕐 Zaman: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"{'#'*60}")
         
+        if scripts is None:
+            # Önceki döngünün sonuçları bu döngüye taşınmasın
+            self.stage_results = {}
+            scripts = self.scripts
+        else:
+            skipped = [s['name'] for s in self.scripts if s not in scripts]
+            if skipped:
+                print(f"♻️  Yeni kapanan bar yok, önceki sonuçlar kullanılıyor: {', '.join(skipped)}")
+        
+        if signal_events.EVENT_MODE:
+            signal_events.get_event_log().begin_cycle()
+        
         # Her scripti sırayla çalıştır
-        for script_info in self.scripts:
-            success = self.run_script(script_info)
+        for script_info in scripts:
+            success = self.run_stage(script_info)
+            
+            if self.stale_stage is not None:
+                # Sonraki aşamalar eski thread'in yazdığı dosyaları okur; döngü burada kesilir
+                print(f"\n⚠️  {script_info['name']} durdurulamadı, döngünün kalanı ve yükleme atlanıyor")
+                break
             
             if not success:
                 print(f"\n⚠️  {script_info['name']} başarısız oldu, döngü devam ediyor...")
@@ -322,21 +667,76 @@ class TradingBotController:
                 time.sleep(5)
                 continue
             
-            # Scriptler arası kısa bekleme
-            time.sleep(2)
+            # Scriptler arası kısa bekleme (in-process modda gerek yok)
+            if self.execution_mode != 'inprocess':
+                time.sleep(2)
         
         # Döngü özeti
         self.show_summary()
         
-        # Sonuçları Supabase'e yükle
-        self.upload_all_results()
+        # Bu döngünün sinyal olayları (olay modunda)
+        if signal_events.EVENT_MODE:
+            event_log = signal_events.get_event_log()
+            delta = event_log.write_delta()
+            event_log.write_snapshot()
+            print(f"🧾 Döngü olayları: {len(delta['events'])} (seq {delta['from_seq']} -> {delta['to_seq']})")
+        
+        # Sonuçları Supabase'e yükle (durdurulamayan aşama dosya yazıyor olabilir)
+        if self.stale_stage is None:
+            upload_start = time.time()
+            self.upload_all_results()
+            metrics.get_metrics().record_stage('upload', time.time() - upload_start)
+        
+        # Döngü metriklerini yaz (nereye ne kadar süre gittiğini görmek için)
+        report = metrics.get_metrics().end_cycle(self.cycle_count)
+        slowest = sorted(report['stages'].items(), key=lambda x: x[1]['last_seconds'], reverse=True)[:3]
+        if slowest:
+            print("📈 En uzun aşamalar: " + ", ".join(f"{name} {entry['last_seconds']:.1f}s" for name, entry in slowest))
+    
+    def due_scripts(self):
+        """Girdi timeframe'lerinden en az birinde yeni bar kapanmış aşamaları döndür"""
+        closed_bars = {}
+        for script_info in self.scripts:
+            for interval in script_info.get('intervals', []):
+                closed_bars[interval] = last_closed_open_time(interval)
+        
+        new_intervals = {itv for itv, bar in closed_bars.items() if self.last_closed_bars.get(itv) != bar}
+        self.last_closed_bars.update(closed_bars)
+        
+        return [s for s in self.scripts
+                if not s.get('intervals') or new_intervals.intersection(s['intervals'])]
+    
+    def seconds_until_next_bar_close(self):
+        """En yakın bar kapanışına (grace payı dahil) kalan süre"""
+        now_ms = int(time.time() * 1000)
+        intervals = {itv for s in self.scripts for itv in s.get('intervals', [])}
+        next_close = min(last_closed_open_time(itv, now_ms) + 2 * interval_ms(itv) for itv in intervals)
+        return max(0, (next_close - now_ms) / 1000) + self.bar_close_grace
+    
+    def run_aligned(self):
+        """Bar kapanışlarına hizalı döngü: sadece girdisi değişen aşamalar çalışır"""
+        while True:
+            scripts = self.due_scripts()
+            if scripts:
+                cycle_start = time.time()
+                self.run_cycle(scripts)
+                print(f"\n📊 Son döngü süresi: {time.time() - cycle_start:.1f} saniye")
+            
+            wait_seconds = self.seconds_until_next_bar_close()
+            print(f"\n⏳ Sonraki bar kapanışına {wait_seconds:.0f} saniye...")
+            print(f"🔄 Sonraki döngü: {datetime.now() + timedelta(seconds=wait_seconds)}")
+            time.sleep(wait_seconds)
     
     def run_forever(self):
         """Sonsuz döngüde çalıştır"""
         print("🚀 Trading Bot Controller Başlatıldı!")
         print(f"📌 Python: {self.python_executable}")
+        print(f"⚙️  Çalıştırma modu: {self.execution_mode}")
         print(f"📂 Çalışma dizini: {os.getcwd()}")
-        print(f"⏰ Döngüler arası bekleme: {self.wait_between_cycles} saniye")
+        if self.schedule_mode == 'aligned':
+            print(f"⏰ Zamanlayıcı: bar kapanışına hizalı (+{self.bar_close_grace} saniye)")
+        else:
+            print(f"⏰ Döngüler arası bekleme: {self.wait_between_cycles} saniye")
         
         # Supabase bağlantı durumu
         if self.supabase:
@@ -344,7 +744,15 @@ class TradingBotController:
         else:
             print("⚠️  Supabase bağlantısı yok - sonuçlar sadece lokal kaydedilecek")
         
+        # Prometheus uç noktası (METRICS_PORT verildiyse)
+        metrics.start_server()
+        # Sinyal API'si (SIGNAL_API_PORT verildiyse)
+        signal_api.start_server()
+        
         try:
+            if self.schedule_mode == 'aligned':
+                self.run_aligned()
+            
             while True:
                 # Döngüyü çalıştır
                 cycle_start = time.time()
@@ -368,6 +776,9 @@ class TradingBotController:
         except Exception as e:
             print(f"\n\n❌ Beklenmeyen hata: {e}")
             print("🔄 Bot yeniden başlatılmalı...")
+        finally:
+            if self.shard_coordinator:
+                self.shard_coordinator.stop()
 
 def main():
     """Ana fonksiyon"""
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bot metrikleri
+
+Gözlemlenebilirlik emoji print'lerinden ibaretti; run_script sadece toplam
+süreyi yazıyordu. Bu modül process genelinde tek bir kayıt defteri tutar:
+
+- Aşama süreleri (başarılı/başarısız çalıştırma sayıları ile)
+- Sembol başına analiz süreleri
+- Host/endpoint başına HTTP çağrı, hata, gecikme ve byte sayıları
+- kline_cache isabet oranları
+- Binance X-MBX-USED-WEIGHT-1M okumaları
+
+Her döngü sonunda o döngünün metrikleri METRICS_FILE'a yazılır;
+METRICS_PORT verilirse aynı process'te /metrics (Prometheus text) ve
+/metrics.json uç noktaları sunulur (kümülatif değerler).
+"""
+
+import os, json, time, threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from json_writer import write_json
+
+# ---------- CONFIG ----------
+METRICS_FILE = os.getenv("METRICS_FILE", "metrics.json")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0: HTTP uç noktası kapalı
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+WEIGHT_HEADER = "X-MBX-USED-WEIGHT-1M"
+
+# ---------- REGISTRY ----------
+class MetricsBucket:
+    """Tek bir zaman aralığının (döngü ya da process ömrü) metrikleri"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.stages: Dict[str, Dict] = {}
+        self.symbols: Dict[str, Dict[str, float]] = {}
+        self.http: Dict[tuple, Dict] = {}
+        self.used_weight: Optional[int] = None
+        self.max_used_weight = 0
+
+    def record_stage(self, stage: str, seconds: float, success: bool):
+        entry = self.stages.setdefault(stage, {"runs": 0, "failures": 0, "seconds_total": 0.0, "last_seconds": 0.0})
+        entry["runs"] += 1
+        entry["failures"] += 0 if success else 1
+        entry["seconds_total"] += seconds
+        entry["last_seconds"] = seconds
+
+    def record_symbol(self, analyzer: str, symbol: str, seconds: float):
+        per_symbol = self.symbols.setdefault(analyzer, {})
+        per_symbol[symbol] = per_symbol.get(symbol, 0.0) + seconds
+
+    def record_http(self, host: str, endpoint: str, status: int, seconds: float, nbytes: int,
+                    used_weight: Optional[int]):
+        entry = self.http.setdefault((host, endpoint), {"requests": 0, "errors": 0, "seconds_total": 0.0,
+                                                        "seconds_max": 0.0, "bytes": 0, "status": {}})
+        entry["requests"] += 1
+        entry["errors"] += 0 if 200 <= status < 400 else 1
+        entry["seconds_total"] += seconds
+        entry["seconds_max"] = max(entry["seconds_max"], seconds)
+        entry["bytes"] += nbytes
+        entry["status"][str(status)] = entry["status"].get(str(status), 0) + 1
+        if used_weight is not None:
+            self.used_weight = used_weight
+            self.max_used_weight = max(self.max_used_weight, used_weight)
+
+    def to_dict(self, cache_stats: Dict) -> Dict:
+        lookups = cache_stats.get("memory_hits", 0) + cache_stats.get("disk_hits", 0) + cache_stats.get("misses", 0)
+        hits = cache_stats.get("memory_hits", 0) + cache_stats.get("disk_hits", 0)
+        return {
+            "started_at": self.started_at,
+            "seconds": round(time.time() - self.started_at, 3),
+            "stages": self.stages,
+            "symbol_analysis": {
+                analyzer: {
+                    "symbols": len(per_symbol),
+                    "seconds_total": round(sum(per_symbol.values()), 6),
+                    "slowest": sorted(((s, round(t, 6)) for s, t in per_symbol.items()),
+                                      key=lambda x: x[1], reverse=True)[:10],
+                    "per_symbol": {s: round(t, 6) for s, t in per_symbol.items()},
+                }
+                for analyzer, per_symbol in self.symbols.items()
+            },
+            "http": [
+                {"host": host, "endpoint": endpoint, **entry,
+                 "seconds_avg": round(entry["seconds_total"] / entry["requests"], 6) if entry["requests"] else 0.0}
+                for (host, endpoint), entry in sorted(self.http.items())
+            ],
+            "cache": {**cache_stats, "hit_rate": round(hits / lookups, 4) if lookups else None},
+            "binance_weight": {"used_weight_1m": self.used_weight, "max_used_weight_1m": self.max_used_weight},
+        }
+
+class Metrics:
+    """Döngü ve kümülatif metrikleri birlikte tutan kayıt defteri"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cycle = MetricsBucket()
+        self.total = MetricsBucket()
+        self.cycle_number = 0
+        self._cache_base: Dict = {}
+
+    def _record(self, method: str, *args):
+        with self.lock:
+            getattr(self.cycle, method)(*args)
+            getattr(self.total, method)(*args)
+
+    def record_stage(self, stage: str, seconds: float, success: bool = True):
+        self._record("record_stage", stage, seconds, success)
+
+    def record_symbol(self, analyzer: str, symbol: str, seconds: float):
+        self._record("record_symbol", analyzer, symbol, seconds)
+
+    def record_http(self, host: str, endpoint: str, status: int, seconds: float, nbytes: int = 0,
+                    used_weight: Optional[int] = None):
+        self._record("record_http", host, endpoint, status, seconds, nbytes, used_weight)
+
+    @contextmanager
+    def timed_symbol(self, analyzer: str, symbol: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_symbol(analyzer, symbol, time.perf_counter() - started)
+
+    def _cache_stats(self) -> Dict:
+        import kline_cache
+        return dict(kline_cache.get_cache().stats)
+
+    def _limiter_stats(self) -> Dict:
+        import rate_limiter
+        return rate_limiter.get_limiter().snapshot()
+
+    def snapshot(self, cumulative: bool = True) -> Dict:
+        cache_stats = self._cache_stats()
+        limiter_stats = self._limiter_stats()
+        with self.lock:
+            if cumulative:
+                report = self.total.to_dict(cache_stats)
+            else:
+                cycle_cache = {k: v - self._cache_base.get(k, 0) for k, v in cache_stats.items()}
+                report = self.cycle.to_dict(cycle_cache)
+        return {"cycle": self.cycle_number, **report, "rate_limiter": limiter_stats}
+
+    def end_cycle(self, cycle_number: int, path: str = METRICS_FILE) -> Dict:
+        """Döngü metriklerini dosyaya yaz ve döngü sayaçlarını sıfırla"""
+        self.cycle_number = cycle_number
+        report = self.snapshot(cumulative=False)
+        try:
+            write_json(path, report, compact=False, fsync=False)
+        except OSError as e:
+            print(f"⚠️  Metrik dosyası yazılamadı: {e}")
+
+        with self.lock:
+            self.cycle = MetricsBucket()
+        self._cache_base = self._cache_stats()
+        return report
+
+_metrics = Metrics()
+
+def get_metrics() -> Metrics:
+    """Process genelinde paylaşılan metrik kayıt defteri"""
+    return _metrics
+
+def parse_weight(headers) -> Optional[int]:
+    """Yanıt başlıklarından X-MBX-USED-WEIGHT-1M değerini oku"""
+    value = headers.get(WEIGHT_HEADER) if headers is not None else None
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+# ---------- PROMETHEUS ----------
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def to_prometheus(snapshot: Dict) -> str:
+    """Kümülatif snapshot'ı Prometheus text formatına çevir"""
+    lines = []
+
+    def metric(name: str, kind: str, help_text: str, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    stages = snapshot["stages"]
+    metric("margingate_stage_runs_total", "counter", "Stage runs",
+           [({"stage": s}, e["runs"]) for s, e in stages.items()])
+    metric("margingate_stage_failures_total", "counter", "Failed stage runs",
+           [({"stage": s}, e["failures"]) for s, e in stages.items()])
+    metric("margingate_stage_seconds_total", "counter", "Total stage wall time",
+           [({"stage": s}, round(e["seconds_total"], 6)) for s, e in stages.items()])
+    metric("margingate_stage_last_seconds", "gauge", "Wall time of the last stage run",
+           [({"stage": s}, round(e["last_seconds"], 6)) for s, e in stages.items()])
+
+    analysis = snapshot["symbol_analysis"]
+    metric("margingate_symbol_analysis_seconds_total", "counter", "Per-symbol analysis time",
+           [({"analyzer": a, "symbol": s}, t) for a, e in analysis.items() for s, t in e["per_symbol"].items()])
+
+    http = snapshot["http"]
+    metric("margingate_http_requests_total", "counter", "HTTP requests",
+           [({"host": e["host"], "endpoint": e["endpoint"]}, e["requests"]) for e in http])
+    metric("margingate_http_errors_total", "counter", "HTTP requests without a 2xx/3xx response",
+           [({"host": e["host"], "endpoint": e["endpoint"]}, e["errors"]) for e in http])
+    metric("margingate_http_seconds_total", "counter", "HTTP request latency sum",
+           [({"host": e["host"], "endpoint": e["endpoint"]}, round(e["seconds_total"], 6)) for e in http])
+    metric("margingate_http_seconds_max", "gauge", "Slowest HTTP request",
+           [({"host": e["host"], "endpoint": e["endpoint"]}, round(e["seconds_max"], 6)) for e in http])
+    metric("margingate_http_response_bytes_total", "counter", "HTTP response bytes",
+           [({"host": e["host"], "endpoint": e["endpoint"]}, e["bytes"]) for e in http])
+
+    cache = snapshot["cache"]
+    metric("margingate_kline_cache_events_total", "counter", "Kline cache lookups and fetches",
+           [({"event": k}, v) for k, v in cache.items() if k != "hit_rate"])
+    if cache.get("hit_rate") is not None:
+        metric("margingate_kline_cache_hit_ratio", "gauge", "Kline cache hit ratio", [({}, cache["hit_rate"])])
+
+    weight = snapshot["binance_weight"]
+    if weight["used_weight_1m"] is not None:
+        metric("margingate_binance_used_weight_1m", "gauge", "Last X-MBX-USED-WEIGHT-1M reading",
+               [({}, weight["used_weight_1m"])])
+    metric("margingate_binance_used_weight_1m_max", "gauge", "Highest X-MBX-USED-WEIGHT-1M reading",
+           [({}, weight["max_used_weight_1m"])])
+    limiter = snapshot.get("rate_limiter")
+    if limiter:
+        metric("margingate_binance_concurrency", "gauge", "Adaptive Binance request concurrency",
+               [({}, limiter["concurrency"])])
+        metric("margingate_binance_throttled_total", "counter", "429/418 responses",
+               [({"status": "429"}, limiter["throttled"]), ({"status": "418"}, limiter["banned"])])
+        metric("margingate_binance_wait_seconds_total", "counter", "Time spent waiting for the weight budget",
+               [({}, limiter["wait_seconds"])])
+    metric("margingate_cycles_total", "counter", "Completed cycles", [({}, snapshot["cycle"])])
+    return "\n".join(lines) + "\n"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = to_prometheus(_metrics.snapshot()).encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/metrics.json":
+            body = json.dumps(_metrics.snapshot(), ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Her scrape'i loglama
+
+def start_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> Optional[ThreadingHTTPServer]:
+    """Metrik uç noktasını arka plan thread'inde başlat (port 0 ise başlatma)"""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"⚠️  Metrik sunucusu başlatılamadı ({host}:{port}): {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"📈 Metrikler: http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory-mapped kolonsal OHLCV deposu
+
+Her yeniden başlatma (Railway ON_FAILURE) tüm pencereleri sıfırdan
+indiriyordu ve döngüler arasında limit=500'den uzun geçmiş tutulmuyordu.
+Bu modül her symbol/interval için kolon başına sabit genişlikli
+(float64/int64) ikili dosyalar tutar:
+
+    .ohlcv_store/<interval>/<symbol>/<kolon>.bin   ham dizi (satır başına 8 byte)
+    .ohlcv_store/<interval>/<symbol>/meta.json     satır sayısı, son açılış/kapanış zamanı
+
+- Yazma sadece kuyruğa eklenir; yalnızca son saklanan (oluşmakta olan) bar
+  yeniden yazılır, kapanmış barlara dokunulmaz.
+- Okuma np.memmap üzerinden kopyasız numpy görünümleri döndürür; geçmiş
+  ne kadar uzarsa uzasın RAM kullanımı artmaz.
+- kline_cache.store() her pencereyi buraya da yazar; process yeniden
+  başladığında kline_cache pencereyi buradan canlandırıp sadece eksik
+  barları (artımlı) indirir.
+
+Aynı seriyi birden fazla process yazar (analiz havuzu, subprocess aşamaları,
+shard worker'ları). Her serinin dizinindeki .lock dosyası fcntl ile
+kilitlenir: yazma özel, okuma paylaşımlı kilit altında yapılır. Seri yeniden
+başlatılırken kolonlar geçici dosyaya yazılıp os.replace ile değiştirilir;
+açık memmap'ler eski dosyayı görmeye devam eder, kısalmış dosya okunmaz.
+"""
+
+import os, json, time, threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # POSIX dışı platformlarda sadece process içi kilit
+    fcntl = None
+
+from kline_cache import interval_ms
+
+# ---------- CONFIG ----------
+STORE_ENABLED = os.getenv("OHLCV_STORE", "1") != "0"
+STORE_DIR     = os.getenv("OHLCV_STORE_DIR", ".ohlcv_store")
+
+# Binance kline satırı ile aynı sırada kolonlar ("ignore" saklanmaz)
+COLUMNS = (
+    ("timestamp", np.int64),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.float64),
+    ("close_time", np.int64),
+    ("quote_asset_volume", np.float64),
+    ("number_of_trades", np.int64),
+    ("taker_buy_base_asset_volume", np.float64),
+    ("taker_buy_quote_asset_volume", np.float64),
+)
+ITEM_SIZE = 8
+
+_lock = threading.Lock()  # fcntl yoksa kullanılır
+
+# ---------- PATHS / META ----------
+def _series_dir(symbol: str, interval: str) -> str:
+    return os.path.join(STORE_DIR, interval, symbol)
+
+def _column_path(symbol: str, interval: str, column: str) -> str:
+    return os.path.join(_series_dir(symbol, interval), f"{column}.bin")
+
+@contextmanager
+def _series_lock(symbol: str, interval: str, exclusive: bool):
+    """Seri başına process'ler arası kilit (yazma: özel, okuma: paylaşımlı)"""
+    directory = _series_dir(symbol, interval)
+    if exclusive:
+        os.makedirs(directory, exist_ok=True)
+    if fcntl is None:
+        with _lock:
+            yield
+        return
+    try:
+        fd = os.open(os.path.join(directory, ".lock"), os.O_RDWR | os.O_CREAT, 0o666)
+    except OSError:
+        if exclusive:
+            raise
+        yield  # Seri yok (ya da dizin yazılamıyor); okuma meta'ya göre karar verir
+        return
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        os.close(fd)  # Kilit dosya kapanınca bırakılır
+
+def read_meta(symbol: str, interval: str) -> Optional[Dict]:
+    """Serinin küçük indeksini döndür (rows, first/last open time, last close time)"""
+    try:
+        with open(os.path.join(_series_dir(symbol, interval), "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(symbol: str, interval: str, meta: Dict):
+    path = os.path.join(_series_dir(symbol, interval), "meta.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, separators=(",", ":"))
+    os.replace(tmp_path, path)  # Meta en son yazılır; okuyucu yarım satır görmez
+
+def last_close_time(symbol: str, interval: str) -> Optional[int]:
+    meta = read_meta(symbol, interval)
+    return meta["last_close_time"] if meta and meta.get("rows") else None
+
+# ---------- READ ----------
+def read(symbol: str, interval: str, bars: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Son `bars` satırı (None ise tüm geçmişi) kolon adı -> salt okunur memmap
+    görünümü olarak döndür. Seri yoksa ya da kolonlar meta ile tutarsızsa None.
+    Son satır (oluşmakta olan bar) sonraki yazmalarla güncellenebilir.
+    """
+    if not os.path.isdir(_series_dir(symbol, interval)):
+        return None
+    with _series_lock(symbol, interval, exclusive=False):
+        meta = read_meta(symbol, interval)
+        rows = meta.get("rows", 0) if meta else 0
+        if rows == 0:
+            return None
+
+        start = 0 if bars is None else max(rows - bars, 0)
+        columns = {}
+        try:
+            for name, dtype in COLUMNS:
+                path = _column_path(symbol, interval, name)
+                if os.path.getsize(path) < rows * ITEM_SIZE:
+                    print(f"⚠️  OHLCV deposu tutarsız ({symbol} {interval} {name}): meta {rows} satır diyor")
+                    return None
+                mapped = np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+                columns[name] = mapped[start:]
+        except (OSError, ValueError) as e:
+            print(f"⚠️  OHLCV deposu okunamadı ({symbol} {interval}): {e}")
+            return None
+    return columns
+
+def to_klines(columns: Dict[str, np.ndarray]) -> List[list]:
+    """Kolon görünümlerini Binance /fapi/v1/klines satır formatına çevir"""
+    names = [name for name, _ in COLUMNS]
+    rows = zip(*(columns[name].tolist() for name in names))
+    return [[t, str(o), str(h), str(l), str(c), str(v), ct, str(q), n, str(tb), str(tq), "0"]
+            for t, o, h, l, c, v, ct, q, n, tb, tq in rows]
+
+def tail_klines(symbol: str, interval: str, bars: int) -> Optional[List[list]]:
+    """Son `bars` mumu ham kline listesi olarak döndür (warm start için)"""
+    columns = read(symbol, interval, bars)
+    return to_klines(columns) if columns is not None else None
+
+# ---------- WRITE ----------
+def _to_columns(klines: List[list]) -> Dict[str, np.ndarray]:
+    # Binance sayıları string döndürür; tek geçişte float64 tabloya çevrilir
+    # (ms zaman damgaları float64'te tam temsil edilir)
+    table = np.array([row[:len(COLUMNS)] for row in klines], dtype=np.float64).reshape(-1, len(COLUMNS))
+    return {name: table[:, i].astype(dtype) for i, (name, dtype) in enumerate(COLUMNS)}
+
+def write(symbol: str, interval: str, klines: List[list]):
+    """
+    Pencereyi seriye işle. Saklanan son bardan önceki (kapanmış) barlar
+    yeniden yazılmaz; pencere saklanan geçmişle bitişik değilse seri
+    bu pencereyle yeniden başlatılır.
+    """
+    if not klines:
+        return
+
+    try:
+        with _series_lock(symbol, interval, exclusive=True):
+            _write_locked(symbol, interval, klines)
+    except OSError as e:
+        print(f"⚠️  OHLCV deposuna yazılamadı ({symbol} {interval}): {e}")
+
+def _write_column(path: str, values: np.ndarray, position: int):
+    if position == 0:
+        # Seri baştan yazılıyor: yeni dosya + os.replace (açık memmap'ler eski dosyada kalır)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(values.tobytes())
+        os.replace(tmp_path, path)
+        return
+    # Kuyruğa ekleme: dosya sadece uzar, önceki satırlar yerinde kalır
+    with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+        f.seek(position * ITEM_SIZE)
+        f.write(values.tobytes())
+        f.truncate()
+
+def _write_locked(symbol: str, interval: str, klines: List[list]):
+    # Seri kilidi altında çağrılır
+    meta = read_meta(symbol, interval) or {}
+    rows = meta.get("rows", 0)
+    step = interval_ms(interval)
+    first_new = int(klines[0][0])
+
+    if rows and meta["first_open_time"] <= first_new <= meta["last_open_time"] + step:
+        # Kapanmış barlar zaten saklı; son saklanan (oluşuyor olabilir) bardan itibaren yaz
+        open_times = [int(row[0]) for row in klines]
+        skip = bisect_left(open_times, meta["last_open_time"])
+        if skip == len(open_times):
+            return  # Saklanandan eski pencere - yeni barları silme
+        position = rows - 1 if open_times[skip] == meta["last_open_time"] else rows
+        klines = klines[skip:]
+    else:
+        if rows and int(klines[-1][0]) < meta["last_open_time"]:
+            return  # Saklanandan eski pencere - yeni barları silme
+        if rows and first_new > meta["last_open_time"] + step:
+            print(f"⚠️  {symbol} {interval} OHLCV geçmişi pencereyle bitişik değil - seri yeniden başlatılıyor")
+        position = 0
+        meta = {"symbol": symbol, "interval": interval, "first_open_time": first_new}
+
+    for name, values in _to_columns(klines).items():
+        _write_column(_column_path(symbol, interval, name), values, position)
+
+    meta.update({
+        "rows": position + len(klines),
+        "last_open_time": int(klines[-1][0]),
+        "last_close_time": int(klines[-1][6]),
+        "updated_at": time.time(),
+    })
+    _write_meta(symbol, interval, meta)
@@ -1,6 +1,13 @@
-import pandas as pd
 import numpy as np
-import requests
+from kline_cache import fetch_klines, get_cached
+from kline_arrays import parse_klines
+from kline_fetcher import prefetch
+from smc_kernels import swing_highs, first_cross_above, first_cross_below
+from smc_batch import analyze_universe
+import analysis_pool
+import stage_cancel
+from metrics import get_metrics
+from json_writer import write_json
 import warnings
 import json
 import time
@@ -12,7 +19,7 @@ class SimplifiedSMC:
         self.symbol = symbol
         self.interval = interval
         self.limit = limit
-        self.data = None
+        self.bars = None  # KlineArrays (open_time/open/high/low/close/volume)
         self.weak_high = None
         self.last_bullish_bos = None
         self.swing_low = None
@@ -22,37 +29,19 @@ class SimplifiedSMC:
         self.signal = None  # Sinyal için yeni değişken
         self.swing_low_broken = False  # Swing low kırılma kontrolü
         
-    def fetch_binance_data(self):
-        """Binance Perpetual verilerini çek"""
-        url = "https://fapi.binance.com/fapi/v1/klines"
-        params = {
-            'symbol': self.symbol,
-            'interval': self.interval,
-            'limit': self.limit
-        }
-        
+    @property
+    def data(self):
+        """Hata ayıklama için DataFrame görünümü (analiz numpy dizileri üzerinde çalışır)"""
+        return self.bars.to_frame() if self.bars is not None else None
+    
+    def fetch_binance_data(self, klines=None):
+        """Binance Perpetual verilerini çek (klines verilirse indirme yapılmaz)"""
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            # DataFrame oluştur
-            df = pd.DataFrame(data, columns=[
-                'timestamp', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'quote_asset_volume', 'number_of_trades',
-                'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-            ])
-            
-            # Veri tiplerini düzenle
-            for col in ['open', 'high', 'low', 'close', 'volume']:
-                df[col] = pd.to_numeric(df[col])
-            
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('timestamp', inplace=True)
+            # Aynı döngüde başka bir aşama çektiyse cache'ten gelir
+            data = klines if klines is not None else fetch_klines(self.symbol, self.interval, self.limit)
             
-            # Sadece gerekli kolonları al
-            self.data = df[['open', 'high', 'low', 'close', 'volume']].copy()
-            self.data.columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+            # Ham kline listesi doğrudan numpy kolonlarına çözülür (DataFrame kurulmaz)
+            self.bars = parse_klines(data)
             
             return True
             
@@ -62,96 +51,70 @@ class SimplifiedSMC:
     
     def find_weak_high(self):
         """En yüksek değeri (Weak High) bul"""
+        weak_idx = int(self.bars.high.argmax())
         self.weak_high = {
-            'price': self.data['High'].max(),
-            'index': self.data['High'].idxmax(),
-            'timestamp': self.data['High'].idxmax()
+            'price': self.bars.high[weak_idx],
+            'index': self.bars.timestamp(weak_idx),
+            'timestamp': self.bars.timestamp(weak_idx),
+            'position': weak_idx
         }
     
     def find_last_bullish_bos(self):
         """Son bullish BOS'u bul (basitleştirilmiş swing high kırılması)"""
+        highs = self.bars.high
+        closes = self.bars.close
+        
         # Swing high'ları tespit et (5 bar lookback)
-        swing_highs = []
         lookback = 5
+        swing_idx = swing_highs(highs, lookback)
         
-        for i in range(lookback, len(self.data) - lookback):
-            current_high = self.data['High'].iloc[i]
-            left_highs = self.data['High'].iloc[i-lookback:i]
-            right_highs = self.data['High'].iloc[i+1:i+lookback+1]
-            
-            if current_high > left_highs.max() and current_high > right_highs.max():
-                swing_highs.append({
-                    'price': current_high,
-                    'index': i,
-                    'timestamp': self.data.index[i],
-                    'crossed': False
-                })
+        # Sadece weak high'dan önce olan swing high'lar, kırılma da en geç weak high mumunda
+        if self.weak_high:
+            weak_idx = self.weak_high['position']
+            swing_idx = swing_idx[swing_idx < weak_idx]
+            stop = weak_idx + 1
+        else:
+            stop = len(self.bars)
         
-        # Swing high kırılmalarını bul (bullish BOS) - sadece weak high'dan ÖNCE olanlar
-        bullish_bos_list = []
+        if len(swing_idx) == 0:
+            return
         
-        for swing in swing_highs:
-            swing_price = swing['price']
-            swing_idx = swing['index']
-            swing_time = swing['timestamp']
-            
-            # Sadece weak high'dan önce olan swing high'ları kontrol et
-            if self.weak_high and swing_time >= self.weak_high['timestamp']:
-                continue
-            
-            # Swing high'dan sonraki barları kontrol et
-            for j in range(swing_idx + 1, len(self.data)):
-                close_price = self.data['Close'].iloc[j]
-                break_time = self.data.index[j]
-                
-                # Weak high'dan sonra kırılma olmamalı
-                if self.weak_high and break_time > self.weak_high['timestamp']:
-                    break
-                
-                if close_price > swing_price:  # Kırılma
-                    bullish_bos_list.append({
-                        'break_price': close_price,
-                        'swing_price': swing_price,
-                        'break_timestamp': break_time,
-                        'swing_timestamp': swing_time,
-                        'swing_index': swing_idx
-                    })
-                    break
+        # Swing high kırılmalarını bul (bullish BOS): seviyenin üstündeki ilk kapanış
+        break_idx = first_cross_above(closes, highs[swing_idx], swing_idx + 1, stop)
+        broken = np.flatnonzero(break_idx >= 0)
         
         # Son bullish BOS'u al (weak high'dan önce olan)
-        if bullish_bos_list:
-            self.last_bullish_bos = bullish_bos_list[-1]
+        if len(broken):
+            swing_i = int(swing_idx[broken[-1]])
+            break_j = int(break_idx[broken[-1]])
+            self.last_bullish_bos = {
+                'break_price': closes[break_j],
+                'swing_price': highs[swing_i],
+                'break_timestamp': self.bars.timestamp(break_j),
+                'swing_timestamp': self.bars.timestamp(swing_i),
+                'swing_index': swing_i
+            }
     
     def find_swing_low_in_range(self):
         """BOS swing high'ı ile Weak High arasındaki en düşük değeri gören mumu bul"""
         if not self.last_bullish_bos or not self.weak_high:
             return
         
-        # BOS swing high zamanından Weak High'a kadar olan veriyi al
-        bos_swing_time = self.last_bullish_bos['swing_timestamp']
-        weak_high_time = self.weak_high['timestamp']
-        
-        if bos_swing_time < weak_high_time:
-            range_data = self.data[bos_swing_time:weak_high_time]
-        else:
+        # BOS swing high'ından Weak High'a kadar (dahil) olan barlar
+        start = self.last_bullish_bos['swing_index']
+        end = self.weak_high['position']
+        if start >= end:
             return
         
-        if len(range_data) == 0:
-            return
-        
-        # En düşük değeri (Low) bul ve o mumun tüm bilgilerini al
-        min_low_price = range_data['Low'].min()
-        min_low_timestamp = range_data['Low'].idxmin()
-        
-        # O mumun tüm değerlerini al
-        swing_low_candle = range_data.loc[min_low_timestamp]
+        # En düşük değeri (Low) gören ilk mum
+        low_idx = start + int(self.bars.low[start:end + 1].argmin())
         
         self.swing_low = {
-            'low': min_low_price,
-            'open': swing_low_candle['Open'],
-            'high': swing_low_candle['High'],
-            'close': swing_low_candle['Close'],
-            'timestamp': min_low_timestamp
+            'low': self.bars.low[low_idx],
+            'open': self.bars.open[low_idx],
+            'high': self.bars.high[low_idx],
+            'close': self.bars.close[low_idx],
+            'timestamp': self.bars.timestamp(low_idx)
         }
     
     def check_swing_low_break(self):
@@ -159,23 +122,22 @@ class SimplifiedSMC:
         if not self.swing_low or not self.weak_high:
             return
         
-        # Weak high'dan sonraki veriyi al
-        weak_high_time = self.weak_high['timestamp']
-        data_after_weak_high = self.data[weak_high_time:]
+        # Weak high'dan (dahil) sonraki kapanışlar
+        weak_idx = self.weak_high['position']
+        closes = self.bars.close[weak_idx:]
         
-        if len(data_after_weak_high) == 0:
+        if len(closes) == 0:
             return
         
         # Range low seviyesi (swing low'un en düşük fitil değeri)
         range_low_level = self.swing_low['low']
         
         # Weak high'dan sonra range low'un altına kapanış olup olmadığını kontrol et
-        for idx, row in data_after_weak_high.iterrows():
-            if row['Close'] < range_low_level:
-                self.swing_low_broken = True
-                print(f"   ⚠️  Range Low ({range_low_level:.4f}) weak high sonrası kırıldı!")
-                print(f"      Kırılma zamanı: {idx}, Kapanış: {row['Close']:.4f}")
-                break
+        break_j = int(first_cross_below(closes, range_low_level, 0)[0])
+        if break_j >= 0:
+            self.swing_low_broken = True
+            print(f"   ⚠️  Range Low ({range_low_level:.4f}) weak high sonrası kırıldı!")
+            print(f"      Kırılma zamanı: {self.bars.timestamp(weak_idx + break_j)}, Kapanış: {closes[break_j]:.4f}")
     
     def calculate_range_and_position(self):
         """Range hesapla ve güncel pozisyonu belirle"""
@@ -187,7 +149,7 @@ class SimplifiedSMC:
         self.range_high = self.last_bullish_bos['swing_price']
         
         # Güncel fiyat
-        current_price = self.data['Close'].iloc[-1]
+        current_price = self.bars.close[-1]
         
         # Range kontrolü ve pozisyon hesaplama
         range_size = self.range_high - self.range_low
@@ -232,9 +194,9 @@ class SimplifiedSMC:
             "weak_high": float(self.weak_high['price']) if self.weak_high else None  # EKLENDİ!
         }
     
-    def analyze(self):
+    def analyze(self, klines=None):
         """Ana analiz fonksiyonu (sessiz mod)"""
-        if not self.fetch_binance_data():
+        if not self.fetch_binance_data(klines):
             return False
         
         # 1. Weak High bul
@@ -267,7 +229,15 @@ def load_coins_config(filename='coins.json'):
         print(f"❌ Coins dosyası okunamadı: {e}")
         return None
 
-def scan_all_coins(coins_config, intervals=['4h'], save_to_file=True):
+def analyze_symbol_task(task):
+    """(symbol, interval, klines) için SMC analizi - (başarılı mı, sinyal) döndürür; process havuzunda da çalışır"""
+    symbol, interval, klines = task
+    smc = SimplifiedSMC(symbol, interval, 500)
+    if not smc.analyze(klines):
+        return False, None
+    return True, smc.get_signal_json()
+
+def scan_all_coins(coins_config, intervals=['4h'], save_to_file=True, batch=True, parallel=None):
     """Tüm coinleri tara ve sinyalleri topla"""
     if not coins_config:
         return None
@@ -282,13 +252,37 @@ def scan_all_coins(coins_config, intervals=['4h'], save_to_file=True):
         'all_results': []
     }
     
-    # Her interval için ayrı alarm listesi
-    alarms_by_interval = {}
-    
     print(f"🚀 {len(symbols)} coin taranacak...")
     print("=" * 60)
     
+    # Tüm pencereleri paralel indir - analiz döngüsü cache'ten okur
+    prefetch(symbols, {interval: 500 for interval in intervals})
+    
+    # Önceden hesaplanan sonuçlar: (symbol, interval) -> (analiz başarılı mı, sinyal)
+    precomputed = {}
+    
+    # Tam pencereli semboller her interval için tek vektörel geçişte analiz edilir
+    if batch:
+        for interval in intervals:
+            batch_start = time.perf_counter()
+            batch_results = analyze_universe(symbols, interval, 500)
+            get_metrics().record_stage(f"smc_batch_{interval}", time.perf_counter() - batch_start)
+            for key, signal in batch_results.items():
+                precomputed[key] = (True, signal)
+    
+    # Kalanlar paralel modda process havuzunda analiz edilir
+    if analysis_pool.is_enabled(parallel):
+        tasks = []
+        for symbol in symbols:
+            for interval in intervals:
+                klines = get_cached(symbol, interval, 500)
+                if (symbol, interval) not in precomputed and klines is not None:
+                    tasks.append((symbol, interval, klines))
+        for task, result in zip(tasks, analysis_pool.map_ordered(analyze_symbol_task, tasks, "SimplifiedSMC")):
+            precomputed[(task[0], task[1])] = result
+    
     for idx, symbol in enumerate(symbols, 1):
+        stage_cancel.check()  # Timeout'a uğrayan aşama sonuç yazmadan çıkar
         print(f"\n[{idx}/{len(symbols)}] {symbol} analiz ediliyor...")
         
         try:
@@ -296,11 +290,14 @@ def scan_all_coins(coins_config, intervals=['4h'], save_to_file=True):
             for interval in intervals:
                 print(f"   📊 Interval: {interval}")
                 
-                # SMC analizi yap
-                smc = SimplifiedSMC(symbol, interval, 500)
+                if (symbol, interval) in precomputed:
+                    analyzed, signal = analysis_pool.unwrap(precomputed[(symbol, interval)])
+                else:
+                    # SMC analizi yap
+                    with get_metrics().timed_symbol("SimplifiedSMC", symbol):
+                        analyzed, signal = analyze_symbol_task((symbol, interval, None))
                 
-                if smc.analyze():
-                    signal = smc.get_signal_json()
+                if analyzed:
                     
                     if signal:
                         # Interval bilgisini ekle
@@ -319,26 +316,6 @@ def scan_all_coins(coins_config, intervals=['4h'], save_to_file=True):
                                 'timestamp': signal['timestamp']
                             })
                             
-                            # Interval bazlı alarm listesine ekle
-                            if interval not in alarms_by_interval:
-                                alarms_by_interval[interval] = {
-                                    'scan_timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                    'interval': interval,
-                                    'total_alarms': 0,
-                                    'alarms': []
-                                }
-                            
-                            alarms_by_interval[interval]['alarms'].append({
-                                'symbol': symbol,
-                                'current_price': signal['current_price'],
-                                'range_low': signal['range_low'],
-                                'range_high': signal['range_high'],
-                                'range_mid': signal['range_mid'],
-                                'range_position_pct': signal['range_position_pct'],
-                                'timestamp': signal['timestamp']
-                            })
-                            alarms_by_interval[interval]['total_alarms'] += 1
-                            
                             print(f"   🚨 ALIM SİNYALİ AKTİF! Range içinde ve %50 altında")
                         elif signal['swing_low_broken']:
                             print(f"   ⛔ Sinyal iptal - Range low kırıldı")
@@ -348,9 +325,6 @@ def scan_all_coins(coins_config, intervals=['4h'], save_to_file=True):
                     print(f"   ❌ Analiz başarısız")
                     all_signals['error_symbols'].append({'symbol': symbol, 'interval': interval})
                 
-                # Rate limit için kısa bekleme
-                time.sleep(0.5)
-                
         except Exception as e:
             print(f"   ❌ Hata: {e}")
             all_signals['error_symbols'].append({'symbol': symbol, 'error': str(e)})
@@ -373,24 +347,53 @@ def scan_all_coins(coins_config, intervals=['4h'], save_to_file=True):
     
     # Dosyaya kaydet
     if save_to_file:
-        # Ana sonuç dosyası
-        filename = "sonuc.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(all_signals, f, indent=2, ensure_ascii=False)
-        print(f"\n💾 Sonuçlar kaydedildi: {filename}")
-        
-        # Her interval için ayrı alarm dosyası
-        for interval, alarm_data in alarms_by_interval.items():
-            alarm_filename = f"alarm_{interval}.json"
-            with open(alarm_filename, 'w', encoding='utf-8') as f:
-                json.dump(alarm_data, f, indent=2, ensure_ascii=False)
-            print(f"🔔 {interval} alarmları kaydedildi: {alarm_filename} ({alarm_data['total_alarms']} alarm)")
-        
-        # Short setup için 4h alarmı dosyası
-        save_short_alarm_signals(all_signals["all_results"])
+        save_scan_results(all_signals)
     
     return all_signals
 
+def build_alarms(all_results):
+    """range_50 sonuçlarından interval bazlı alarm listeleri (interval -> alarm dosyası içeriği)"""
+    alarms_by_interval = {}
+    for signal in all_results:
+        if not signal['range_50']:
+            continue
+        interval = signal['interval']
+        if interval not in alarms_by_interval:
+            alarms_by_interval[interval] = {
+                'scan_timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'interval': interval,
+                'total_alarms': 0,
+                'alarms': []
+            }
+        
+        alarms_by_interval[interval]['alarms'].append({
+            'symbol': signal['symbol'],
+            'current_price': signal['current_price'],
+            'range_low': signal['range_low'],
+            'range_high': signal['range_high'],
+            'range_mid': signal['range_mid'],
+            'range_position_pct': signal['range_position_pct'],
+            'timestamp': signal['timestamp']
+        })
+        alarms_by_interval[interval]['total_alarms'] += 1
+    return alarms_by_interval
+
+def save_scan_results(all_signals):
+    """Tarama sonucunu sonuc.json, alarm_<interval>.json ve short_alarm_signal.json'a yaz"""
+    # Ana sonuç dosyası
+    filename = "sonuc.json"
+    write_json(filename, all_signals)
+    print(f"\n💾 Sonuçlar kaydedildi: {filename}")
+    
+    # Her interval için ayrı alarm dosyası
+    for interval, alarm_data in build_alarms(all_signals['all_results']).items():
+        alarm_filename = f"alarm_{interval}.json"
+        write_json(alarm_filename, alarm_data)
+        print(f"🔔 {interval} alarmları kaydedildi: {alarm_filename} ({alarm_data['total_alarms']} alarm)")
+    
+    # Short setup için 4h alarmı dosyası
+    save_short_alarm_signals(all_signals["all_results"])
+
 def save_short_alarm_signals(all_results, filename="short_alarm_signal.json"):
     """
     4h chartta weak high tespit edilmiş ve
@@ -418,8 +421,7 @@ def save_short_alarm_signals(all_results, filename="short_alarm_signal.json"):
                     "timestamp": signal["timestamp"],
                     "current_price": signal["current_price"]
                 })
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump({"short_signals": short_signals, "created_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')}, f, indent=2, ensure_ascii=False)
+    write_json(filename, {"short_signals": short_signals, "created_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
     print(f"\n🔻 Short alarm setup kaydedildi: {filename} ({len(short_signals)} sinyal)")
 
 # Ana kullanım
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Binance istek ağırlığı (request weight) farkındalıklı zamanlayıcı
+
+Sabit bekleme süreleri ve sabit CONCURRENCY yerine tüm Binance istekleri
+bu ortak zamanlayıcıdan geçer:
+
+- Her isteğin ağırlığı hesaplanır (klines ağırlığı `limit`e bağlıdır) ve
+  dakikalık bütçe (BINANCE_WEIGHT_LIMIT x BINANCE_WEIGHT_BUDGET) aşılacaksa
+  bir sonraki dakikaya kadar beklenir.
+- Yanıtlardaki X-MBX-USED-WEIGHT-1M başlığı yerel sayacı düzeltir (aynı IP'den
+  giden diğer istekler de sayılır).
+- Eşzamanlı istek sayısı bütçede yer oldukça artırılır, bütçe dolarken ya da
+  429/418 alındığında azaltılır.
+- 429/418 yanıtlarında Retry-After süresi boyunca yeni istek gönderilmez.
+
+Hem senkron (requests) hem asyncio (aiohttp) kodundan kullanılabilir.
+"""
+
+import os, time, asyncio, threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+import stage_cancel
+from metrics import parse_weight
+
+# ---------- CONFIG ----------
+WEIGHT_LIMIT        = int(os.getenv("BINANCE_WEIGHT_LIMIT", "2400"))     # Futures dakikalık IP limiti
+WEIGHT_BUDGET       = float(os.getenv("BINANCE_WEIGHT_BUDGET", "0.8"))   # Limitin kullanılacak oranı
+MAX_CONCURRENCY     = int(os.getenv("BINANCE_MAX_CONCURRENCY", "20"))
+MIN_CONCURRENCY     = 1
+DEFAULT_RETRY_AFTER = 60   # Retry-After başlığı yoksa (saniye)
+POLL_INTERVAL       = 0.05
+CANCEL_POLL         = 1.0  # Uzun beklemeler bu aralıkla bölünür (aşama iptali kontrolü)
+
+# Sembolsüz ticker/24hr gibi ağır uç noktalar (kline ağırlığı limit'ten hesaplanır)
+ENDPOINT_WEIGHTS = {
+    "/fapi/v1/ticker/24hr": 40,
+    "/fapi/v1/exchangeInfo": 1,
+}
+
+# ---------- WEIGHTS ----------
+def kline_weight(limit: int) -> int:
+    """/fapi/v1/klines ağırlığı: [1,100) 1, [100,500) 2, [500,1000] 5, >1000 10"""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+def request_weight(path: str, params: Optional[Dict] = None) -> int:
+    params = params or {}
+    if path.endswith("/klines"):
+        return kline_weight(int(params.get("limit", 500)))
+    if path.endswith("/ticker/24hr") and "symbol" in params:
+        return 1
+    return ENDPOINT_WEIGHTS.get(path, 1)
+
+def parse_retry_after(headers) -> float:
+    value = headers.get("Retry-After") if headers is not None else None
+    try:
+        return float(value) if value is not None else DEFAULT_RETRY_AFTER
+    except ValueError:
+        return DEFAULT_RETRY_AFTER
+
+# ---------- LIMITER ----------
+class RequestSlot:
+    """Alınan istek hakkı; çağıran yanıtı update() ile bildirir"""
+
+    def __init__(self, weight: int):
+        self.weight = weight
+        self.status = 0
+        self.headers = None
+
+    def update(self, status: int, headers=None):
+        self.status = status
+        self.headers = headers
+
+class RateLimiter:
+    """Dakikalık ağırlık bütçesi + uyarlanabilir eşzamanlılık"""
+
+    def __init__(self, weight_limit: int = WEIGHT_LIMIT, budget: float = WEIGHT_BUDGET,
+                 max_concurrency: int = MAX_CONCURRENCY):
+        self.lock = threading.Lock()
+        self.budget = max(1, int(weight_limit * budget))
+        self.max_concurrency = max(MIN_CONCURRENCY, max_concurrency)
+        self.concurrency = max(MIN_CONCURRENCY, self.max_concurrency // 2)
+        self.in_flight = 0
+        self.window = int(time.time() // 60)
+        self.used = 0  # Bu dakika kullanılan (tahmini) ağırlık
+        self.blocked_until = 0.0
+        self.successes = 0
+        self.stats = {"requests": 0, "waits": 0, "wait_seconds": 0.0, "throttled": 0, "banned": 0}
+
+    def _roll(self, now: float):
+        # Binance ağırlık sayacı her dakika başında sıfırlanır
+        minute = int(now // 60)
+        if minute != self.window:
+            self.window = minute
+            self.used = 0
+
+    def _try_acquire(self, weight: int) -> float:
+        """Hak alınabildiyse 0, alınamadıysa beklenecek süreyi döndür"""
+        now = time.time()
+        with self.lock:
+            self._roll(now)
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.used + weight > self.budget and self.used > 0:
+                return (self.window + 1) * 60 - now + POLL_INTERVAL
+            if self.in_flight >= self.concurrency:
+                return POLL_INTERVAL
+            self.in_flight += 1
+            self.used += weight
+            self.stats["requests"] += 1
+            return 0.0
+
+    def _record_wait(self, seconds: float):
+        with self.lock:
+            self.stats["waits"] += 1
+            self.stats["wait_seconds"] += seconds
+
+    def acquire(self, weight: int = 1) -> RequestSlot:
+        started = time.time()
+        while True:
+            stage_cancel.check()  # İptal edilen aşama yeni istek göndermesin
+            wait = self._try_acquire(weight)
+            if not wait:
+                break
+            time.sleep(min(wait, CANCEL_POLL))
+        if time.time() - started > POLL_INTERVAL:
+            self._record_wait(time.time() - started)
+        return RequestSlot(weight)
+
+    async def acquire_async(self, weight: int = 1) -> RequestSlot:
+        started = time.time()
+        while True:
+            stage_cancel.check()
+            wait = self._try_acquire(weight)
+            if not wait:
+                break
+            await asyncio.sleep(min(wait, CANCEL_POLL))
+        if time.time() - started > POLL_INTERVAL:
+            self._record_wait(time.time() - started)
+        return RequestSlot(weight)
+
+    def release(self, slot: RequestSlot):
+        """Yanıta göre sayaçları ve eşzamanlılığı güncelle"""
+        now = time.time()
+        used_weight = parse_weight(slot.headers)
+        with self.lock:
+            self.in_flight -= 1
+            self._roll(now)
+            if used_weight is not None:
+                # Sunucu değeri aynı IP'den giden diğer istekleri de içerir
+                self.used = max(self.used, used_weight)
+
+            if slot.status in (429, 418):
+                retry_after = parse_retry_after(slot.headers)
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                self.concurrency = max(MIN_CONCURRENCY, self.concurrency // 2)
+                self.successes = 0
+                self.stats["banned" if slot.status == 418 else "throttled"] += 1
+                print(f"⛔ Binance {slot.status} - {retry_after:.0f} saniye istek gönderilmeyecek "
+                      f"(eşzamanlılık {self.concurrency})")
+            elif 200 <= slot.status < 400:
+                headroom = 1 - self.used / self.budget
+                self.successes += 1
+                if headroom < 0.2:
+                    self.concurrency = max(MIN_CONCURRENCY, self.concurrency - 1)
+                    self.successes = 0
+                elif headroom > 0.5 and self.successes >= self.concurrency:
+                    self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+                    self.successes = 0
+
+    @contextmanager
+    def request(self, weight: int = 1):
+        slot = self.acquire(weight)
+        try:
+            yield slot
+        finally:
+            self.release(slot)
+
+    @asynccontextmanager
+    async def request_async(self, weight: int = 1):
+        slot = await self.acquire_async(weight)
+        try:
+            yield slot
+        finally:
+            self.release(slot)
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            return {**self.stats, "wait_seconds": round(self.stats["wait_seconds"], 3),
+                    "concurrency": self.concurrency, "in_flight": self.in_flight,
+                    "used_weight": self.used, "budget": self.budget,
+                    "blocked_for": round(max(0.0, self.blocked_until - time.time()), 1)}
+
+_limiter = RateLimiter()
+
+def get_limiter() -> RateLimiter:
+    """Process genelinde paylaşılan Binance zamanlayıcısı"""
+    return _limiter
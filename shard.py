@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sembol evreninin worker'lara bölünmesi (coordinator / worker modu)
+
+Tek controller tüm coins.json'ı taradığı için döngü süresi TARGET_SIZE ile
+doğrusal büyüyor. SHARD_MODE=coordinator ile main.py primary, entry long ve
+entry short aşamalarını kendisi çalıştırmaz:
+
+- Semboller tutarlı hash halkasıyla (sanal düğümlü) canlı worker'lara bölünür;
+  worker eklenip çıktığında sadece o worker'ın payı yer değiştirir, diğer
+  semboller aynı worker'da (ve onun kline cache'inde) kalır
+- Her worker'a kendi kuyruğundan aşama görevi (aşama adı + sembol listesi)
+  gönderilir, sonuçlar ortak sonuç kuyruğundan toplanır
+- Parçalar coins.json sırasıyla birleştirilip mevcut çıktı dosyalarına
+  (sonuc.json, alarm_*.json, entry_long_signals.json, entry_short_signals.json) yazılır
+
+Kuyruklar multiprocessing.managers sunucusundadır; worker'lar aynı makinede
+(SHARD_LOCAL_WORKERS) ya da başka host'larda çalışabilir:
+
+    SHARD_MODE=coordinator SHARD_ADDRESS=0.0.0.0:50555 SHARD_AUTHKEY=$(openssl rand -hex 32) python main.py
+    SHARD_ADDRESS=coordinator-host:50555 SHARD_AUTHKEY=<aynı anahtar> python shard.py worker --id node-2
+
+Manager bağlantıları pickle taşır; anahtarı bilen, sunucuda kod çalıştırabilir.
+Loopback dışına bağlanan coordinator SHARD_AUTHKEY verilmeden başlamaz;
+loopback'te anahtar verilmezse her çalıştırmada rastgele üretilir ve sadece
+yerel worker'lara iletilir.
+"""
+
+import os, sys, time, uuid, queue, bisect, socket, hashlib, argparse, secrets, ipaddress, threading, subprocess
+from datetime import datetime
+from multiprocessing.managers import BaseManager
+from typing import Callable, Dict, List, Optional, Tuple
+
+import stage_cancel
+
+# ---------- CONFIG ----------
+SHARD_MODE          = os.getenv("SHARD_MODE", "")            # "coordinator" ya da boş
+SHARD_ADDRESS       = os.getenv("SHARD_ADDRESS", "127.0.0.1:50555")
+SHARD_AUTHKEY       = os.getenv("SHARD_AUTHKEY", "").encode()  # Boş: sadece loopback (rastgele anahtar)
+SHARD_LOCAL_WORKERS = int(os.getenv("SHARD_LOCAL_WORKERS", "2"))  # Coordinator'ın başlattığı yerel worker sayısı
+SHARD_VNODES        = int(os.getenv("SHARD_VNODES", "64"))   # Worker başına halkadaki sanal düğüm
+HEARTBEAT_SECONDS   = 5
+WORKER_TTL          = int(os.getenv("SHARD_WORKER_TTL", "30"))   # Bu süre sinyal vermeyen worker halkadan çıkar
+STARTUP_WAIT        = int(os.getenv("SHARD_STARTUP_WAIT", "60"))  # İlk worker için bekleme
+SHARD_RETRIES       = int(os.getenv("SHARD_RETRIES", "2"))   # Kaybolan/hata veren worker'ın payı kaç kez yeniden dağıtılır
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+def is_loopback(host: str) -> bool:
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+def resolve_authkey(address: str, authkey: bytes) -> bytes:
+    """Coordinator anahtarı: verilen anahtar, loopback'te rastgele anahtar; dışa açık adreste anahtar zorunlu"""
+    if authkey:
+        return authkey
+    host, _ = parse_address(address)
+    if is_loopback(host):
+        return secrets.token_hex(32).encode()
+    raise ValueError(f"SHARD_ADDRESS={address} loopback değil; SHARD_AUTHKEY açıkça verilmeli "
+                     f"(manager bağlantıları pickle taşır, anahtarı bilen kod çalıştırabilir)")
+
+# ---------- CONSISTENT HASHING ----------
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+class HashRing:
+    """Sanal düğümlü tutarlı hash halkası (sembol -> worker)"""
+
+    def __init__(self, nodes: List[str], vnodes: int = SHARD_VNODES):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self.keys = [point for point, _ in points]
+        self.nodes = [node for _, node in points]
+
+    def node_for(self, symbol: str) -> str:
+        k = bisect.bisect(self.keys, _hash(symbol)) % len(self.keys)
+        return self.nodes[k]
+
+    def partition(self, symbols: List[str]) -> Dict[str, List[str]]:
+        """Worker -> sembol listesi (girdi sırası korunur)"""
+        shards: Dict[str, List[str]] = {}
+        for symbol in symbols:
+            shards.setdefault(self.node_for(symbol), []).append(symbol)
+        return shards
+
+# ---------- QUEUE SERVER ----------
+# Manager sunucu process'inde yaşayan nesneler
+_task_queues: Dict[str, queue.Queue] = {}
+_result_queue: queue.Queue = queue.Queue()
+
+class WorkerRegistry:
+    """Worker kalp atışları; zaman sunucu saatiyle tutulur (host saatleri farklı olabilir)"""
+
+    def __init__(self):
+        self.seen: Dict[str, float] = {}
+
+    def beat(self, worker_id: str):
+        self.seen[worker_id] = time.time()
+
+    def live(self, ttl: float) -> List[str]:
+        now = time.time()
+        return sorted(worker for worker, seen in self.seen.items() if now - seen <= ttl)
+
+_registry = WorkerRegistry()
+
+def _get_task_queue(worker_id: str) -> queue.Queue:
+    return _task_queues.setdefault(worker_id, queue.Queue())
+
+def _get_result_queue() -> queue.Queue:
+    return _result_queue
+
+def _get_registry() -> WorkerRegistry:
+    return _registry
+
+class ShardManager(BaseManager):
+    pass
+
+ShardManager.register("task_queue", callable=_get_task_queue)
+ShardManager.register("result_queue", callable=_get_result_queue)
+ShardManager.register("registry", callable=_get_registry)
+
+def connect(address: str = SHARD_ADDRESS, authkey: bytes = SHARD_AUTHKEY) -> ShardManager:
+    manager = ShardManager(address=parse_address(address), authkey=authkey)
+    manager.connect()
+    return manager
+
+# ---------- STAGES ----------
+def _run_primary(symbols: List[str], options: Dict):
+    import primary_test
+    return primary_test.scan_all_coins({"symbols": symbols}, intervals=options["intervals"], save_to_file=False)
+
+def _run_long(symbols: List[str], options: Dict):
+    import entry_long_signal
+    return entry_long_signal.analyze_coins_for_entry(symbols, save_to_file=False)
+
+def _run_short(symbols: List[str], options: Dict):
+    import entry_short_signal
+    return entry_short_signal.run_signal_scan(symbols, save_to_file=False, primary_results=options.get("primary"),
+                                              long_results=options.get("long"))
+
+STAGE_HANDLERS = {"primary": _run_primary, "long": _run_long, "short": _run_short}
+
+def _ordered(items: List[Dict], order: Dict[str, int]) -> List[Dict]:
+    # Parçaları tek process'teki tarama sırasına getir (bir sembolün kayıtları tek parçadadır)
+    return sorted(items, key=lambda item: order.get(item["symbol"], len(order)))
+
+def merge_primary(parts: List[Dict], symbols: List[str]) -> Dict:
+    order = {symbol: i for i, symbol in enumerate(symbols)}
+    return {
+        'scan_timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'total_symbols': len(symbols),
+        'scanned_symbols': sum(part['scanned_symbols'] for part in parts),
+        'error_symbols': _ordered([e for part in parts for e in part['error_symbols']], order),
+        'active_signals': _ordered([s for part in parts for s in part['active_signals']], order),
+        'all_results': _ordered([s for part in parts for s in part['all_results']], order),
+    }
+
+def merge_long(parts: List[Dict], symbols: List[str]) -> Dict:
+    order = {symbol: i for i, symbol in enumerate(symbols)}
+    return {
+        'scan_timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'total_coins': len(symbols),
+        'analyzed_coins': sum(part['analyzed_coins'] for part in parts),
+        'active_signals': _ordered([s for part in parts for s in part['active_signals']], order),
+        'all_results': _ordered([s for part in parts for s in part['all_results']], order),
+    }
+
+def merge_short(parts: List[Dict], symbols: List[str]) -> Dict:
+    order = {symbol: i for i, symbol in enumerate(symbols)}
+    short = _ordered([s for part in parts for s in part['short_signals']['coins']], order)
+    range_ici = _ordered([s for part in parts for s in part['long_signals']['range_ici']['coins']], order)
+    entry = _ordered([s for part in parts for s in part['long_signals']['entry_sinyali']['coins']], order)
+    return {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'total_coins_scanned': len(symbols),
+        'short_signals': {'count': len(short), 'coins': short},
+        'long_signals': {
+            'range_ici': {'count': len(range_ici), 'coins': range_ici},
+            'entry_sinyali': {'count': len(entry), 'coins': entry},
+        },
+    }
+
+# ---------- WORKER ----------
+def _heartbeat(worker_id: str, address: str, authkey: bytes, stop: threading.Event):
+    # Proxy'ler thread'ler arasında paylaşılmaz; kalp atışı kendi bağlantısını kullanır
+    registry = connect(address, authkey).registry()
+    while not stop.is_set():
+        try:
+            registry.beat(worker_id)
+        except (OSError, EOFError):
+            return
+        stop.wait(HEARTBEAT_SECONDS)
+
+def run_worker(worker_id: str, address: str = SHARD_ADDRESS, authkey: bytes = SHARD_AUTHKEY):
+    """Kendi kuyruğundaki aşama görevlerini çalıştır (coordinator kapanınca çıkar)"""
+    if not authkey:
+        raise ValueError("SHARD_AUTHKEY verilmeli (coordinator'daki anahtarın aynısı)")
+    manager = connect(address, authkey)
+    tasks = manager.task_queue(worker_id)
+    results = manager.result_queue()
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(worker_id, address, authkey, stop), daemon=True).start()
+    print(f"🧩 Worker {worker_id} hazır ({address})")
+
+    try:
+        while True:
+            try:
+                task = tasks.get(timeout=HEARTBEAT_SECONDS)
+            except queue.Empty:
+                continue
+            start = time.time()
+            outcome = {"task_id": task["task_id"], "worker": worker_id}
+            try:
+                outcome["result"] = STAGE_HANDLERS[task["stage"]](task["symbols"], task.get("options", {}))
+            except Exception as e:
+                outcome["error"] = f"{type(e).__name__}: {e}"
+            outcome["seconds"] = time.time() - start
+            results.put(outcome)
+    except (OSError, EOFError):
+        print(f"🔌 Worker {worker_id}: coordinator bağlantısı kapandı")
+    finally:
+        stop.set()
+
+# ---------- COORDINATOR ----------
+class ShardCoordinator:
+    """Kuyruk sunucusunu ve yerel worker'ları yönetir, aşamaları parçalara dağıtır"""
+
+    def __init__(self, address: str = SHARD_ADDRESS, authkey: bytes = SHARD_AUTHKEY,
+                 local_workers: int = SHARD_LOCAL_WORKERS):
+        self.address = address
+        self.authkey = resolve_authkey(address, authkey)  # Dışa açık adreste anahtar yoksa başlamaz
+        self.local_workers = local_workers
+        self.manager: Optional[ShardManager] = None
+        self.processes: List[subprocess.Popen] = []
+
+    def start(self):
+        if self.manager is not None:
+            return
+        self.manager = ShardManager(address=parse_address(self.address), authkey=self.authkey)
+        self.manager.start()
+        self.results = self.manager.result_queue()
+        self.registry = self.manager.registry()
+
+        host, port = parse_address(self.address)
+        connect_address = f"{'127.0.0.1' if host in ('0.0.0.0', '') else host}:{port}"
+        env = {**os.environ, "SHARD_ADDRESS": connect_address, "SHARD_MODE": "",
+               "SHARD_AUTHKEY": self.authkey.decode()}
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shard.py")
+        for i in range(self.local_workers):
+            self.processes.append(subprocess.Popen(
+                [sys.executable, script, "worker", "--id", f"local-{i}"], env=env))
+        print(f"🧩 Shard coordinator: {self.address} ({self.local_workers} yerel worker)")
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+        if self.manager is not None:
+            self.manager.shutdown()
+            self.manager = None
+
+    def live_workers(self) -> List[str]:
+        """Son WORKER_TTL saniyede kalp atışı gelen worker'lar"""
+        return self.registry.live(WORKER_TTL)
+
+    def _wait_for_workers(self) -> List[str]:
+        deadline = time.time() + STARTUP_WAIT
+        while True:
+            workers = self.live_workers()
+            if workers or time.time() > deadline:
+                return workers
+            time.sleep(0.5)
+
+    def map_shards(self, stage: str, symbols: List[str], options: Optional[Dict] = None,
+                   timeout: float = 600, shard_options: Optional[Callable[[List[str]], Dict]] = None) -> List[Dict]:
+        """
+        Aşamayı canlı worker'lara böl ve parça sonuçlarını döndür.
+        shard_options: parçanın sembollerinden o parçaya özel seçenekleri üretir.
+        Kaybolan ya da hata veren worker'ın sembolleri kalan canlı worker'ların
+        halkasına yeniden dağıtılır (en fazla SHARD_RETRIES kez); diğer parçalar
+        yerinde kalır.
+        """
+        self.start()
+        workers = self._wait_for_workers()
+        if not workers:
+            raise RuntimeError("Canlı shard worker'ı yok")
+
+        pending: Dict[str, Tuple[str, List[str], int]] = {}  # task_id -> (worker, semboller, deneme)
+        failed: set = set()  # Bu aşamada kaybolan/hata veren worker'lar
+
+        def submit(ring_workers: List[str], shard_symbols: List[str], attempt: int) -> Dict[str, List[str]]:
+            shards = HashRing(ring_workers).partition(shard_symbols)
+            for worker, part in shards.items():
+                task_id = uuid.uuid4().hex
+                pending[task_id] = (worker, part, attempt)
+                task_options = {**(options or {}), **(shard_options(part) if shard_options else {})}
+                self.manager.task_queue(worker).put({"task_id": task_id, "stage": stage,
+                                                     "symbols": part, "options": task_options})
+            return shards
+
+        def reassign(task_id: str, reason: str):
+            worker, part, attempt = pending.pop(task_id)
+            failed.add(worker)
+            survivors = [w for w in self.live_workers() if w not in failed]
+            if attempt >= SHARD_RETRIES or not survivors:
+                raise RuntimeError(f"{stage}: {worker} {reason}; {len(part)} sembol yeniden dağıtılamadı "
+                                   f"({attempt} deneme, {len(survivors)} canlı worker)")
+            shards = submit(survivors, part, attempt + 1)
+            print(f"   🔁 {worker} {reason}; {len(part)} sembol yeniden dağıtıldı "
+                  f"({', '.join(f'{w}={len(s)}' for w, s in shards.items())})")
+
+        shards = submit(workers, symbols, 0)
+        print(f"🧩 {stage}: {len(symbols)} sembol {len(shards)} worker'a bölündü "
+              f"({', '.join(f'{w}={len(s)}' for w, s in shards.items())})")
+
+        parts = []
+        deadline = time.time() + timeout
+        while pending:
+            stage_cancel.check()  # Controller aşamayı iptal ettiyse parçalar beklenmez
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError(f"{stage} parçaları gelmedi: "
+                                   f"{', '.join(sorted({w for w, _, _ in pending.values()}))}")
+            try:
+                outcome = self.results.get(timeout=min(remaining, HEARTBEAT_SECONDS))
+            except queue.Empty:
+                live = set(self.live_workers())
+                for task_id in [t for t, (w, _, _) in pending.items() if w not in live]:
+                    reassign(task_id, "kayboldu")
+                continue
+            if outcome["task_id"] not in pending:
+                continue  # Yeniden dağıtılmış ya da önceki (timeout'a düşmüş) bir görevin geç gelen sonucu
+            if "error" in outcome:
+                print(f"   ⚠️  {outcome['worker']} {stage} hatası: {outcome['error']}")
+                reassign(outcome["task_id"], "hata verdi")
+                continue
+            pending.pop(outcome["task_id"])
+            print(f"   ✅ {outcome['worker']}: {outcome['seconds']:.1f}s")
+            if outcome["result"] is not None:
+                parts.append(outcome["result"])
+        return parts
+
+    # Aşamaların sharded karşılıkları: birleştirir ve mevcut çıktı dosyalarına yazar
+    def scan_all_coins(self, coins_config: Dict, intervals: List[str], timeout: float = 600) -> Dict:
+        import primary_test
+        symbols = coins_config.get('symbols', [])
+        merged = merge_primary(self.map_shards("primary", symbols, {"intervals": intervals}, timeout), symbols)
+        primary_test.save_scan_results(merged)
+        return merged
+
+    def analyze_coins_for_entry(self, alarm_coins: List[str], timeout: float = 300) -> Dict:
+        from json_writer import write_json
+        merged = merge_long(self.map_shards("long", alarm_coins, timeout=timeout), alarm_coins)
+        write_json('entry_long_signals.json', merged)
+        print(f"💾 Entry sinyalleri kaydedildi: entry_long_signals.json ({len(merged['active_signals'])} aktif)")
+        return merged
+
+    def run_signal_scan(self, coin_symbols: List[str], primary_results: Optional[Dict] = None,
+                        long_results: Optional[Dict] = None, timeout: float = 300) -> Dict:
+        import entry_short_signal
+
+        def shard_options(shard_symbols: List[str]) -> Dict:
+            # Parçaya sadece kendi sembollerinin primary/long sonuçları gider
+            wanted = set(shard_symbols)
+            options = {}
+            if primary_results:
+                options["primary"] = {"all_results": [s for s in primary_results["all_results"] if s["symbol"] in wanted]}
+            if long_results:
+                options["long"] = {"all_results": [s for s in long_results["all_results"] if s["symbol"] in wanted]}
+            return options
+
+        merged = merge_short(self.map_shards("short", coin_symbols, timeout=timeout, shard_options=shard_options),
+                             coin_symbols)
+        entry_short_signal.save_signal_results(merged)
+        return merged
+
+# ---------- CLI ----------
+def main():
+    parser = argparse.ArgumentParser(description="Shard worker")
+    parser.add_argument("role", choices=["worker"])
+    parser.add_argument("--id", default=f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--address", default=SHARD_ADDRESS)
+    args = parser.parse_args()
+    try:
+        run_worker(args.id, args.address)
+    except ValueError as e:
+        parser.error(str(e))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Son sonuçları bellekten sunan yerel sinyal API'si
+
+Tüketiciler her döngüde Supabase Storage'dan tüm JSON dosyalarını tekrar
+indiriyordu ve tek bir sembolü sorgulamanın yolu yoktu. Bu sunucu her aşama
+bittiğinde o aşamanın sonuçlarını yayınlar:
+
+    GET /signals/long        entry_long_signals.json içeriği
+    GET /signals/short       entry_short_signals.json içeriği
+    GET /alarms/{interval}   alarm_4h.json, alarm_2h.json
+    GET /symbols             sonuç bulunan semboller
+    GET /symbols/{symbol}    sembolün range, alarm, long ve short sonuçları
+    GET /events?since=N      olay günlüğünde N'den sonraki olaylar (signal_events)
+
+Yanıt gövdeleri yayın anında bir kez serileştirilir (ve 1 KB üstündekiler
+gzip'lenir); istek başına JSON üretimi yoktur. Her gövdenin ETag'i vardır;
+If-None-Match eşleşirse 304 döner. Yayın yeni bir sözlük kurup referansı
+değiştirerek yapılır, okuyan istek yarım güncellenmiş veri görmez.
+"""
+
+import os, json, gzip, hashlib, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs
+
+from json_writer import dumps
+
+# ---------- CONFIG ----------
+API_PORT        = int(os.getenv("SIGNAL_API_PORT", "0"))  # 0: kapalı
+API_HOST        = os.getenv("SIGNAL_API_HOST", "0.0.0.0")
+GZIP_MIN_BYTES  = 1024
+ALARM_INTERVALS = ["4h", "2h"]
+
+# Aşama -> yayınlanan doküman ve sonuç yoksa (subprocess modu) okunacak dosya
+STAGE_DOCUMENTS = {
+    "primary_test.py": ("primary", "sonuc.json"),
+    "entry_long_signal.py": ("long", "entry_long_signals.json"),
+    "entry_short_signal.py": ("short", "entry_short_signals.json"),
+}
+
+# ---------- RESOURCES ----------
+class Resource:
+    """Önceden serileştirilmiş yanıt (düz ve gzip gövde + ETag)"""
+
+    __slots__ = ("body", "gzip_body", "etag", "gzip_etag")
+
+    def __init__(self, obj: Any):
+        self.body = dumps(obj, compact=True)
+        digest = hashlib.sha1(self.body).hexdigest()[:20]
+        self.etag = f'"{digest}"'
+        # Sıkıştırılmış gösterimin ETag'i farklı olmalı (aynı URL, farklı byte'lar)
+        self.gzip_etag = f'"{digest}-gz"'
+        self.gzip_body = gzip.compress(self.body, 6) if len(self.body) >= GZIP_MIN_BYTES else None
+
+def _load(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def build_symbol_index(documents: Dict[str, Any]) -> Dict[str, Dict]:
+    """Dokümanlardaki sonuçları sembol bazında topla"""
+    index: Dict[str, Dict] = {}
+
+    def entry(symbol: str) -> Dict:
+        return index.setdefault(symbol, {"symbol": symbol, "range": [], "alarms": {},
+                                         "long_entry": None, "short": None})
+
+    primary = documents.get("primary") or {}
+    for signal in primary.get("all_results", []):
+        entry(signal["symbol"])["range"].append(signal)
+
+    for interval in ALARM_INTERVALS:
+        for alarm in (documents.get(f"alarms/{interval}") or {}).get("alarms", []):
+            entry(alarm["symbol"])["alarms"][interval] = alarm
+
+    long_doc = documents.get("long") or {}
+    for signal in long_doc.get("active_signals", []):
+        entry(signal["symbol"])["long_entry"] = signal
+
+    short_doc = documents.get("short") or {}
+    for signal in short_doc.get("short_signals", {}).get("coins", []):
+        entry(signal["symbol"])["short"] = signal
+    return index
+
+class SignalStore:
+    """Yol -> Resource eşlemesi; her yayında tümüyle yeniden kurulup değiştirilir"""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # Yayınlar sıralı; okumalar kilitsiz
+        self._documents: Dict[str, Any] = {}
+        self._resources: Dict[str, Resource] = {}
+
+    def publish(self, documents: Dict[str, Any]):
+        """documents: 'primary', 'long', 'short', 'alarms/<interval>' -> içerik"""
+        documents = {name: doc for name, doc in documents.items() if doc is not None}
+        if not documents:
+            return
+        with self._lock:
+            merged = {**self._documents, **documents}
+            resources = {path: res for path, res in self._resources.items() if not path.startswith("/symbols")}
+            for name, doc in documents.items():
+                if name == "long":
+                    resources["/signals/long"] = Resource(doc)
+                elif name == "short":
+                    resources["/signals/short"] = Resource(doc)
+                elif name.startswith("alarms/"):
+                    resources[f"/{name}"] = Resource(doc)
+
+            index = build_symbol_index(merged)
+            for symbol, doc in index.items():
+                resources[f"/symbols/{symbol}"] = Resource(doc)
+            resources["/symbols"] = Resource({"symbols": sorted(index)})
+
+            self._documents = merged
+            self._resources = resources  # Tek referans değişimi - okuyanlar eski ya da yeni kümeyi görür
+
+    def get(self, path: str) -> Optional[Resource]:
+        return self._resources.get(path)
+
+_store = SignalStore()
+
+def get_store() -> SignalStore:
+    """Process genelinde paylaşılan yayın deposu"""
+    return _store
+
+# ---------- PUBLISHING ----------
+def _alarm_documents() -> Dict[str, Any]:
+    return {f"alarms/{interval}": _load(f"alarm_{interval}.json") for interval in ALARM_INTERVALS}
+
+def publish_stage(script_name: str, result: Any = None) -> Optional[Dict]:
+    """Aşama bitince sonucunu yayınla ve yayınlanan dokümanı döndür (sonuç yoksa çıktı dosyası okunur)"""
+    if script_name not in STAGE_DOCUMENTS:
+        return None
+    name, path = STAGE_DOCUMENTS[script_name]
+    documents = {name: result if isinstance(result, dict) else _load(path)}
+    if name == "primary":
+        documents.update(_alarm_documents())
+    _store.publish(documents)
+    return documents[name]
+
+def publish_files():
+    """Başlangıçta diskteki son sonuçları yayınla"""
+    documents = {"long": _load("entry_long_signals.json"), **_alarm_documents()}
+    # Eski sürümlerde short taraması sonuc.json'a, eski formattaki dosyalar da
+    # entry_short_signals.json'a yazılıyordu; sadece beklenen formattakiler yayınlanır
+    primary = _load("sonuc.json") or {}
+    if "all_results" in primary:
+        documents["primary"] = primary
+    short = _load("entry_short_signals.json") or {}
+    if "short_signals" in short:
+        documents["short"] = short
+    _store.publish(documents)
+
+# ---------- HTTP ----------
+def _etag_matches(header: Optional[str], *etags: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return any(etag in candidates for etag in etags)
+
+def _accepts_gzip(header: Optional[str]) -> bool:
+    """Accept-Encoding gzip'i q > 0 ile kabul ediyor mu (gzip;q=0 reddeder, * gzip'i de kapsar)"""
+    qualities: Dict[str, float] = {}
+    for item in (header or "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding.lower()] = q
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+class SignalHandler(BaseHTTPRequestHandler):
+    def _send_events(self, query: str, send_body: bool):
+        # Olay günlüğü kuyruğu: son olaylar bellekten, eskileri seq -> offset indeksinden okunur
+        import signal_events
+        params = parse_qs(query)
+        try:
+            since = int(params.get("since", ["0"])[0])
+        except ValueError:
+            since = 0
+        events = signal_events.get_event_log().events_since(since)
+        body = dumps({"since": since, "last_seq": events[-1]["seq"] if events else since,
+                      "events": events}, compact=True)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _respond(self, send_body: bool):
+        path, _, query = self.path.partition("?")
+        path = path.rstrip("/") or "/"
+        if path == "/events":
+            self._send_events(query, send_body)
+            return
+        if path.startswith("/symbols/"):
+            path = path.upper().replace("/SYMBOLS/", "/symbols/", 1)
+        resource = _store.get(path)
+        if resource is None:
+            body = dumps({"error": "not found", "path": path}, compact=True)
+            self.send_response(404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+            return
+
+        use_gzip = resource.gzip_body is not None and _accepts_gzip(self.headers.get("Accept-Encoding"))
+        etag = resource.gzip_etag if use_gzip else resource.etag
+        if _etag_matches(self.headers.get("If-None-Match"), resource.etag, resource.gzip_etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+
+        body = resource.gzip_body if use_gzip else resource.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def log_message(self, format, *args):
+        pass  # Her isteği loglama
+
+def start_server(port: int = API_PORT, host: str = API_HOST) -> Optional[ThreadingHTTPServer]:
+    """Sinyal API'sini arka plan thread'inde başlat (port 0 ise başlatma)"""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), SignalHandler)
+    except OSError as e:
+        print(f"⚠️  Sinyal API'si başlatılamadı ({host}:{port}): {e}")
+        return None
+    publish_files()
+    threading.Thread(target=server.serve_forever, name="signal-api", daemon=True).start()
+    print(f"📡 Sinyal API'si: http://{host}:{server.server_address[1]}/signals/long")
+    return server
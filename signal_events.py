@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sinyal yaşam döngüsü olay günlüğü
+
+Her döngü sonuc.json, alarm dosyaları ve entry dosyaları baştan yazılıp
+tamamı yükleniyor; hiçbir şey değişmese de tüketici hepsini tekrar indiriyor.
+Olay modunda (SIGNAL_EVENTS=1) her aşamanın sonucu bir önceki durumla
+karşılaştırılır ve sadece değişiklikler sıra numaralı olaylar olarak
+append-only JSONL günlüğüne eklenir:
+
+    {"seq": 42, "time": "...", "event": "opened", "kind": "long_entry", "key": "SOLUSDT", "signal": {...}}
+
+- opened:  sinyal ilk kez göründü
+- updated: sinyalin seviyeleri değişti (fiyat/zaman alanları sayılmaz)
+- closed:  sinyal artık sonuçlarda yok
+
+Döngünün olayları ayrıca signal_events_delta.json'a yazılır (yüklenen küçük
+dosya). Delta her döngü değiştiği için bir döngüyü kaçıran (ya da yüklemesi
+başarısız olan) tüketici olayları kaybeder; bu yüzden açık sinyallerin tamamı
+seq'iyle birlikte signal_events_snapshot.json'a yazılıp yüklenir. Tüketici
+delta'nın from_seq'i kendi son seq'inden büyükse snapshot'la eşitlenir.
+snapshot(seq) günlüğü baştan oynatarak herhangi bir sıra numarasındaki açık
+sinyalleri yeniden kurar:
+
+    python signal_events.py --since 40      # 40'tan sonraki olaylar
+    python signal_events.py --snapshot 42   # seq 42'deki açık sinyaller
+"""
+
+import os, json, argparse, threading
+from collections import deque
+from itertools import islice
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from json_writer import dumps, write_json
+
+# ---------- CONFIG ----------
+EVENT_MODE       = os.getenv("SIGNAL_EVENTS", "0") == "1"
+EVENT_LOG_FILE   = os.getenv("EVENT_LOG_FILE", "signal_events.jsonl")
+EVENT_DELTA_FILE = os.getenv("EVENT_DELTA_FILE", "signal_events_delta.json")
+EVENT_SNAPSHOT_FILE = os.getenv("EVENT_SNAPSHOT_FILE", "signal_events_snapshot.json")
+UPLOAD_SNAPSHOTS = os.getenv("EVENT_UPLOAD_SNAPSHOTS", "1") == "1"  # 0: olay modunda sadece delta yüklenir
+EVENT_TAIL_SIZE  = int(os.getenv("EVENT_TAIL_SIZE", "5000"))  # Bellekte tutulan son olay sayısı (/events)
+
+# Karşılaştırmada yok sayılan alanlar: her döngü değişirler, sinyalin kendisini değiştirmezler
+VOLATILE_FIELDS = {"timestamp", "current_price", "range_position_pct", "distance_pct"}
+
+# ---------- EXTRACTORS ----------
+def _range_alarms(document: Dict) -> Dict[str, Dict]:
+    return {f"{s['symbol']}:{s['interval']}": s for s in document.get("all_results", []) if s.get("range_50")}
+
+def _long_entries(document: Dict) -> Dict[str, Dict]:
+    return {s["symbol"]: s for s in document.get("active_signals", [])}
+
+def _short_entries(document: Dict) -> Dict[str, Dict]:
+    return {s["symbol"]: s for s in document.get("short_signals", {}).get("coins", [])}
+
+# Aşama -> (sinyal türü, sonuçtan anahtar -> sinyal eşlemesini çıkaran fonksiyon)
+STAGE_KINDS: Dict[str, List[tuple]] = {
+    "primary_test.py": [("range_alarm", _range_alarms)],
+    "entry_long_signal.py": [("long_entry", _long_entries)],
+    "entry_short_signal.py": [("short", _short_entries)],
+}
+
+def _stable(signal: Dict) -> Dict:
+    return {k: v for k, v in signal.items() if k not in VOLATILE_FIELDS}
+
+# ---------- REPLAY ----------
+def apply_event(state: Dict[str, Dict[str, Dict]], event: Dict):
+    """Tek bir olayı durum üzerine uygula (tür -> anahtar -> sinyal)"""
+    signals = state.setdefault(event["kind"], {})
+    if event["event"] == "closed":
+        signals.pop(event["key"], None)
+    else:
+        signals[event["key"]] = event["signal"]
+
+def read_events(path: str = EVENT_LOG_FILE, since: int = 0, until: Optional[int] = None) -> List[Dict]:
+    """Günlükten since < seq <= until olayları oku (yarım kalmış son satır atlanır)"""
+    events = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # Çökme sırasında yarım yazılmış satır
+                if event["seq"] <= since:
+                    continue
+                if until is not None and event["seq"] > until:
+                    break
+                events.append(event)
+    except OSError:
+        pass
+    return events
+
+def snapshot(seq: Optional[int] = None, path: str = EVENT_LOG_FILE) -> Dict:
+    """seq anındaki (verilmezse en son) açık sinyaller"""
+    state: Dict[str, Dict[str, Dict]] = {}
+    last_seq = 0
+    for event in read_events(path, until=seq):
+        apply_event(state, event)
+        last_seq = event["seq"]
+    return {"seq": last_seq, "signals": state}
+
+# ---------- LOG ----------
+class EventLog:
+    """
+    Append-only olay günlüğü; açılışta günlüğü oynatıp son durumu kurar.
+    Son EVENT_TAIL_SIZE olay bellekte, tüm olayların dosyadaki byte offset'i
+    indekste tutulur; events_since günlüğü baştan okumaz.
+    """
+
+    def __init__(self, path: str = EVENT_LOG_FILE, delta_path: str = EVENT_DELTA_FILE,
+                 tail_size: int = EVENT_TAIL_SIZE, snapshot_path: str = EVENT_SNAPSHOT_FILE):
+        self.path = path
+        self.delta_path = delta_path
+        self.snapshot_path = snapshot_path
+        self._lock = threading.Lock()
+        self.state: Dict[str, Dict[str, Dict]] = {}
+        self.last_seq = 0
+        self.first_seq = 1             # offsets[0]'ın sıra numarası
+        self.offsets: List[int] = []   # seq -> satırın dosyadaki başlangıcı
+        self.size = 0                  # Tam yazılmış satırların sonu
+        self.tail: deque = deque(maxlen=max(1, tail_size))
+        self._truncate_torn_tail()
+        self._load()
+        self.cycle_start_seq = self.last_seq
+        self.cycle_events: List[Dict] = []
+
+    def _load(self):
+        # Tek geçişte durum, offset indeksi ve bellek kuyruğu kurulur
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        self.size += len(line)
+                        continue
+                    if not self.offsets:
+                        self.first_seq = event["seq"]
+                    self.offsets.append(self.size)
+                    self.size += len(line)
+                    apply_event(self.state, event)
+                    self.tail.append(event)
+                    self.last_seq = event["seq"]
+        except OSError:
+            pass
+
+    def _truncate_torn_tail(self):
+        # Çökme sırasında yarım kalan son satır, sonraki eklemeyle birleşip olay kaybettirmesin
+        try:
+            with open(self.path, "rb+") as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    f.truncate(data.rfind(b"\n") + 1)
+        except OSError:
+            pass
+
+    def diff(self, kind: str, signals: Dict[str, Dict]) -> List[Dict]:
+        """Türün önceki durumuyla yeni sinyaller arasındaki olaylar (seq atanmamış)"""
+        previous = self.state.get(kind, {})
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        events = []
+        for key, signal in signals.items():
+            if key not in previous:
+                events.append({"time": now, "event": "opened", "kind": kind, "key": key, "signal": signal})
+            elif _stable(previous[key]) != _stable(signal):
+                events.append({"time": now, "event": "updated", "kind": kind, "key": key, "signal": signal})
+        for key in previous.keys() - signals.keys():
+            events.append({"time": now, "event": "closed", "kind": kind, "key": key})
+        return events
+
+    def record(self, kind: str, signals: Dict[str, Dict]) -> List[Dict]:
+        """Farkları sıra numarasıyla günlüğe ekle ve durumu güncelle"""
+        with self._lock:
+            events = self.diff(kind, signals)
+            if not events:
+                return []
+            numbered = []
+            for event in events:
+                self.last_seq += 1
+                numbered.append({"seq": self.last_seq, **event})
+
+            # Tek write + fsync; okuyan taraf yarım satırı atlar
+            lines = [dumps(event, compact=True) + b"\n" for event in numbered]
+            with open(self.path, "ab") as f:
+                f.write(b"".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+
+            if not self.offsets:
+                self.first_seq = numbered[0]["seq"]
+            for event, line in zip(numbered, lines):
+                self.offsets.append(self.size)
+                self.size += len(line)
+                apply_event(self.state, event)
+                self.tail.append(event)
+            self.cycle_events.extend(numbered)
+            return numbered
+
+    def events_since(self, since: int = 0) -> List[Dict]:
+        """seq > since olaylar: bellek kuyruğundan, daha eskiyse offset'ten itibaren dosyadan"""
+        with self._lock:
+            if since >= self.last_seq or not self.offsets:
+                return []
+            if self.tail and since + 1 >= self.tail[0]["seq"]:
+                skip = since + 1 - self.tail[0]["seq"]
+                return list(islice(self.tail, skip, None))
+            start = self.offsets[max(0, since + 1 - self.first_seq)]
+            end = self.size
+        # Kilit dışında oku; end'den sonraki (yeni eklenen) satırlar alınmaz
+        events = []
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            for line in f.read(end - start).splitlines():
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event["seq"] > since:
+                    events.append(event)
+        return events
+
+    def record_stage(self, script_name: str, document: Optional[Dict]) -> List[Dict]:
+        """Aşama sonucundaki sinyal türlerini kaydet"""
+        if not isinstance(document, dict):
+            return []
+        events = []
+        for kind, extract in STAGE_KINDS.get(script_name, []):
+            events.extend(self.record(kind, extract(document)))
+        return events
+
+    def begin_cycle(self):
+        self.cycle_start_seq = self.last_seq
+        self.cycle_events = []
+
+    def write_delta(self) -> Dict:
+        """Bu döngünün olaylarını delta dosyasına yaz"""
+        delta = {
+            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "from_seq": self.cycle_start_seq,
+            "to_seq": self.last_seq,
+            "events": self.cycle_events,
+        }
+        write_json(self.delta_path, delta)
+        return delta
+
+    def write_snapshot(self) -> Dict:
+        """Açık sinyallerin tamamını son seq ile yaz (kaçırılan delta'ları uzaktan onarmak için)"""
+        with self._lock:
+            current = {
+                "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                "seq": self.last_seq,
+                "signals": {kind: dict(signals) for kind, signals in self.state.items()},
+            }
+        write_json(self.snapshot_path, current)
+        return current
+
+_event_log: Optional[EventLog] = None
+_event_log_lock = threading.Lock()
+
+def get_event_log() -> EventLog:
+    """Process genelinde paylaşılan günlük (ilk çağrıda diskten kurulur; API thread'i de çağırır)"""
+    global _event_log
+    with _event_log_lock:
+        if _event_log is None:
+            _event_log = EventLog()
+    return _event_log
+
+# ---------- CLI ----------
+def main():
+    parser = argparse.ArgumentParser(description="Sinyal olay günlüğü")
+    parser.add_argument("--log", default=EVENT_LOG_FILE)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--since", type=int, help="Bu sıra numarasından sonraki olaylar")
+    group.add_argument("--snapshot", type=int, nargs="?", const=-1, help="Verilen seq'teki açık sinyaller (boş: en son)")
+    args = parser.parse_args()
+
+    if args.snapshot is not None:
+        result = snapshot(None if args.snapshot < 0 else args.snapshot, args.log)
+    else:
+        result = read_events(args.log, since=args.since or 0)
+    print(dumps(result, compact=False).decode("utf-8"))
+
+if __name__ == "__main__":
+    main()
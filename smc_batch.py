@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tüm evren için toplu (batch) SMC range analizi
+
+SimplifiedSMC her sembol için ayrı DataFrame ile çalışır. Aynı bar sayısına
+sahip semboller (semboller x barlar x OHLC) tek bir numpy dizisinde
+toplanıp weak high, son bullish BOS, swing low, range ve range_position_pct
+tek vektörel geçişte hesaplanır. Sonuçlar SimplifiedSMC.get_signal_json ile
+aynı sinyal sözlükleridir.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import kline_cache
+import ohlcv_store
+
+# ---------- CONFIG ----------
+SWING_LOOKBACK = 5  # SimplifiedSMC.find_last_bullish_bos ile aynı
+OPEN, HIGH, LOW, CLOSE = 0, 1, 2, 3
+
+# ---------- HELPERS ----------
+def klines_to_ohlc(klines: List[list]) -> np.ndarray:
+    """Binance ham kline listesini (bars x OHLC) float64 diziye çevir"""
+    return np.array([row[1:5] for row in klines], dtype=np.float64).reshape(-1, 4)
+
+def stack_universe(klines_by_symbol: Dict[str, List[list]], bars: int):
+    """Tam `bars` uzunluğunda penceresi olan sembolleri (semboller x barlar x OHLC) dizisine topla"""
+    symbols = [s for s, kl in klines_by_symbol.items() if kl is not None and len(kl) == bars]
+    if not symbols:
+        return symbols, np.empty((0, bars, 4))
+    return symbols, np.stack([klines_to_ohlc(klines_by_symbol[s]) for s in symbols])
+
+def stored_ohlc(symbol: str, interval: str, klines: List[list]) -> Optional[np.ndarray]:
+    """
+    Pencereyi OHLCV deposundaki memmap kolonlarından oku (string ayrıştırma yok).
+    Depo cache penceresiyle aynı son barı taşımıyorsa None.
+    """
+    if not ohlcv_store.STORE_ENABLED:
+        return None
+    columns = ohlcv_store.read(symbol, interval, len(klines))
+    if columns is None or len(columns["timestamp"]) != len(klines):
+        return None
+    last = klines[-1]
+    if columns["timestamp"][-1] != last[0] or columns["close"][-1] != float(last[4]):
+        return None
+    return np.stack([columns["open"], columns["high"], columns["low"], columns["close"]], axis=1)
+
+def _swing_high_mask(high: np.ndarray, lookback: int) -> np.ndarray:
+    n_symbols, n_bars = high.shape
+    mask = np.zeros((n_symbols, n_bars), dtype=bool)
+    width = 2 * lookback + 1
+    if n_bars < width:
+        return mask
+    windows = sliding_window_view(high, width, axis=1)
+    center = windows[:, :, lookback]
+    mask[:, lookback:n_bars - lookback] = (
+        (center > windows[:, :, :lookback].max(axis=2)) &
+        (center > windows[:, :, lookback + 1:].max(axis=2))
+    )
+    return mask
+
+# ---------- ANALYSIS ----------
+def analyze_batch(symbols: Sequence[str], ohlc: np.ndarray,
+                  lookback: int = SWING_LOOKBACK) -> List[Optional[Dict]]:
+    """
+    ohlc: (semboller x barlar x [open, high, low, close]) dizisi.
+    Her sembol için SimplifiedSMC.get_signal_json ile aynı sözlüğü (range
+    bulunamazsa None) sembol sırasıyla döndürür.
+    """
+    n_symbols, n_bars = ohlc.shape[:2]
+    if n_symbols == 0 or n_bars == 0:
+        return [None] * n_symbols
+
+    high = ohlc[:, :, HIGH]
+    low = ohlc[:, :, LOW]
+    close = ohlc[:, :, CLOSE]
+    rows = np.arange(n_symbols)
+    bar_idx = np.arange(n_bars)[None, :]
+
+    # 1. Weak high: en yüksek high (ilk oluşum)
+    weak_idx = high.argmax(axis=1)
+    weak_price = high[rows, weak_idx]
+
+    # 2. Son bullish BOS: weak high'dan önceki swing high'lardan, weak high mumuna
+    #    kadar (dahil) kapanışla kırılanların sonuncusu.
+    #    after_max[s, i] = max(close[s, i+1 : weak+1])
+    capped_close = np.where(bar_idx <= weak_idx[:, None], close, -np.inf)
+    suffix_max = np.maximum.accumulate(capped_close[:, ::-1], axis=1)[:, ::-1]
+    after_max = np.full((n_symbols, n_bars), -np.inf)
+    after_max[:, :-1] = suffix_max[:, 1:]
+    is_bos = _swing_high_mask(high, lookback) & (bar_idx < weak_idx[:, None]) & (after_max > high)
+
+    has_bos = is_bos.any(axis=1)
+    bos_idx = n_bars - 1 - is_bos[:, ::-1].argmax(axis=1)
+
+    # 3. Swing low: BOS swing high'ı ile weak high arasındaki (dahil) en düşük low
+    in_range = (bar_idx >= bos_idx[:, None]) & (bar_idx <= weak_idx[:, None])
+    swing_low_idx = np.where(in_range, low, np.inf).argmin(axis=1)
+    range_low = low[rows, swing_low_idx]
+    range_high = high[rows, bos_idx]
+
+    # 4. Weak high'dan sonra (dahil) range low altına kapanış var mı
+    after_weak = bar_idx >= weak_idx[:, None]
+    swing_low_broken = (after_weak & (close < range_low[:, None])).any(axis=1)
+
+    current_price = close[:, -1]
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    # 5. Range ve pozisyon (SimplifiedSMC.calculate_range_and_position ile aynı formüller)
+    signals: List[Optional[Dict]] = []
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for s in range(n_symbols):
+            if not has_bos[s]:
+                signals.append(None)
+                continue
+
+            price = current_price[s]
+            r_low = range_low[s]
+            r_high = range_high[s]
+            range_size = r_high - r_low
+            range_mid = r_low + (range_size / 2)
+
+            if r_low <= price <= r_high:
+                position_pct = ((price - r_low) / range_size) * 100
+                status = "RANGE İÇİNDE"
+                inside = True
+            elif price > r_high:
+                position_pct = 100 + ((price - r_high) / range_size) * 100
+                status = "RANGE ÜSTÜNDE"
+                inside = False
+            else:
+                position_pct = -((r_low - price) / range_size) * 100
+                status = "RANGE ALTINDA"
+                inside = False
+
+            broken = bool(swing_low_broken[s])
+            range_50_signal = bool(inside and price < range_mid and not broken)
+
+            signals.append({
+                "symbol": symbols[s],
+                "timestamp": timestamp,
+                "current_price": float(round(price, 4)),
+                "range_low": float(round(r_low, 4)),
+                "range_high": float(round(r_high, 4)),
+                "range_mid": float(round(range_mid, 4)),
+                "range_position_pct": float(round(position_pct, 2)),
+                "in_range": bool(inside),
+                "status": status,
+                "swing_low_broken": broken,
+                "range_50": range_50_signal,
+                "signal": "BUY" if range_50_signal else "NO_SIGNAL",
+                "weak_high": float(weak_price[s])
+            })
+    return signals
+
+def analyze_universe(symbols: Iterable[str], interval: str, bars: int = 500) -> Dict[Tuple[str, str], Optional[Dict]]:
+    """
+    Cache'te tam `bars` uzunluğunda penceresi olan sembolleri toplu analiz et.
+    Dönen sözlükte olmayan semboller (eksik/kısa veri) tek tek analiz edilmeli.
+    """
+    klines_by_symbol = {symbol: kline_cache.get_cached(symbol, interval, bars) for symbol in symbols}
+    batch_symbols = [s for s, kl in klines_by_symbol.items() if kl is not None and len(kl) == bars]
+    ohlc = np.empty((len(batch_symbols), bars, 4))
+    for i, symbol in enumerate(batch_symbols):
+        stored = stored_ohlc(symbol, interval, klines_by_symbol[symbol])
+        ohlc[i] = stored if stored is not None else klines_to_ohlc(klines_by_symbol[symbol])
+    signals = analyze_batch(batch_symbols, ohlc)
+    return {(symbol, interval): signal for symbol, signal in zip(batch_symbols, signals)}
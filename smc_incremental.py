@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Artımlı (bar bar) SimplifiedSMC durum makinesi
+
+SimplifiedSMC.analyze her çağrıda weak high, swing high'lar, BOS, swing low
+ve range'i tüm pencere üzerinden baştan hesaplar. IncrementalSMC aynı
+yapıları kapanan her barla günceller ve aynı `signal` sözlüğünü üretir:
+
+- Weak high: kayan pencere maksimumu için monoton deque (eşitlikte ilk bar)
+- Swing high: bar j, j+lookback barı geldiğinde O(lookback) ile teyit edilir
+- Kırılma: kırılmamış swing seviyeleri min-heap'te; her kapanış altında
+  kalan seviyeleri kırar
+- Son bullish BOS: deque'deki her weak high adayı "o bara kadar kırılmış en
+  sağdaki swing"i taşır; BOS = weak high adayının bu değeri
+- Swing low / range low kırılması: low ve close için sonek minimum yığınları
+
+Bar başına maliyet amortize sabittir (heap ve yığın aramaları log n). Sadece
+kapanmış barlar beslenmelidir (oluşmakta olan bar tekrar tekrar değiştiği
+için durumu bozar).
+
+    smc = IncrementalSMC("SOLUSDT", "4h", limit=500)
+    smc.update(klines)            # Yeni (kapanmış) barları işler
+    smc.get_signal_json()         # SimplifiedSMC(..).analyze(klines[-500:]) ile aynı
+"""
+
+import heapq
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from kline_cache import interval_ms
+
+# ---------- CONFIG ----------
+SWING_LOOKBACK = 5  # SimplifiedSMC.find_last_bullish_bos ile aynı
+
+# ---------- HELPERS ----------
+class _SuffixMin:
+    """
+    Eklenen seri için "[start, son bar] aralığının minimumu (eşitlikte ilk)"
+    sorguları. Değerleri azalmayan monoton yığın; ilk index >= start olan eleman cevaptır.
+    """
+
+    def __init__(self):
+        self.indices: List[int] = []
+        self.values: List[float] = []
+        self.head = 0
+
+    def push(self, index: int, value: float):
+        while len(self.indices) > self.head and self.values[-1] > value:
+            self.indices.pop()
+            self.values.pop()
+        self.indices.append(index)
+        self.values.append(value)
+
+    def query(self, start: int) -> Tuple[int, float]:
+        k = bisect_left(self.indices, start, self.head)
+        return self.indices[k], self.values[k]
+
+    def expire(self, start: int):
+        """Pencereden çıkan baştaki elemanları bırak (listeyi ara sıra kısaltarak)"""
+        self.head = bisect_left(self.indices, start, self.head)
+        if self.head > 64 and self.head * 2 > len(self.indices):
+            del self.indices[:self.head]
+            del self.values[:self.head]
+            self.head = 0
+
+# ---------- STATE MACHINE ----------
+class IncrementalSMC:
+    """Kapanan barlarla güncellenen SimplifiedSMC eşdeğeri"""
+
+    def __init__(self, symbol: str = "SOLUSDT", interval: str = "4h", limit: int = 500,
+                 lookback: int = SWING_LOOKBACK):
+        self.symbol = symbol
+        self.interval = interval
+        self.limit = limit
+        self.lookback = lookback
+        self.reset()
+
+    def reset(self):
+        # Bar dizileri: global index i, tamponda i - offset konumunda
+        capacity = 2 * max(self.limit, 2 * self.lookback + 1)
+        self.open_time = np.zeros(capacity, dtype=np.int64)
+        self.high = np.zeros(capacity)
+        self.low = np.zeros(capacity)
+        self.close = np.zeros(capacity)
+        self.offset = 0
+        self.count = 0
+
+        self.weak = deque()             # [bar index, o bara kadar kırılmış en sağdaki swing]
+        self.unbroken: List[Tuple[float, int]] = []  # (seviye, swing index) min-heap
+        self.last_broken = -1           # Şimdiye kadar kırılmış en sağdaki swing high
+        self.low_min = _SuffixMin()
+        self.close_min = _SuffixMin()
+        self._range_cache: Optional[Tuple[int, int, int]] = None  # (bos, weak, swing low index)
+        self.signal = None
+
+    @property
+    def last_open_time(self) -> Optional[int]:
+        return int(self.open_time[self.count - 1 - self.offset]) if self.count else None
+
+    def _at(self, array: np.ndarray, i: int) -> float:
+        return array[i - self.offset]
+
+    def _store(self, open_time: int, high: float, low: float, close: float):
+        pos = self.count - self.offset
+        if pos == len(self.high):
+            # Tamponu kaydır: sadece pencere + swing teyidi için gereken son barlar kalır
+            keep = len(self.high) // 2
+            for array in (self.open_time, self.high, self.low, self.close):
+                array[:keep] = array[pos - keep:pos]
+            self.offset += pos - keep
+            pos = keep
+        self.open_time[pos] = open_time
+        self.high[pos] = high
+        self.low[pos] = low
+        self.close[pos] = close
+        self.count += 1
+
+    def _record_break(self, swing: int, break_bar: int):
+        """Swing `break_bar`'da kırıldı: o bar ve sonrasındaki weak high adaylarını güncelle"""
+        self.last_broken = max(self.last_broken, swing)
+        for entry in reversed(self.weak):
+            if entry[0] < break_bar:
+                break
+            entry[1] = max(entry[1], swing)
+
+    def append(self, open_time: int, high: float, low: float, close: float) -> Optional[Dict]:
+        """Kapanan bir barı işle ve güncel sinyali (range yoksa None) döndür"""
+        t = self.count
+        self._store(open_time, high, low, close)
+        start = max(0, self.count - self.limit)
+        lookback = self.lookback
+
+        # 1. Bu kapanışla kırılan swing high'lar
+        while self.unbroken and self.unbroken[0][0] < close:
+            _, swing = heapq.heappop(self.unbroken)
+            self.last_broken = max(self.last_broken, swing)
+
+        # 2. Weak high adayları (eşit high'larda önceki bar kalır)
+        while self.weak and self._at(self.high, self.weak[-1][0]) < high:
+            self.weak.pop()
+        self.weak.append([t, self.last_broken])
+        while self.weak[0][0] < start:
+            self.weak.popleft()
+
+        # 3. lookback bar önceki swing high adayı artık teyit edilebilir
+        j = t - lookback
+        if j - lookback >= 0:
+            pos = j - self.offset
+            level = self.high[pos]
+            if level > self.high[pos - lookback:pos].max() and level > self.high[pos + 1:pos + lookback + 1].max():
+                after = np.flatnonzero(self.close[pos + 1:pos + lookback + 1] > level)
+                if len(after):
+                    self._record_break(j, j + 1 + int(after[0]))
+                else:
+                    heapq.heappush(self.unbroken, (level, j))
+                    if len(self.unbroken) > 2 * self.limit:
+                        # Pencereden çıkmış kırılmamış swing'ler artık önemsiz
+                        self.unbroken = [item for item in self.unbroken if item[1] >= start]
+                        heapq.heapify(self.unbroken)
+
+        # 4. Sonek minimumları
+        self.low_min.push(t, low)
+        self.close_min.push(t, close)
+        self.low_min.expire(start)
+        self.close_min.expire(start)
+
+        self.signal = self._evaluate(start)
+        return self.signal
+
+    def _evaluate(self, start: int) -> Optional[Dict]:
+        weak_idx, bos_idx = self.weak[0]
+        # Swing'in pencerede solundaki lookback barla teyitli olması gerekir
+        if bos_idx < start + self.lookback:
+            self._range_cache = None
+            return None
+
+        t = self.count - 1
+        if weak_idx == t:
+            low_idx = self.low_min.query(bos_idx)[0]
+        elif self._range_cache and self._range_cache[:2] == (bos_idx, weak_idx):
+            low_idx = self._range_cache[2]
+        else:
+            # Weak high eski bir bara geçti ya da BOS değişti - aralık bir kez taranır
+            lo, hi = bos_idx - self.offset, weak_idx - self.offset
+            low_idx = bos_idx + int(self.low[lo:hi + 1].argmin())
+        self._range_cache = (bos_idx, weak_idx, low_idx)
+
+        range_low = self._at(self.low, low_idx)
+        range_high = self._at(self.high, bos_idx)
+        swing_low_broken = self.close_min.query(weak_idx)[1] < range_low
+        current_price = self._at(self.close, t)
+
+        # SimplifiedSMC.calculate_range_and_position ile aynı formüller
+        range_size = range_high - range_low
+        range_mid = range_low + (range_size / 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if range_low <= current_price <= range_high:
+                position_pct = ((current_price - range_low) / range_size) * 100
+                status = "RANGE İÇİNDE"
+                in_range = True
+            elif current_price > range_high:
+                position_pct = 100 + ((current_price - range_high) / range_size) * 100
+                status = "RANGE ÜSTÜNDE"
+                in_range = False
+            else:
+                position_pct = -((range_low - current_price) / range_size) * 100
+                status = "RANGE ALTINDA"
+                in_range = False
+
+        range_50_signal = bool(in_range and current_price < range_mid and not swing_low_broken)
+        return {
+            "symbol": self.symbol,
+            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "current_price": float(round(current_price, 4)),
+            "range_low": float(round(range_low, 4)),
+            "range_high": float(round(range_high, 4)),
+            "range_mid": float(round(range_mid, 4)),
+            "range_position_pct": float(round(position_pct, 2)),
+            "in_range": bool(in_range),
+            "status": status,
+            "swing_low_broken": bool(swing_low_broken),
+            "range_50": range_50_signal,
+            "signal": "BUY" if range_50_signal else "NO_SIGNAL",
+            "weak_high": float(self._at(self.high, weak_idx))
+        }
+
+    def update(self, klines: List[list]) -> Optional[Dict]:
+        """
+        Ham kline listesindeki yeni barları işle. Liste son işlenen bardan
+        sonrasıyla bitişik değilse (boşluk, farklı seri) durum sıfırlanıp
+        son `limit` bardan yeniden kurulur.
+        """
+        last = self.last_open_time
+        if last is not None:
+            new_rows = [row for row in klines if int(row[0]) > last]
+            if new_rows and int(new_rows[0][0]) != last + interval_ms(self.interval):
+                self.reset()
+                new_rows = klines[-self.limit:]
+        else:
+            new_rows = klines[-self.limit:]
+
+        for row in new_rows:
+            self.append(int(row[0]), float(row[2]), float(row[3]), float(row[4]))
+        return self.signal
+
+    def get_signal_json(self):
+        """Sadece JSON sinyal döndür (SimplifiedSMC ile aynı)"""
+        return self.signal if self.signal else None
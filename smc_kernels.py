@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SMC analizörleri için ortak numpy çekirdekleri
+
+SimplifiedSMC, CHOCHAnalyzer ve BearishCHOCHAnalyzer swing noktalarını ve
+kırılmaları bar bar .iloc ile arıyordu. Buradaki fonksiyonlar aynı sonuçları
+vektörel olarak üretir:
+
+- swing_highs / swing_lows: strided pencere görünümü (sliding_window_view)
+  üzerinden sol/sağ `lookback` barın ekstremumları
+- BreakIndex: seviyeyi ilk kıran bar için sparse table (2^k blok max/min)
+  üzerinde ikili atlama; sorgu başına O(log n)
+- RangeArgmin: [left, right] aralığındaki en düşük değerin ilk indeksi;
+  sorgu başına O(1)
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# ---------- SWING ----------
+def _swing_indices(values: np.ndarray, lookback: int, find_high: bool) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    width = 2 * lookback + 1
+    if lookback < 1 or len(values) < width:
+        return np.empty(0, dtype=np.int64)
+
+    windows = sliding_window_view(values, width)
+    center = windows[:, lookback]
+    if find_high:
+        is_swing = (center > windows[:, :lookback].max(axis=1)) & (center > windows[:, lookback + 1:].max(axis=1))
+    else:
+        is_swing = (center < windows[:, :lookback].min(axis=1)) & (center < windows[:, lookback + 1:].min(axis=1))
+    return np.flatnonzero(is_swing) + lookback
+
+def swing_highs(high: np.ndarray, lookback: int) -> np.ndarray:
+    """Solundaki ve sağındaki `lookback` barın hepsinden yüksek olan barların indeksleri"""
+    return _swing_indices(high, lookback, find_high=True)
+
+def swing_lows(low: np.ndarray, lookback: int) -> np.ndarray:
+    """Solundaki ve sağındaki `lookback` barın hepsinden düşük olan barların indeksleri"""
+    return _swing_indices(low, lookback, find_high=False)
+
+# ---------- BREAK ----------
+class BreakIndex:
+    """
+    Bir seri (genelde kapanışlar) üzerinde "start'tan itibaren seviyeyi ilk
+    aşan bar" sorguları. table[k][i] = values[i:i+2^k] bloğunun max/min'i;
+    sorgu en büyük bloktan başlayarak seviyeyi aşmayan blokları atlar.
+    """
+
+    def __init__(self, values: np.ndarray):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.size = len(self.values)
+        self._max_table = None
+        self._min_table = None
+
+    def _build(self, reduce) -> list:
+        table = [self.values]
+        width = 1
+        while width * 2 <= self.size:
+            prev = table[-1]
+            table.append(reduce(prev[:-width], prev[width:]))
+            width *= 2
+        return table
+
+    def _first(self, levels, starts, stops, above: bool) -> np.ndarray:
+        levels = np.atleast_1d(np.asarray(levels, dtype=np.float64))
+        pos = np.broadcast_to(np.asarray(starts, dtype=np.int64), levels.shape).copy()
+        pos = np.clip(pos, 0, self.size)
+        if self.size == 0:
+            return np.full(levels.shape, -1, dtype=np.int64)
+
+        if above:
+            if self._max_table is None:
+                self._max_table = self._build(np.maximum)
+            table = self._max_table
+        else:
+            if self._min_table is None:
+                self._min_table = self._build(np.minimum)
+            table = self._min_table
+
+        # Seviyeyi kırmayan en uzun ön ek: büyük bloktan küçüğe açgözlü atlama
+        for k in range(len(table) - 1, -1, -1):
+            width = 1 << k
+            fits = pos + width <= self.size
+            block = table[k][np.minimum(pos, len(table[k]) - 1)]
+            holds = block <= levels if above else block >= levels
+            pos = np.where(fits & holds, pos + width, pos)
+
+        limit = self.size if stops is None else np.minimum(np.asarray(stops, dtype=np.int64), self.size)
+        return np.where(pos < limit, pos, -1)
+
+    def first_above(self, levels, starts, stops=None) -> np.ndarray:
+        """[start, stop) aralığında values > level olan ilk indeks, yoksa -1"""
+        return self._first(levels, starts, stops, above=True)
+
+    def first_below(self, levels, starts, stops=None) -> np.ndarray:
+        """[start, stop) aralığında values < level olan ilk indeks, yoksa -1"""
+        return self._first(levels, starts, stops, above=False)
+
+def first_cross_above(values: np.ndarray, levels, starts, stops=None) -> np.ndarray:
+    """Tek seferlik sorgular için BreakIndex(values).first_above kısayolu"""
+    return BreakIndex(values).first_above(levels, starts, stops)
+
+def first_cross_below(values: np.ndarray, levels, starts, stops=None) -> np.ndarray:
+    """Tek seferlik sorgular için BreakIndex(values).first_below kısayolu"""
+    return BreakIndex(values).first_below(levels, starts, stops)
+
+# ---------- RANGE MIN ----------
+class RangeArgmin:
+    """
+    values[left:right+1] içindeki en küçük değerin (eşitlikte ilk) indeksi.
+    table[k][i] = values[i:i+2^k] bloğunun argmin'i; sorgu örtüşen iki blok.
+    """
+
+    def __init__(self, values: np.ndarray):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.table = [np.arange(len(self.values), dtype=np.int64)]
+        width = 1
+        while width * 2 <= len(self.values):
+            prev = self.table[-1]
+            left, right = prev[:-width], prev[width:]
+            self.table.append(np.where(self.values[right] < self.values[left], right, left))
+            width *= 2
+
+    def query(self, lefts, rights) -> np.ndarray:
+        """Her (left, right) çifti için argmin; left <= right olmalı"""
+        lefts, rights = np.broadcast_arrays(np.atleast_1d(np.asarray(lefts, dtype=np.int64)),
+                                            np.asarray(rights, dtype=np.int64))
+        levels = np.floor(np.log2(np.maximum(rights - lefts + 1, 1))).astype(np.int64)
+        result = np.empty(lefts.shape, dtype=np.int64)
+        for k in np.unique(levels):
+            mask = levels == k
+            left = self.table[k][lefts[mask]]
+            right = self.table[k][rights[mask] - (1 << k) + 1]
+            result[mask] = np.where(self.values[right] < self.values[left], right, left)
+        return result
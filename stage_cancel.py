@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+In-process aşamalar için işbirlikçi iptal
+
+Thread'ler dışarıdan öldürülemez; in-process modda timeout'a uğrayan aşama
+arka planda çalışmaya devam edip Binance'e istek atıyor ve sonuç dosyalarını
+yazıyordu. Controller timeout'ta iptal bayrağını kaldırır; bayrak şu
+noktalarda kontrol edilir ve StageCancelled fırlatılır:
+
+- rate_limiter: tüm Binance istekleri hak almadan önce (bekleme sırasında da)
+- analysis_pool.map_ordered ve shard.map_shards: sonuç beklerken
+- tarama döngüleri: her sembolden önce
+
+StageCancelled BaseException'dır; sembol başına `except Exception` blokları
+onu yutmaz, aşama sonuç dosyalarını yazmadan çıkar.
+"""
+
+import threading
+
+class StageCancelled(BaseException):
+    """Aşama timeout nedeniyle iptal edildi"""
+
+_cancelled = threading.Event()
+
+def cancel():
+    """Çalışan aşamanın bir sonraki kontrol noktasında durmasını iste"""
+    _cancelled.set()
+
+def reset():
+    """Aşama thread'i bittikten sonra bayrağı indir"""
+    _cancelled.clear()
+
+def is_cancelled() -> bool:
+    return _cancelled.is_set()
+
+def check():
+    """İptal istendiyse StageCancelled fırlat"""
+    if _cancelled.is_set():
+        raise StageCancelled()